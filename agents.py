@@ -0,0 +1,73 @@
+# agents.py
+"""
+Lazy agent registry for the Streamlit portals.
+
+Agent modules pull in requests/bs4/reportlab/openai and friends; importing
+them all at the top of app.py adds a few hundred ms to every cold start on top
+of streamlit + pandas, which the first render needs anyway (bench_import_time.py).
+Attributes of this module resolve to the agent functions and import the
+owning module on first access only:
+
+    import agents
+    rows = agents.run_serp_queries(domain, kws, gl="uk")   # imports serp_agent now
+
+Use preload() to warm modules in the background once the first page is up.
+"""
+
+import importlib, threading
+from typing import Dict
+
+_EXPORTS: Dict[str, str] = {
+    "get_domain_overview": "semrush_agent",
+    "get_domain_top_keywords": "semrush_agent",
+    "run_serp_queries": "serp_agent",
+    "run_serp_compare": "serp_agent",
+    "audit_url": "seo_audit_agent",
+    "draft_titles_and_meta": "llmseo_agent",
+    "draft_faqs_and_schema": "llmseo_agent",
+    "compute_kpis": "kpi_scoring",
+    "serp_score_from_df": "kpi_scoring",
+    "serp_scores_grouped": "kpi_scoring",
+    "combine_lvi": "kpi_scoring",
+    "fetch_lighthouse_perf": "pagespeed_agent",
+    "build_pdf": "report_export",
+    "build_llm_plan": "llm_plan_helper",
+    "stream_llm_plan": "llm_plan_helper",
+    "plan_pages": "batch_planner",
+    "get_cache": "llm_cache",
+    "run_snapshot": "snapshot",
+}
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'agents' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value  # later lookups bypass __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+def loaded() -> list:
+    """Registry names whose modules have been imported so far."""
+    return sorted(n for n in _EXPORTS if n in globals())
+
+
+def preload(*names: str) -> threading.Thread:
+    """Import the given agents (default: all) on a daemon thread."""
+    targets = names or tuple(_EXPORTS)
+
+    def _load():
+        for n in targets:
+            try:
+                __getattr__(n)
+            except Exception:
+                pass  # surfaced again, with context, on real use
+
+    t = threading.Thread(target=_load, name="agents-preload", daemon=True)
+    t.start()
+    return t
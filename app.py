@@ -1,26 +1,20 @@
 # app.py   repaired  (LLMSEO portal)
-import os, io, json, datetime, zipfile
+import os, io, json, datetime, time
 from pathlib import Path
 from dotenv import load_dotenv
 
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import subprocess
+import app_cache
+app_cache.rerun_started()
 # Show the file path (helps confirm what the cloud is running)
-try:
 try:
     st.caption(__file__)   # shows which file the cloud is running
 except Exception:
     pass
 
 def get_app_version():
-    try:
-        # Try to get the short commit SHA
-        version = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"]).decode("utf-8").strip()
-        return f"Version: {version}"
-    except Exception:
-        return "Version: Local build"
+    return app_cache.app_version()  # git SHA resolved once per process
 
 # === App paths / env ===
 APP_DIR = Path(__file__).resolve().parent
@@ -45,17 +39,8 @@ def proj_dir(name: str) -> Path:
 def pack_path(name: str) -> Path:
     return proj_dir(name) / "seo_pack.json"
 
-def lvi_path(name: str) -> Path:
-    return proj_dir(name) / "lvi_history.csv"
-
 def load_pack(project: str) -> dict:
-    p = pack_path(project)
-    if p.exists():
-        try:
-            return json.loads(p.read_text())
-        except Exception:
-            return {}
-    return {}
+    return app_cache.read_pack(pack_path(project))
 
 def save_pack(project: str, pack: dict) -> None:
     p = pack_path(project)
@@ -74,11 +59,14 @@ def _gauge_color(v:int)->str:
     if v >= 50: return "#b26a00"   # amber
     return "#c62828"               # red
 
-def make_gauge(label:str, value:int):
-    value = max(0, min(100, int(value)))
-    fig = go.Figure(go.Indicator(
+GAUGE_KPIS = (("SERP", "serp_score"), ("Technical", "technical_score"), ("Content", "content_score"),
+              ("E-E-A-T", "eeat_score"), ("Speed", "speed_score"), ("LVI %", "lvi"))
+
+def _gauge_indicator(go, label: str, value: int, row: int, col: int):
+    return go.Indicator(
         mode="gauge+number",
         value=value,
+        domain={'row': row, 'column': col},
         title={'text': label, 'font': {'size':14}},
         gauge={
             'axis': {'range': [0,100]},
@@ -92,29 +80,92 @@ def make_gauge(label:str, value:int):
                           'thickness': 0.75, 'value': value}
         },
         number={'suffix': "%", 'font': {'size':20}}
-    ))
-    fig.update_layout(height=220, margin=dict(l=8,r=8,t=30,b=8))
+    )
+
+def make_gauge_panel(values: tuple):
+    """All six KPI gauges in one 2x3 grid figure (one payload, one chart element)."""
+    import plotly.graph_objects as go  # lazy: only needed once an audit has run
+    fig = go.Figure([_gauge_indicator(go, label, v, i // 3, i % 3)
+                     for i, ((label, _), v) in enumerate(zip(GAUGE_KPIS, values))])
+    fig.update_layout(grid={'rows': 2, 'columns': 3, 'pattern': 'independent', 'ygap': 0.35},
+                      height=440, margin=dict(l=8,r=8,t=30,b=8))
     return fig
 
-def render_kpi_gauges(kpi: dict, key_prefix: str = "kpi"):
-    c1, c2, c3 = st.columns(3)
-    c4, c5, c6 = st.columns(3)
-    c1.plotly_chart(make_gauge("SERP",       kpi.get("serp_score",0)),      use_container_width=True, key=f"{key_prefix}-serp")
-    c2.plotly_chart(make_gauge("Technical",  kpi.get("technical_score",0)), use_container_width=True, key=f"{key_prefix}-tech")
-    c3.plotly_chart(make_gauge("Content",    kpi.get("content_score",0)),   use_container_width=True, key=f"{key_prefix}-content")
-    c4.plotly_chart(make_gauge("E-E-A-T",    kpi.get("eeat_score",0)),      use_container_width=True, key=f"{key_prefix}-eeat")
-    c5.plotly_chart(make_gauge("Speed",      kpi.get("speed_score",0)),     use_container_width=True, key=f"{key_prefix}-speed")
-    c6.plotly_chart(make_gauge("LVI %",      kpi.get("lvi",0)),             use_container_width=True, key=f"{key_prefix}-lvi")
+def render_kpi_gauges(kpi: dict, key: str = "kpi-gauges"):
+    values = tuple(max(0, min(100, int(kpi.get(k, 0) or 0))) for _, k in GAUGE_KPIS)
+    st.plotly_chart(app_cache.gauge_panel(values, make_gauge_panel), use_container_width=True, key=key)
 
 # === Imports for agents / helpers ===
-from semrush_agent import get_domain_overview, get_domain_top_keywords
-from serp_agent import run_serp_queries, run_serp_compare
-from seo_audit_agent import audit_url
-from llmseo_agent import draft_titles_and_meta, draft_faqs_and_schema
-from kpi_scoring import compute_kpis, serp_score_from_df, combine_lvi
-from pagespeed_agent import fetch_lighthouse_perf
-from report_export import build_pdf
-from llm_plan_helper import build_llm_plan as _build_llm_plan
+# Agent modules (requests, bs4, reportlab, openai) load on first use via agents.
+# The helpers below stay eager: they only add pandas, which the first render needs
+# for the session frames and the sidebar history panels (see bench_import_time.py).
+import agents
+from llmseo_agent import set_client_factory
+from history_store import append_row, tail_history, history_csv, history_version
+import zip_export
+from lvi_trends import trend_rows
+from kpi_scoring import WEIGHTS, weights_hash
+import jobs
+import llm_usage
+
+# One pooled OpenAI client per key for every session (also picks up st.secrets keys);
+# created on the first LLM call, not at startup.
+_openai_key = get_secret("OPENAI_API_KEY")
+if _openai_key:
+    set_client_factory(lambda: app_cache.openai_client(_openai_key))
+
+# === Background jobs ===
+# Network-bound buttons run on jobs' thread pool; the job id is kept in session
+# state and mirrored to ?job_<kind>=<id> so a page reload reattaches to it.
+JOB_KINDS = ("serp", "compare", "snapshot", "batch")
+
+def job_ids() -> dict:
+    ids = st.session_state.setdefault("jobs", {})
+    for kind in JOB_KINDS:
+        qid = st.query_params.get(f"job_{kind}")
+        if qid and kind not in ids:
+            ids[kind] = qid
+    return ids
+
+def start_job(kind: str, fn, *args, **kwargs) -> str:
+    job_id = jobs.submit(kind, fn, *args, owner=st.session_state.get("project", ""), **kwargs)
+    job_ids()[kind] = job_id
+    st.query_params[f"job_{kind}"] = job_id
+    return job_id
+
+@st.fragment(run_every=1.0)
+def _job_progress(kind: str, job_id: str):
+    info = jobs.status(job_id) or {}
+    if info.get("status") in jobs.FINISHED:
+        st.rerun()  # full rerun renders the finished result
+    st.progress(info.get("progress", 0.0), text=f"{kind}: {info.get('message') or info.get('status', 'pending')}")
+
+def job_panel(kind: str, apply=None):
+    """Show progress/error for this session's latest `kind` job; return its result once done.
+    `apply(result)` runs once per finished job (e.g. to copy results into session state)."""
+    job_id = job_ids().get(kind)
+    if not job_id:
+        return None
+    info = jobs.status(job_id)
+    if info is None:
+        job_ids().pop(kind, None)
+        return None
+    if info["status"] == jobs.FAILED:
+        st.error(f"{kind} job failed: {info.get('error','')}")
+        return None
+    if info["status"] != jobs.DONE:
+        _job_progress(kind, job_id)
+        return None
+    value = jobs.result(job_id)
+    applied = st.session_state.setdefault("jobs_applied", set())
+    if apply is not None and job_id not in applied and value is not None:
+        apply(value)
+        applied.add(job_id)
+    return value
+
+def _compare_job(domain: str, competitors: list, kw_list: list, gl: str) -> dict:
+    return {"domain": domain, "competitors": competitors,
+            "rows": agents.run_serp_compare(domain, competitors, kw_list, gl=gl)}
 
 # === UI: page header ===
 st.set_page_config(page_title="LLMSEO Agentic Web Portal", layout="wide")
@@ -142,10 +193,12 @@ with st.sidebar:
     # Engine
     st.markdown("### LLM Engine")
     engine = st.selectbox("LLM engine", ["OpenAI (default)", "Claude (Anthropic)", "Grok (xAI)"], index=0)
+    hedge = st.checkbox("Hedge slow responses with a second engine", value=os.getenv("LLM_HEDGE", "off").lower() in ("1", "on", "true", "yes"),
+                        help="If the engine is slower than its usual p90, send the same prompt to another keyed engine; first valid JSON wins.")
 
     # Project
     st.markdown("### Project")
-    existing_projects = sorted([p.name for p in PROJECTS_DIR.glob("*") if p.is_dir()])
+    existing_projects = app_cache.project_names(PROJECTS_DIR)
     pick = st.selectbox("Select project", options=["<new>"] + existing_projects, index=0, key="project_select")
     new_name = st.text_input("New project name", value=st.session_state["project"], key="project_new_name")
     if st.button("Use Project", key="use_project_btn"):
@@ -180,13 +233,6 @@ with st.sidebar:
             st.success(f" Loaded SEO pack for project: {active_project}")
         else:
             st.warning("No saved pack found for this project yet.")
-st.divider()
-try:
-    build_env = "Cloud build" if os.getenv("STREAMLIT_RUNTIME") else "Local build"
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-    st.caption(f" LLMSEO Portal v1.0  {build_env} (updated {timestamp})")
-except Exception as e:
-    st.caption(f" LLMSEO Portal v1.0  Version info error: {e}")
 
     # Snapshot
     st.markdown("### LVI Snapshot")
@@ -204,46 +250,60 @@ except Exception as e:
             if not domain_in or not kws:
                 st.error("Please set a domain and at least one keyword (SEO Pack or keywords textarea).")
             else:
-                rows = run_serp_queries(domain_in, kws[:5], gl="uk")
+                rows = agents.run_serp_queries(domain_in, kws[:5], gl="uk")
                 df = pd.DataFrame(rows)
-                serp_score = serp_score_from_df(df, domain_in)
-                psi_score, _ = fetch_lighthouse_perf(url_in or f"https://{domain_in}", strategy="mobile")
+                serp_score = agents.serp_score_from_df(df, domain_in)
+                psi_score, _ = agents.fetch_lighthouse_perf(url_in or f"https://{domain_in}", strategy="mobile")
                 res = {"title": "Snapshot", "h1_count": 1}
-                kpi = compute_kpis(res, serp_score)
+                kpi = agents.compute_kpis(res, serp_score)
                 if psi_score >= 0:
                     kpi["speed_score"] = psi_score
-                    kpi["lvi"] = combine_lvi(
+                    kpi["lvi"] = agents.combine_lvi(
                         kpi["serp_score"], kpi["technical_score"],
                         kpi["content_score"], kpi["eeat_score"], kpi["speed_score"]
                     )
                 ts = datetime.datetime.utcnow().isoformat(timespec="seconds")
                 row = {"timestamp": ts, "project": active_project, "domain": domain_in,
                        "url": url_in or f"https://{domain_in}", **kpi}
-                hist_csv = lvi_path(active_project)
-                if hist_csv.exists():
-                    pd.concat([pd.read_csv(hist_csv), pd.DataFrame([row])]).to_csv(hist_csv, index=False)
-                else:
-                    pd.DataFrame([row]).to_csv(hist_csv, index=False)
-                st.success(f" Snapshot saved to {hist_csv}")
+                append_row(row)
+                st.success(f" Snapshot saved to {active_project} history")
         except Exception as e:
             st.error(f"Snapshot error: {e}")
 
+    # LVI weight profile: past runs are re-scored from their stored component scores
+    with st.expander("LVI weights"):
+        wcols = st.columns(2)
+        lvi_weights = {k: wcols[i % 2].number_input(k.upper() if k == "eeat" else k.title(), min_value=0,
+                                                   max_value=100, value=int(v), step=5, key=f"lvi_weight_{k}")
+                       for i, (k, v) in enumerate(WEIGHTS.items())}
+        st.caption("Recent LVI and the trend are recomputed from the stored component scores; "
+                   "stored runs are not changed.")
+    lvi_weights = None if lvi_weights == WEIGHTS else lvi_weights
+
     # Recent LVI
     st.markdown("### Recent LVI (last 10)")
     try:
-        hist_csv = lvi_path(active_project)
-        if hist_csv.exists():
-            hist = pd.read_csv(hist_csv).tail(10)
-            if not hist.empty:
-                chart_df = hist[["timestamp","lvi"]].set_index("timestamp")
-                st.line_chart(chart_df, height=160)
-                st.dataframe(hist, use_container_width=True)
-            else:
-                st.info("No entries yet  run a snapshot.")
+        hist = app_cache.recent_history(active_project, 10, weights=lvi_weights)
+        if lvi_weights:
+            st.caption(f"Custom weights (profile {weights_hash(lvi_weights)}); stored LVI in lvi_stored.")
+        if not hist.empty:
+            chart_df = hist[["timestamp","lvi"]].set_index("timestamp")
+            st.line_chart(chart_df, height=160)
+            st.dataframe(hist, use_container_width=True)
         else:
-            st.info("No history file yet  run a snapshot.")
+            st.info("No entries yet  run a snapshot.")
     except Exception as e:
         st.error(f"LVI panel error: {e}")
+
+    # Long-range trend: raw, LTTB-downsampled or day/week/month rollups, whichever fits
+    st.markdown("### LVI trend")
+    try:
+        trend, trend_res = app_cache.trend(active_project, weights=lvi_weights)
+        if not trend.empty:
+            st.line_chart(trend, height=160)
+            st.caption(f"Resolution: {trend_res} ({len(trend)} points)")
+    except Exception as e:
+        st.error(f"LVI trend error: {e}")
     # ---------- Project ZIP Export ----------
     st.markdown("### Project Export")
     st.caption("Bundle LVI history, conversions, SEO pack, latest SERP/Plan/PDF into a single ZIP.")
@@ -253,73 +313,63 @@ except Exception as e:
             ddir = (APP_DIR / "data" / active_project)
             ddir.mkdir(parents=True, exist_ok=True)
 
-            # Load saved artifacts if they exist
-            hist_csv = ddir / "lvi_history.csv"
+            # Saved artifacts (skipped if missing)
             conv_csv = ddir / "conversions.csv"
             pack_json = ddir / "seo_pack.json"
 
-            # Prepare in-memory ZIP
-            mem = io.BytesIO()
-            with zipfile.ZipFile(mem, "w", zipfile.ZIP_DEFLATED) as z:
-
-                # LVI history
-                if hist_csv.exists():
-                    z.writestr("lvi_history.csv", pd.read_csv(hist_csv).to_csv(index=False))
-
-                # Conversions
-                if conv_csv.exists():
-                    z.writestr("conversions.csv", pd.read_csv(conv_csv).to_csv(index=False))
-
-                # Saved SEO pack
-                if pack_json.exists():
-                    z.writestr("seo_pack.json", pack_json.read_text())
-
-                # Current SERP (from session, if any)
-                serp_df = st.session_state.get("serp_df", pd.DataFrame())
-                if not serp_df.empty:
-                    z.writestr("serp_results.csv", serp_df.to_csv(index=False))
-
-                # Current Plan (from session)  write as Markdown
-                plan = st.session_state.get("plan", {})
-                if plan:
-                    md = io.StringIO()
-                    md.write(f"# Plan for {st.session_state.get('domain_cache','') or st.session_state.get('target_url_cache','')}\n\n")
-                    md.write(f"**Title:** {plan.get('suggested_title','')}\n\n")
-                    md.write(f"**Meta:** {plan.get('suggested_meta','')}\n\n")
-                    md.write("## FAQs\n")
-                    md.write(plan.get("faqs_md",""))
-                    md.write("\n\n## FAQ JSON-LD\n```json\n")
-                    md.write(plan.get("faq_jsonld",""))
-                    md.write("\n```")
-                    z.writestr("llm_plan.md", md.getvalue())
-
-                # Fresh PDF report
+            serp_df = st.session_state.get("serp_df", pd.DataFrame())
+            plan = st.session_state.get("plan", {})
+            kpi = st.session_state.get("kpi", {})
+            domain_in = st.session_state.get("domain_cache","")
+            url_in = st.session_state.get("target_url_cache","")
+
+            # Current Plan (from session)  write as Markdown
+            md = None
+            if plan:
+                md = io.StringIO()
+                md.write(f"# Plan for {domain_in or url_in}\n\n")
+                md.write(f"**Title:** {plan.get('suggested_title','')}\n\n")
+                md.write(f"**Meta:** {plan.get('suggested_meta','')}\n\n")
+                md.write("## FAQs\n")
+                md.write(plan.get("faqs_md",""))
+                md.write("\n\n## FAQ JSON-LD\n```json\n")
+                md.write(plan.get("faq_jsonld",""))
+                md.write("\n```")
+                md = md.getvalue()
+
+            # Fresh PDF report (only built when the bundle isn't cached)
+            def report_pdf():
                 try:
-                    serp_rows = serp_df.to_dict("records")
-                    # history rows for last 10
                     try:
-                        hist = pd.read_csv(hist_csv) if hist_csv.exists() else pd.DataFrame()
-                        scope = hist.tail(10) if not hist.empty else pd.DataFrame()
-                        hist_rows = scope.to_dict("records")
+                        hist_rows = tail_history(active_project, 10).to_dict("records")
                     except Exception:
                         hist_rows = []
-
-                    kpi = st.session_state.get("kpi", {})
-                    domain_in = st.session_state.get("domain_cache","")
-                    url_in = st.session_state.get("target_url_cache","")
-                    pdf_bytes = build_pdf(
+                    t_rows, t_res = trend_rows(active_project)
+                    return agents.build_pdf(
                         active_project, domain_in, url_in,
-                        kpi, serp_rows, hist_rows, plan,
-                        brand_title=f"LLMSEO Visibility Report  {active_project}"
+                        kpi, serp_df.to_dict("records"), hist_rows, plan,
+                        brand_title=f"LLMSEO Visibility Report  {active_project}",
+                        trend_rows=t_rows, trend_resolution=t_res
                     )
-                    z.writestr("report.pdf", pdf_bytes)
                 except Exception:
-                    pass
-
-            st.download_button("Save Project ZIP",
-                               data=mem.getvalue(),
-                               file_name=f"{active_project}_project_bundle.zip",
-                               mime="application/zip")
+                    return None
+
+            # Files are streamed from disk; the bundle is reused while nothing changed
+            bundle_path = zip_export.bundle([
+                ("lvi_history.csv", lambda: history_csv(active_project)),
+                ("conversions.csv", conv_csv),
+                ("seo_pack.json", pack_json),
+                ("serp_results.csv", None if serp_df.empty else serp_df.to_csv(index=False)),
+                ("llm_plan.md", md),
+                ("report.pdf", report_pdf),
+            ], fingerprint={"project": active_project, "history": history_version(active_project),
+                            "kpi": kpi, "domain": domain_in, "url": url_in})
+
+            with open(bundle_path, "rb") as bundle_file:
+                st.download_button("Save Project ZIP",
+                                   data=bundle_file,
+                                   file_name=f"{active_project}_project_bundle.zip",
+                                   mime="application/zip")
         except Exception as e:
             st.error(f"Export error: {e}")
 
@@ -343,6 +393,7 @@ with col2:
 
 # cache for sidebar snapshot
 st.session_state["project"] = project
+llm_usage.set_project(project)  # LLM calls in this run (and jobs started from it) are accounted to the project
 st.session_state["domain_cache"] = domain
 st.session_state["target_url_cache"] = target_url
 st.session_state["keywords_text"] = keywords
@@ -362,41 +413,95 @@ if "serp_df" not in st.session_state: st.session_state["serp_df"] = pd.DataFrame
 if "audit_result" not in st.session_state: st.session_state["audit_result"] = {}
 if "kpi" not in st.session_state: st.session_state["kpi"] = {}
 if "plan" not in st.session_state: st.session_state["plan"] = {}
-if "gauge_nonce" not in st.session_state: st.session_state["gauge_nonce"] = 0
 
 # === Generate LLM Plan ===
 if run_plan:
     kw_list = [k.strip() for k in keywords.splitlines() if k.strip()]
     res = st.session_state.get("audit_result") or {}
     kpi = st.session_state.get("kpi", {})
-    plan = _build_llm_plan(engine, domain, target_url, kw_list, res, kpi)
-    st.session_state["plan"] = plan
-
     st.subheader("LLM Recommendations")
-    st.markdown(f"**Suggested Title:** {plan.get('suggested_title','')}")
-    st.markdown(f"**Meta Description:** {plan.get('suggested_meta','')}")
+    title_box = st.empty()
+    title_box.markdown("_Drafting title and meta description…_")
     st.markdown("### FAQs (Markdown)")
-    st.markdown(plan.get("faqs_md","") or "_(No FAQs generated  check your engine key)_")
+    faq_box = st.empty()
+    faq_box.markdown("_Waiting for the first FAQ…_")
+
+    def faq_md(pairs):
+        return "\n\n".join(f"**Q:** {p.get('q', '')}\n**A:** {p.get('a', '')}" for p in pairs)
+
+    # render as the plan streams in; partial answers are redrawn at most ~8x/second
+    plan, pairs, redrawn = {}, [], 0.0
+    for kind, value in agents.stream_llm_plan(engine, domain, target_url, kw_list, res, kpi, hedge=hedge):
+        if kind == "titles":
+            title_box.markdown(f"**Suggested Title:** {value.get('title','')}\n\n**Meta Description:** {value.get('meta','')}")
+        elif kind == "item":
+            pairs.append(value)
+            faq_box.markdown(faq_md(pairs))
+            redrawn = time.monotonic()
+        elif kind == "partial" and time.monotonic() - redrawn > 0.12:
+            faq_box.markdown(faq_md(pairs + [value]) + " ▌")
+            redrawn = time.monotonic()
+        elif kind == "plan":
+            plan = value
+    st.session_state["plan"] = plan
+
+    title_box.markdown(f"**Suggested Title:** {plan.get('suggested_title','')}\n\n"
+                       f"**Meta Description:** {plan.get('suggested_meta','')}")
+    faq_box.markdown(plan.get("faqs_md","") or "_(No FAQs generated  check your engine key)_")
     st.markdown("### FAQPage JSON-LD")
     st.code(plan.get("faq_jsonld","") or "// No JSON-LD generated  check your engine key", language="json")
+    lat = (plan.get("metadata") or {}).get("latency_ms", {})
+    if lat:
+        served = plan["metadata"].get("served_by", {})
+        st.caption(f"Plan latency: {lat.get('total', 0):.0f} ms, first content after {lat.get('first_content', 0):.0f} ms "
+                   f"(titles {lat.get('titles', 0):.0f} ms via {served.get('titles', '?')}, "
+                   f"FAQs {lat.get('faqs', 0):.0f} ms via {served.get('faqs', '?')}"
+                   f"{', streamed' if plan['metadata'].get('streamed') else ''}, run concurrently)")
+    cs = agents.get_cache().stats()
+    st.caption(f"LLM response cache: {cs['hits']} hits / {cs['hits'] + cs['misses']} lookups, {cs['entries']} cached answers")
+
+# === Batch plan: every page in the SEO pack ===
+with st.expander("Batch plan for all SEO pack pages"):
+    pack_pages = (st.session_state.get("seo_pack") or {}).get("pages") or []
+    st.caption(f"{len(pack_pages)} pages in the loaded SEO pack. Pages are packed into a few structured "
+               "prompts per token budget and the batches run concurrently.")
+    if st.button("Plan all pages", key="batch_plan_btn", disabled=not pack_pages):
+        start_job("batch", agents.plan_pages, st.session_state["seo_pack"], engine)
+    batch = job_panel("batch")
+    if batch is not None:
+        bm = batch["metadata"]
+        st.caption(f"{bm['pages']} pages in {bm['calls']} LLM calls, {bm['latency_ms'] / 1000:.1f}s "
+                   f"({bm['ms_per_page']:.0f} ms/page); {bm['retried_items']} items re-requested, "
+                   f"{len(bm['failed'])} left on placeholders")
+        st.dataframe(pd.DataFrame([{"path": path, "status": v["status"], "title": v["title"], "meta": v["meta"]}
+                                   for path, v in batch["pages"].items()]), use_container_width=True)
+        st.download_button(" Download batch plan (JSON)", data=json.dumps(batch, indent=2),
+                           file_name=f"{project}_batch_plan.json", mime="application/json")
 
 # === One-click Snapshot (center button) ===
 if snapshot:
-    df = st.session_state.get("serp_df", pd.DataFrame())
-st.divider()
-try:
-    build_env = "Cloud build" if os.getenv("STREAMLIT_RUNTIME") else "Local build"
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-    st.caption(f" LLMSEO Portal v1.0  {build_env} (updated {timestamp})")
-except Exception as e:
-    st.caption(f" LLMSEO Portal v1.0  Version info error: {e}")
-st.divider()
-try:
-    build_env = "Cloud build" if os.getenv("STREAMLIT_RUNTIME") else "Local build"
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-    st.caption(f" LLMSEO Portal v1.0  {build_env} (updated {timestamp})")
-except Exception as e:
-    st.caption(f" LLMSEO Portal v1.0  Version info error: {e}")
+    kw_list = [k.strip() for k in keywords.splitlines() if k.strip()]
+    start_job("snapshot", agents.run_snapshot, project, domain, target_url, kw_list,
+              location=location, use_crawlbase=st.session_state.get("use_crawlbase", False),
+              serp_df=st.session_state.get("serp_df", pd.DataFrame()),
+              audit_result=st.session_state.get("audit_result") or {},
+              plan=st.session_state.get("plan") or {},
+              logo_bytes=st.session_state.get("logo_bytes"), engine=engine)
+
+def _apply_snapshot(snap: dict):
+    st.session_state["serp_df"] = snap["serp_df"]
+    st.session_state["audit_result"] = snap["audit_result"]
+    st.session_state["kpi"] = snap["kpi"]
+    st.session_state["plan"] = snap["plan"]
+
+snap = job_panel("snapshot", apply=_apply_snapshot)
+if snap:
+    snap_project = snap["row"].get("project") or project
+    st.download_button(" Download Snapshot (ZIP)", data=snap["zip_bytes"], file_name=f"{snap_project}_snapshot.zip", mime="application/zip")
+    st.success("Snapshot ready.")
+    timings = snap.get("timings", {})
+    if timings:
+        st.caption("Stage timings: " + "  ".join(f"{k} {v:.1f}s" for k, v in timings.items()))
 st.divider()
 try:
     build_env = "Cloud build" if os.getenv("STREAMLIT_RUNTIME") else "Local build"
@@ -404,80 +509,6 @@ try:
     st.caption(f" LLMSEO Portal v1.0  {build_env} (updated {timestamp})")
 except Exception as e:
     st.caption(f" LLMSEO Portal v1.0  Version info error: {e}")
-    kw_list = [k.strip() for k in keywords.splitlines() if k.strip()]
-    if df.empty and domain and kw_list:
-        rows = run_serp_queries(domain, kw_list, gl=location)
-        df = pd.DataFrame(rows)
-        st.session_state["serp_df"] = df
-
-    res = st.session_state.get("audit_result") or {}
-    if not res and target_url:
-        use_cb = st.session_state.get("use_crawlbase", False)
-        res = audit_url(target_url, use_crawlbase=use_cb)
-        st.session_state["audit_result"] = res
-
-    serp_score = serp_score_from_df(df, domain) if not df.empty else 50
-    kpi = compute_kpis(res or {}, serp_score)
-    psi_speed, _ = fetch_lighthouse_perf(target_url, strategy="mobile") if target_url else (-1, {})
-    if psi_speed >= 0:
-        kpi["speed_score"] = psi_speed
-        kpi["lvi"] = combine_lvi(kpi["serp_score"], kpi["technical_score"], kpi["content_score"], kpi["eeat_score"], kpi["speed_score"])
-    st.session_state["kpi"] = kpi
-
-    if not st.session_state.get("plan"):
-        suggested = draft_titles_and_meta(
-            url=target_url or f"https://{domain}",
-            page_title=res.get("title",""),
-            h1_count=res.get("h1_count",0),
-            lvi=kpi.get("lvi",0),
-            target_keywords=kw_list[:5]
-        )
-        faq_pack = draft_faqs_and_schema(f"{domain} oxygen", kw_list[:3] + [
-            "Can I fly with a portable oxygen concentrator in the UK?",
-            "Portable vs home oxygen concentrators: which is right for me?",
-        ])
-        st.session_state["plan"] = {
-            "suggested_title": suggested.get("title",""),
-            "suggested_meta": suggested.get("meta",""),
-            "faqs_md": faq_pack.get("faqs_md",""),
-            "faq_jsonld": faq_pack.get("faq_jsonld","")
-        }
-
-    ddir = proj_dir(project)
-    hist_path = ddir / "lvi_history.csv"
-    ts = datetime.datetime.utcnow().isoformat(timespec="seconds")
-    row = {"timestamp": ts, "project": project, "domain": domain or "", "url": target_url, **kpi}
-    if hist_path.exists():
-        pd.concat([pd.read_csv(hist_path), pd.DataFrame([row])]).to_csv(hist_path, index=False)
-    else:
-        pd.DataFrame([row]).to_csv(hist_path, index=False)
-
-    # build PDF + ZIP download
-    serp_rows = df.to_dict("records")
-    try:
-        hist = pd.read_csv(hist_path)
-        scope = hist[(hist["project"] == project) & (hist["domain"] == (domain or ""))].tail(10)
-        hist_rows = scope.to_dict("records")
-    except Exception:
-        hist_rows = []
-
-    pdf_bytes = build_pdf(project, domain, target_url, kpi, serp_rows, hist_rows, st.session_state.get("plan", {}),
-                          brand_title=f"LLMSEO Visibility Report  {project or domain}",
-                          logo_bytes=st.session_state.get("logo_bytes"))
-
-    mem = io.BytesIO()
-    with zipfile.ZipFile(mem, "w", zipfile.ZIP_DEFLATED) as z:
-        z.writestr("report.pdf", pdf_bytes)
-        if not df.empty:
-            z.writestr("serp_results.csv", df.to_csv(index=False))
-        z.writestr("lvi_history.csv", pd.read_csv(hist_path).to_csv(index=False))
-        p = st.session_state["plan"]
-        plan_md = io.StringIO()
-        plan_md.write(f"# Plan for {domain or target_url}\n\n**Title:** {p.get('suggested_title','')}\n\n**Meta:** {p.get('suggested_meta','')}\n\n## FAQs\n{p.get('faqs_md','')}\n\n## FAQ JSON-LD\n```json\n{p.get('faq_jsonld','')}\n```")
-        z.writestr("llm_plan.md", plan_md.getvalue())
-
-    st.download_button(" Download Snapshot (ZIP)", data=mem.getvalue(), file_name=f"{project}_snapshot.zip", mime="application/zip")
-    st.success("Snapshot ready.")
 
 # === SERP ===
 if run_serp:
@@ -485,14 +516,16 @@ if run_serp:
         st.error("Please enter a domain and at least one keyword.")
     else:
         kw_list = [k.strip() for k in keywords.splitlines() if k.strip()]
-        rows = run_serp_queries(domain, kw_list, gl=location)
-        df = pd.DataFrame(rows)
-        st.session_state["serp_df"] = df
-        st.subheader("SERP Results (Top 10 per keyword)")
-        st.dataframe(df, use_container_width=True)
-        if not df.empty:
-            csv = df.to_csv(index=False).encode("utf-8")
-            st.download_button(" Download SERP CSV", data=csv, file_name="serp_results.csv", mime="text/csv")
+        start_job("serp", agents.run_serp_queries, domain, kw_list, gl=location)
+
+serp_rows = job_panel("serp", apply=lambda rows: st.session_state.__setitem__("serp_df", pd.DataFrame(rows)))
+if serp_rows is not None:
+    df = pd.DataFrame(serp_rows)
+    st.subheader("SERP Results (Top 10 per keyword)")
+    st.dataframe(df, use_container_width=True)
+    if not df.empty:
+        csv = df.to_csv(index=False).encode("utf-8")
+        st.download_button(" Download SERP CSV", data=csv, file_name="serp_results.csv", mime="text/csv")
 
 # === COMPARE ===
 if run_compare:
@@ -504,21 +537,38 @@ if run_compare:
             st.error("Please enter at least one competitor domain (one per line).")
         else:
             kw_list = [k.strip() for k in keywords.splitlines() if k.strip()]
-            compare_rows = run_serp_compare(domain, comp_lines[:2], kw_list, gl=location)
-            cdf = pd.DataFrame(compare_rows)
-            st.subheader("Competitor Compare (first position in top 10)")
-            st.dataframe(cdf, use_container_width=True)
-            st.caption("Wins/Losses summary")
-            wins = {"us": 0}
-            for row in compare_rows:
-                w = row.get("winner")
-                if w == "us": wins["us"] += 1
-                elif w and w not in ("-", "tie") and not str(w).startswith("ERROR"):
-                    wins[w] = wins.get(w, 0) + 1
-            st.json(wins)
-            if not cdf.empty:
-                csv = cdf.to_csv(index=False).encode("utf-8")
-                st.download_button(" Download Compare CSV", data=csv, file_name="competitor_compare.csv", mime="text/csv")
+            start_job("compare", _compare_job, domain, comp_lines[:2], kw_list, location)
+
+compare = job_panel("compare")
+if compare is not None:
+    compare_rows = compare["rows"]
+    cmp_domains = [compare["domain"]] + compare["competitors"]
+    cdf = pd.DataFrame(compare_rows)
+    st.subheader("Competitor Compare (first position in top 10)")
+    st.dataframe(cdf, use_container_width=True)
+    st.caption("Wins/Losses summary")
+    wins = {"us": 0}
+    for row in compare_rows:
+        w = row.get("winner")
+        if w == "us": wins["us"] += 1
+        elif w and w not in ("-", "tie") and not str(w).startswith("ERROR"):
+            wins[w] = wins.get(w, 0) + 1
+    st.json(wins)
+    if not cdf.empty:
+        csv = cdf.to_csv(index=False).encode("utf-8")
+        st.download_button(" Download Compare CSV", data=csv, file_name="competitor_compare.csv", mime="text/csv")
+
+    # SERP score for us + every competitor from the last SERP run (one groupby pass)
+    serp_df = st.session_state.get("serp_df", pd.DataFrame())
+    if not serp_df.empty:
+        st.caption("SERP score by domain (from last SERP run)")
+        scores = agents.serp_scores_grouped(serp_df, domains=cmp_domains)
+        st.dataframe(scores, use_container_width=True)
+        per_kw = agents.serp_scores_grouped(serp_df, by="keyword", domains=cmp_domains)
+        st.dataframe(per_kw.pivot(index="keyword", columns="domain", values="serp_score"),
+                     use_container_width=True)
+    else:
+        st.caption("Run SERP first to see SERP scores by domain.")
 
 # === AUDIT + KPIs ===
 if run_audit:
@@ -526,7 +576,7 @@ if run_audit:
         st.error("Enter a specific URL to audit (e.g., a product or guide page).")
     else:
         use_cb = st.session_state.get("use_crawlbase", False)
-        res = audit_url(target_url, use_crawlbase=use_cb)
+        res = agents.audit_url(target_url, use_crawlbase=use_cb)
         st.session_state["audit_result"] = res
 
         st.subheader("On-page Audit (raw)")
@@ -540,27 +590,21 @@ if run_audit:
             st.json(res.get("lvi_breakdown", {}))
 
             serp_df = st.session_state.get("serp_df", pd.DataFrame())
-            serp_score = serp_score_from_df(serp_df, domain) if domain else 50
-            kpi = compute_kpis(res, serp_score)
+            serp_score = agents.serp_score_from_df(serp_df, domain) if domain else 50
+            kpi = agents.compute_kpis(res, serp_score)
             st.session_state["kpi"] = kpi
 
             st.subheader("KPI Gauges and Overall LVI")
-            st.session_state["gauge_nonce"] += 1
-            render_kpi_gauges(kpi, key_prefix=f"kpi-{st.session_state['gauge_nonce']}")
+            render_kpi_gauges(kpi)
 
             ts = datetime.datetime.utcnow().isoformat(timespec="seconds")
             ddir = proj_dir(project)
-            hist_path = ddir / "lvi_history.csv"
             row = {"timestamp": ts, "project": project, "domain": domain or "", "url": target_url, **kpi}
-            if hist_path.exists():
-                pd.concat([pd.read_csv(hist_path), pd.DataFrame([row])]).to_csv(hist_path, index=False)
-            else:
-                pd.DataFrame([row]).to_csv(hist_path, index=False)
+            append_row(row)
 
             st.caption("Recent LVI trend (per project)")
             try:
-                hist = pd.read_csv(hist_path)
-                scope = hist[(hist["project"] == project) & (hist["domain"] == (domain or ""))].tail(10)
+                scope = tail_history(project, 10, domain or "")
                 if not scope.empty:
                     chart_df = scope[["timestamp","lvi"]].set_index("timestamp")
                     st.line_chart(chart_df, height=180)
@@ -598,11 +642,11 @@ if run_audit:
 if semrush_enrich:
     try:
         st.subheader("SEMrush  Domain Overview")
-        csv_text = get_domain_overview(domain or "", database=location)
+        csv_text = agents.get_domain_overview(domain or "", database=location)
         st.code(csv_text[:1200] + ("..." if len(csv_text) > 1200 else ""), language="csv")
 
         st.subheader("SEMrush  Top Organic Keywords")
-        csv_kw = get_domain_top_keywords(domain or "", database=location, limit=25)
+        csv_kw = agents.get_domain_top_keywords(domain or "", database=location, limit=25)
         st.code(csv_kw[:2000] + ("..." if len(csv_kw) > 2000 else ""), language="csv")
         st.caption("Tip: we can parse this CSV text into a DataFrame once you confirm the SEMrush plan/API units.")
     except Exception as e:
@@ -610,12 +654,8 @@ if semrush_enrich:
 
 # === PDF export ===
 if download_pdf:
-    ddir = proj_dir(project)
-    hist_path = ddir / "lvi_history.csv"
     try:
-        hist = pd.read_csv(hist_path)
-        scope = hist[(hist["project"] == project) & (hist["domain"] == (domain or ""))].tail(10)
-        hist_rows = scope.to_dict("records")
+        hist_rows = tail_history(project, 10, domain or "").to_dict("records")
     except Exception:
         hist_rows = []
 
@@ -623,10 +663,47 @@ if download_pdf:
     plan = st.session_state.get("plan", {})
     kpi = st.session_state.get("kpi", {})
 
-    pdf_bytes = build_pdf(project, domain, target_url, kpi, serp_rows, hist_rows, plan,
-                          brand_title=f"LLMSEO Visibility Report  {project or domain}")
+    t_rows, t_res = trend_rows(project, domain or "")
+    pdf_bytes = agents.build_pdf(project, domain, target_url, kpi, serp_rows, hist_rows, plan,
+                          brand_title=f"LLMSEO Visibility Report  {project or domain}",
+                          trend_rows=t_rows, trend_resolution=t_res)
     st.download_button(" Download Branded PDF", data=pdf_bytes,
                        file_name=f"LLMSEO_{project or 'report'}.pdf", mime="application/pdf")
 
+# === SIDEBAR: LLM usage (after this run's calls) ===
+with st.sidebar:
+    st.markdown("### LLM Usage (today)")
+    try:
+        usage = llm_usage.summary(project)
+        new_budget = st.number_input("Daily LLM budget (USD, 0 = no limit)", min_value=0.0, step=1.0,
+                                     value=float(usage["budget"]), key=f"llm_budget_{project}",
+                                     help="At 80% of the budget calls switch to each engine's cheaper model; "
+                                          "at 100% only cached answers are served.")
+        if new_budget != usage["budget"]:
+            llm_usage.set_budget(project, new_budget)
+            usage = llm_usage.summary(project)
+        spend_txt = f"${usage['spend']:.4f}" + (f" of ${usage['budget']:.2f}" if usage["budget"] else "")
+        st.metric("Spend", spend_txt)
+        if usage["budget"]:
+            st.progress(min(1.0, usage["spend"] / usage["budget"]))
+        if usage["state"] != "ok":
+            st.warning("Budget nearly used: cheaper models in use." if usage["state"] == "downgrade"
+                       else "Budget used up: serving cached answers only.")
+        st.caption(f"{usage['calls']} calls, {usage['cache_hits']} served from cache; "
+                   f"{usage['prompt_tokens']:,} prompt + {usage['completion_tokens']:,} completion tokens")
+        fmt_ms = lambda v: "–" if v is None else (">60s" if v == float("inf") else f"≤{v / 1000:.1f}s")
+        if usage["by_engine"]:
+            st.dataframe(pd.DataFrame([{"engine": e, "calls": r["calls"], "cost $": round(r["cost_usd"], 4),
+                                        "p50": fmt_ms(r["p50_ms"]), "p90": fmt_ms(r["p90_ms"]), "p99": fmt_ms(r["p99_ms"])}
+                                       for e, r in usage["by_engine"].items()]),
+                         hide_index=True, use_container_width=True)
+    except Exception as e:
+        st.caption(f"LLM usage unavailable: {e}")
+
 st.markdown(f"<div style='text-align:center; color:gray; font-size: 0.8em;'>{get_app_version()}</div>", unsafe_allow_html=True)
+app_cache.rerun_caption()
+# LLM, cache and job metrics are recorded in this process: serve them when METRICS_PORT is set
+app_cache.metrics_server()
+# The page is rendered: import the agent modules in the background so the first button click is fast
+app_cache.warm_agents()
 
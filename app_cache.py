@@ -0,0 +1,145 @@
+# app_cache.py
+"""
+Streamlit caching for the portal's per-rerun reads.
+
+File-backed data is cached with st.cache_data, keyed on a cheap change token
+(directory/file mtime, or history_store.history_version), so edits from this
+app, another session or the weekly cron show up on the next rerun without a
+TTL. Shared clients are cached with st.cache_resource; figures with st.cache_data
+(as plain dicts, copied per caller).
+
+Set LLMSEO_PROFILE_RERUN=1 to show the script rerun time in the footer;
+bench_app_rerun.py compares idle reruns with and without the history caching.
+"""
+
+import functools, json, os, subprocess, time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+from history_store import history_version, tail_history
+from kpi_scoring import recompute_history_lvi
+from lvi_trends import trend_series
+
+PROFILE_RERUN = os.getenv("LLMSEO_PROFILE_RERUN", "").lower() in ("1", "true", "yes")
+
+
+def _mtime(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+# ---------- Projects / SEO packs ----------
+@st.cache_data(show_spinner=False)
+def _project_names(root: str, mtime: int) -> list:
+    return sorted(p.name for p in Path(root).glob("*") if p.is_dir())
+
+def project_names(root: Path) -> list:
+    """Sub-directories of the data dir; re-globbed only when the directory changes."""
+    return _project_names(str(root), _mtime(root))
+
+
+@st.cache_data(show_spinner=False)
+def _read_pack(path: str, mtime: int) -> dict:
+    try:
+        return json.loads(Path(path).read_text())
+    except Exception:
+        return {}
+
+def read_pack(path: Path) -> dict:
+    """Parsed seo_pack.json (a fresh copy per call), {} if missing or invalid."""
+    if not path.exists():
+        return {}
+    return _read_pack(str(path), _mtime(path))
+
+
+# ---------- LVI history ----------
+def _profile(weights: Optional[dict]) -> Optional[tuple]:
+    return tuple(sorted(weights.items())) if weights else None
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _recent_history(project: str, n: int, domain: Optional[str], profile: Optional[tuple],
+                    version: tuple) -> pd.DataFrame:
+    hist = tail_history(project, n, domain)
+    if not profile:
+        return hist
+    return recompute_history_lvi(hist, dict(profile), history_key=("recent", project, n, domain, version))
+
+def recent_history(project: str, n: int = 10, domain: Optional[str] = None,
+                   weights: Optional[dict] = None) -> pd.DataFrame:
+    """Last n runs; with `weights`, LVI re-scored under that profile (original in lvi_stored)."""
+    return _recent_history(project, n, domain, _profile(weights), history_version(project))
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _trend(project: str, domain: Optional[str], kpi: str, max_points: int, profile: Optional[tuple],
+           version: tuple):
+    return trend_series(project, domain, kpi, max_points, weights=dict(profile) if profile else None)
+
+def trend(project: str, domain: Optional[str] = None, kpi: str = "lvi", max_points: int = 200,
+          weights: Optional[dict] = None):
+    """Cached lvi_trends.trend_series -> (frame, resolution)."""
+    return _trend(project, domain, kpi, max_points, _profile(weights), history_version(project))
+
+
+# ---------- Resources ----------
+@st.cache_resource(show_spinner=False)
+def openai_client(api_key: str):
+    """One OpenAI client (and its HTTP connection pool) per key, shared by all sessions."""
+    from llmseo_agent import make_client
+    return make_client(api_key)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def gauge_panel(values: tuple, _factory) -> dict:
+    """
+    Composite KPI gauge memoized on the clamped KPI tuple, as the figure's dict:
+    cache_data hands every caller its own copy, so no session shares a mutable figure.
+    """
+    return _factory(values).to_dict()
+
+
+@st.cache_resource(show_spinner=False)
+def metrics_server():
+    """Expose this process's metrics registry on METRICS_PORT (once per process; off when unset)."""
+    import metrics
+    return metrics.serve_from_env()
+
+
+# ---------- Build metadata ----------
+@functools.lru_cache(maxsize=1)
+def app_version() -> str:
+    """Short git SHA, resolved once per process (not on every rerun)."""
+    sha = os.getenv("LLMSEO_BUILD_SHA", "")
+    if not sha:
+        try:
+            sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                          cwd=Path(__file__).resolve().parent,
+                                          stderr=subprocess.DEVNULL, timeout=5).decode("utf-8").strip()
+        except Exception:
+            return "Version: Local build"
+    return f"Version: {sha}"
+
+
+# ---------- Agent warm-up ----------
+@functools.lru_cache(maxsize=1)
+def warm_agents():
+    """Import the agent modules on a background thread, once per process, after the first page is up."""
+    import agents
+    return agents.preload()
+
+
+# ---------- Profiling ----------
+def rerun_started() -> None:
+    if PROFILE_RERUN:
+        st.session_state["_rerun_t0"] = time.perf_counter()
+
+def rerun_caption() -> None:
+    t0 = st.session_state.get("_rerun_t0") if PROFILE_RERUN else None
+    if t0 is not None:
+        st.caption(f"Script rerun: {(time.perf_counter() - t0) * 1000:.0f} ms")
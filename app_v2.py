@@ -6,10 +6,15 @@
 # - Export ZIP + optional SERP enrich
 # - Everything degrades gracefully if optional libs are missing
 
-import os, json, zipfile, datetime
+import os, json, datetime
 from textwrap import dedent
 import streamlit as st
 
+from zip_export import export_to
+from export_index import get_index
+from project_state import get_project_store
+from competitor_enrich import enrich_keyword, enrich_keywords
+
 # ===== debug caption =====
 try:
     st.caption(__file__)
@@ -41,6 +46,7 @@ AUTO_CFG = "auto_projects.json"
 PROJECTS_DIR = "projects"
 EXPORTS_DIR = "exports"
 PDF_DIR = os.path.join(EXPORTS_DIR, "pdf")
+RUNS_PAGE_SIZE = 25
 os.makedirs(EXPORTS_DIR, exist_ok=True)
 
 # ===== helpers =====
@@ -73,8 +79,8 @@ def save_auto_cfg(cfg: dict):
         json.dump(cfg, f, indent=2)
 
 def save_project_snapshot(project: str, domain: str, target_url: str, location: str,
-                          keywords_text: str, competitors_text: str):
-    os.makedirs(PROJECTS_DIR, exist_ok=True)
+                          keywords_text: str, competitors_text: str) -> bool:
+    """Queue the project inputs for saving; only written (debounced, atomically) when they changed."""
     snap = {
         "project": project,
         "domain": domain,
@@ -84,8 +90,7 @@ def save_project_snapshot(project: str, domain: str, target_url: str, location:
         "competitors": [c.strip() for c in competitors_text.splitlines() if c.strip()],
         "ts": datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     }
-    with open(os.path.join(PROJECTS_DIR, f"{project.replace(' ','_')}.json"), "w", encoding="utf-8") as f:
-        json.dump(snap, f, indent=2)
+    return get_project_store(PROJECTS_DIR).save(snap)
 
 # ===== content generators =====
 def build_seo_brief(domain: str, url: str, keywords_text: str, location: str, competitors_text: str="") -> str:
@@ -209,27 +214,17 @@ def build_faq_json_ld(domain: str, faq_pairs: list) -> str:
 def serp_enrich(head_kw: str, location: str, max_urls: int=3, timeout: int=10) -> dict:
     if not HAS_SERP:
         return {"engine":"disabled","results":[],"error":"requests/bs4 not installed"}
-    try:
-        r = requests.get("https://duckduckgo.com/html/", params={"q": head_kw}, timeout=timeout, headers={"User-Agent":"Mozilla/5.0"})
-        soup = BeautifulSoup(r.text, "html.parser")
-        links = []
-        for a in soup.select("a.result__a")[:max_urls]:
-            href = a.get("href")
-            if href and href.startswith("http"):
-                links.append(href)
-        results = []
-        for url in links:
-            try:
-                pr = requests.get(url, timeout=timeout, headers={"User-Agent":"Mozilla/5.0"})
-                psoup = BeautifulSoup(pr.text, "html.parser")
-                h1 = psoup.find("h1").get_text(strip=True) if psoup.find("h1") else ""
-                h2s = [h.get_text(strip=True) for h in psoup.find_all("h2")[:6]]
-                results.append({"url": url, "h1": h1, "h2": h2s})
-            except Exception:
-                results.append({"url": url, "h1": "", "h2": []})
-        return {"engine":"duckduckgo","results":results}
-    except Exception as e:
-        return {"engine":"duckduckgo","results":[],"error":str(e)}
+    # concurrent, early-stopping fetch with a shared page cache (competitor_enrich)
+    return enrich_keyword(head_kw, location, max_urls=max_urls, timeout=timeout)
+
+def serp_enrich_many(keywords_text: str, location: str, max_urls: int=3, timeout: int=10) -> dict:
+    kws = [k.strip() for k in (keywords_text or "").splitlines() if k.strip()]
+    if not HAS_SERP:
+        return {"engine":"disabled","results":[],"error":"requests/bs4 not installed"}
+    by_kw = enrich_keywords(kws, location, max_urls=max_urls, timeout=timeout)
+    head = by_kw.get(kws[0], {}) if kws else {}
+    return {"engine": "duckduckgo", "results": head.get("results", []), "by_keyword": by_kw,
+            **({"error": head["error"]} if head.get("error") else {})}
 
 def export_project_zip(project_name: str,
                        brief: str, keywords_text: str,
@@ -258,16 +253,17 @@ def export_project_zip(project_name: str,
         "keywords": [k.strip() for k in keywords_text.splitlines() if k.strip()],
         "competitors": [c.strip() for c in competitors_text.splitlines() if c.strip()],
         "serp": serp_data or {},
-        "created_at": ts,
     }
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr("seo_brief.txt", brief or "")
-        zf.writestr("keywords.txt", keywords_text or "")
-        zf.writestr("snapshot.json", json.dumps(snapshot, indent=2))
-        if long_form:
-            zf.writestr("long_form_article.md", long_form)
-        if faq_json_ld:
-            zf.writestr("faq_schema.jsonld", faq_json_ld)
+    # Built once per distinct content (zip_export cache); snapshot.json carries this
+    # export's created_at, so it is appended to the copy in exports/, not cached.
+    export_to([
+        ("seo_brief.txt", brief or ""),
+        ("keywords.txt", keywords_text or ""),
+        ("long_form_article.md", long_form or None),
+        ("faq_schema.jsonld", faq_json_ld or None),
+    ], zip_path, fingerprint={"snapshot": snapshot},
+       fresh=[("snapshot.json", json.dumps(dict(snapshot, created_at=ts), indent=2))])
+    get_index(EXPORTS_DIR).record(zip_path, project=project_name or "project", kind="zip")
     return zip_path
 def export_pdf(brief_text: str, article_text: str, faq_json: str,
                logo_bytes: bytes, company_name: str, company_site: str,
@@ -340,6 +336,7 @@ def export_pdf(brief_text: str, article_text: str, faq_json: str,
                            styles["Normal"]))
 
     doc.build(story)
+    get_index(EXPORTS_DIR).record(pdf_path, project=project_name or "project", kind="pdf")
     return pdf_path
 
 def get_app_version():
@@ -354,11 +351,10 @@ def get_app_version():
 st.title("LLMSEO – Agentic Web Portal (V2)")
 with st.expander("Projects", expanded=False):
     os.makedirs(PROJECTS_DIR, exist_ok=True)
-    proj_files = sorted([f for f in os.listdir(PROJECTS_DIR) if f.endswith(".json")])
-    names = [f.replace(".json","").replace("_"," ") for f in proj_files]
+    names = get_project_store(PROJECTS_DIR).names()
     select_name = st.selectbox("Load existing project", ["(none)"] + names, index=0)
     if select_name != "(none)":
-        snap = json.load(open(os.path.join(PROJECTS_DIR, f"{select_name.replace(' ','_')}.json"), "r"))
+        snap = get_project_store(PROJECTS_DIR).get(select_name) or {}
         project = snap.get("project","")
         domain = snap.get("domain","")
         target_url = snap.get("target_url","")
@@ -434,6 +430,7 @@ if "last_brief" in st.session_state and st.session_state["last_brief"]:
         fname = os.path.join(EXPORTS_DIR, f"brief_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.txt")
         with open(fname, "w", encoding="utf-8") as f:
             f.write(st.session_state["last_brief"])
+        get_index(EXPORTS_DIR).record(fname, project=st.session_state.get("project",""), kind="brief")
         st.success(f"Saved: {fname}")
 
 # Content & Export
@@ -453,6 +450,7 @@ with go1:
             st.session_state["long_form"] = build_long_form_article(d, u, kt, l, ct)
             st.success("Long-form article draft generated.")
 with go2:
+    enrich_all = st.checkbox("All keywords", value=False, key="serp_enrich_all")
     if st.button("🔎 SERP Enrich (top-3)", key="serp_enrich_btn"):
         kt = st.session_state.get("keywords_text","")
         head_kw = kt.splitlines()[0].strip() if kt.strip() else ""
@@ -460,9 +458,12 @@ with go2:
         if not head_kw:
             st.error("Please add at least one keyword.")
         else:
-            serp = serp_enrich(head_kw, l)
+            serp = serp_enrich_many(kt, l) if enrich_all else serp_enrich(head_kw, l)
             st.session_state["serp_data"] = serp
-            if serp.get("results"):
+            if serp.get("by_keyword"):
+                pages = sum(len(v.get("results", [])) for v in serp["by_keyword"].values())
+                st.success(f"Fetched {pages} result pages for {len(serp['by_keyword'])} keywords.")
+            elif serp.get("results"):
                 st.success(f"Fetched {len(serp['results'])} result pages.")
             else:
                 st.warning(f"No results or disabled (reason: {serp.get('error','n/a')}).")
@@ -545,15 +546,44 @@ if st.button("Save automation setting"):
     st.success("Saved automation configuration.")
 
 with st.expander("Runs (exports)", expanded=False):
-    files = sorted([f for f in os.listdir(EXPORTS_DIR) if os.path.isfile(os.path.join(EXPORTS_DIR,f))], reverse=True)
-    if not files:
+    # Reads the export index only; file bytes are loaded for the one run the user picks.
+    runs_index = get_index(EXPORTS_DIR)
+    all_runs = runs_index.entries()
+    if st.button("Rescan exports folder", key="runs_rescan"):
+        runs_index.rebuild()
+        all_runs = runs_index.entries()
+    if not all_runs:
         st.write("No exports yet.")
-    for fname in files[:200]:
-        fpath = os.path.join(EXPORTS_DIR, fname)
-        ts = datetime.datetime.fromtimestamp(os.path.getmtime(fpath)).strftime("%Y-%m-%d %H:%M")
-        st.write(f"• {fname}  —  {ts}")
-        with open(fpath, "rb") as f:
-            st.download_button("Download", data=f, file_name=fname, mime="application/octet-stream", key=f"dl_{fname}")
+    else:
+        f1, f2, f3 = st.columns([2,1,1])
+        runs_q = f1.text_input("Filter by name", key="runs_q")
+        run_projects = sorted({r["project"] for r in all_runs if r["project"]})
+        runs_proj = f2.selectbox("Project", ["(all)"] + run_projects, key="runs_project")
+        runs_kind = f3.selectbox("Kind", ["(all)"] + sorted({r["kind"] for r in all_runs}), key="runs_kind")
+        runs = runs_index.entries(project=None if runs_proj == "(all)" else runs_proj,
+                                  kind=None if runs_kind == "(all)" else runs_kind,
+                                  query=runs_q)
+        pages = max(1, -(-len(runs) // RUNS_PAGE_SIZE))
+        page = int(st.number_input("Page", min_value=1, max_value=pages, value=1, step=1,
+                                   key=f"runs_page_{runs_q}_{runs_proj}_{runs_kind}"))
+        page_runs = runs[(page - 1) * RUNS_PAGE_SIZE: page * RUNS_PAGE_SIZE]
+        st.caption(f"{len(runs)} runs  —  page {page}/{pages}")
+        st.dataframe([{"name": r["name"], "project": r["project"], "kind": r["kind"],
+                       "size_kb": round(r["size"] / 1024, 1),
+                       "modified": datetime.datetime.fromtimestamp(r["mtime"]).strftime("%Y-%m-%d %H:%M")}
+                      for r in page_runs], use_container_width=True, hide_index=True)
+        if page_runs:
+            pick = st.selectbox("Run", [r["name"] for r in page_runs], key="runs_pick")
+            if st.button("Prepare download", key="runs_prepare"):
+                st.session_state["runs_ready"] = pick
+            if st.session_state.get("runs_ready") == pick:
+                fpath = runs_index.file(pick)
+                if fpath.exists():
+                    st.download_button("Download", data=fpath.read_bytes(), file_name=fpath.name,
+                                       mime="application/octet-stream", key="runs_download")
+                else:
+                    runs_index.remove(pick)
+                    st.warning("That export no longer exists; removed it from the index.")
 
 # version footer
 st.markdown(
@@ -0,0 +1,251 @@
+# batch_planner.py
+"""
+Batched plan generation for every page of an SEO pack (seo_pack.json "pages").
+
+Instead of one titles call and one FAQ call per page, pages are packed into
+structured-output prompts under a token budget (prompt + expected answer):
+
+    {"items": [{"id": "p3", "title": "...", "meta": "..."}, ...]}
+    {"items": [{"id": "p3", "faqs": [{"q": "...", "a": "..."}, ...]}, ...]}
+
+Each returned item is validated on its own; items that are missing or invalid
+are re-packed and re-requested (LLM_BATCH_RETRIES rounds), the valid ones are
+kept. Batches run concurrently (LLM_BATCH_CONCURRENCY) on the pooled async
+clients of llm_engines, and answers go through the llm_cache like any other
+templated call. FAQ JSON-LD is built locally from the Q&A pairs, so the model
+doesn't write every answer twice.
+
+    out = plan_pages(pack, "OpenAI (default)")
+    out["pages"]["/services"] -> {"title", "meta", "faqs_md", "faq_jsonld", "status"}
+"""
+
+import asyncio, json, os, time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import llm_engines
+import llm_json
+from llm_plan_helper import faq_questions
+from llmseo_agent import placeholder_titles, placeholder_faqs, faq_fields
+
+TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "6000"))   # prompt + expected output per call
+MAX_PAGES_PER_BATCH = int(os.getenv("LLM_BATCH_MAX_PAGES", "25"))
+CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))
+RETRIES = int(os.getenv("LLM_BATCH_RETRIES", "2"))
+
+TITLE_MAX, META_MAX = 60, 155          # asked for in the prompt
+TITLE_LIMIT, META_LIMIT = 70, 175      # rejected above this (models overshoot slightly)
+FAQ_MIN, FAQ_MAX = 3, 6
+# expected answer tokens per item (JSON included)
+OUTPUT_TOKENS = {"titles": 80, "faqs": 650}
+TEMPERATURE = {"titles": 0.3, "faqs": 0.4}
+TEMPLATES = {"titles": "batch-titles-v1", "faqs": "batch-faqs-v1"}
+
+_HEADERS = {
+    "titles": f"""
+You are an SEO editor. For EACH page below, write a compelling HTML <title> (<={TITLE_MAX} chars)
+and meta description (<={META_MAX} chars) for the brand {{brand}} ({{site}}).
+Target keywords: {{keywords}}.
+Return strict JSON only: {{{{"items": [{{{{"id": "<page id>", "title": "...", "meta": "..."}}}}]}}}}
+One item per page id, in any order. No extra commentary.
+Pages:
+""",
+    "faqs": f"""
+For EACH page below, write {FAQ_MIN}–{FAQ_MAX} concise Q&A pairs (80–120 words per answer) with UK context
+where relevant, for the brand {{brand}} ({{site}}), focused on each page's topic.
+Questions to cover on every page (adapt/merge if needed): {{questions}}
+Return strict JSON only: {{{{"items": [{{{{"id": "<page id>", "faqs": [{{{{"q": "...", "a": "..."}}}}]}}}}]}}}}
+One item per page id, in any order. No extra commentary.
+Pages:
+""",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token: close enough for packing without a tokenizer."""
+    return len(text or "") // 4 + 1
+
+
+# ---------- Items ----------
+def page_items(pack: dict) -> List[dict]:
+    """One item per pack page: {"id", "path", "title", "meta", "h1", "keywords"}."""
+    keywords = [k for k in pack.get("keywords", []) if k]
+    items = []
+    for i, page in enumerate(pack.get("pages", [])):
+        items.append({"id": f"p{i}", "path": page.get("path") or f"/page-{i}",
+                      "title": page.get("title", ""), "meta": page.get("meta", ""),
+                      "h1": page.get("h1", ""), "keywords": keywords})
+    return items
+
+def _item_line(kind: str, item: dict) -> str:
+    """Only page-specific fields; pack-wide keywords/questions go in the header once per batch."""
+    line = {"id": item["id"], "path": item["path"], "current_title": item["title"], "h1": item["h1"]}
+    if kind == "titles":
+        line["current_meta"] = item["meta"]
+    return json.dumps(line, ensure_ascii=False)
+
+def _header(kind: str, pack: dict) -> str:
+    keywords = [k for k in pack.get("keywords", []) if k]
+    return _HEADERS[kind].format(brand=pack.get("brand", ""), site=pack.get("site", ""),
+                                 keywords=", ".join(keywords[:5]), questions=faq_questions(keywords))
+
+def pack_batches(kind: str, items: List[dict], header: str, budget: int = TOKEN_BUDGET,
+                 max_items: int = MAX_PAGES_PER_BATCH) -> List[List[dict]]:
+    """Greedy packing: add items while prompt + expected output stays under budget."""
+    base = estimate_tokens(header)
+    batches, current, used = [], [], base
+    for item in items:
+        cost = estimate_tokens(_item_line(kind, item)) + OUTPUT_TOKENS[kind]
+        if current and (used + cost > budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], base
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+# ---------- Validation ----------
+def _valid_titles(out: dict) -> Optional[dict]:
+    title, meta = str(out.get("title") or "").strip(), str(out.get("meta") or "").strip()
+    if not title or not meta or len(title) > TITLE_LIMIT or len(meta) > META_LIMIT:
+        return None
+    return {"title": title, "meta": meta}
+
+def _valid_faqs(out: dict) -> Optional[dict]:
+    faqs = out.get("faqs")
+    if not isinstance(faqs, list):
+        return None
+    pairs = [{"q": str(f.get("q", "")).strip(), "a": str(f.get("a", "")).strip()}
+             for f in faqs if isinstance(f, dict)]
+    pairs = [p for p in pairs if p["q"] and p["a"]]
+    if len(pairs) < FAQ_MIN:
+        return None
+    return faq_fields(pairs[:FAQ_MAX])
+
+VALIDATORS = {"titles": _valid_titles, "faqs": _valid_faqs}
+
+def parse_batch(kind: str, text: str, ids: List[str]) -> Dict[str, dict]:
+    """{id: validated fields} for the items in `ids` that came back valid."""
+    try:
+        data = llm_json.loads(text)
+    except ValueError:
+        return {}
+    rows = data.get("items") if isinstance(data, dict) else data
+    good = {}
+    for row in rows if isinstance(rows, list) else []:
+        if not isinstance(row, dict) or row.get("id") not in ids or row["id"] in good:
+            continue
+        fields = VALIDATORS[kind](row)
+        if fields is not None:
+            good[row["id"]] = fields
+    return good
+
+
+# ---------- Runner ----------
+async def _run_batch(kind: str, engine: str, header: str, batch: List[dict], sem: asyncio.Semaphore,
+                     use_cache: bool = True) -> Tuple[Dict[str, dict], Optional[str], bool]:
+    """(valid fields per id, error, served from cache). Only answers valid for every id are cached."""
+    prompt = header + "\n".join(_item_line(kind, item) for item in batch)
+    ids = [item["id"] for item in batch]
+    max_tokens = OUTPUT_TOKENS[kind] * len(batch) + 200
+    info: dict = {}
+    async with sem:
+        try:
+            text = await llm_engines.acomplete(engine, prompt, max_tokens=max_tokens, temperature=TEMPERATURE[kind],
+                                               template=TEMPLATES[kind] if use_cache else None,
+                                               validate=lambda t: len(parse_batch(kind, t, ids)) == len(ids),
+                                               info=info)
+        except Exception as e:
+            return {}, str(e), False
+    good = parse_batch(kind, text, ids)
+    if not use_cache and len(good) == len(ids):
+        # a retry skipped the cache read; a fully valid answer still replaces the miss for next time
+        llm_engines.remember(engine, prompt, text, TEMPERATURE[kind], template=TEMPLATES[kind])
+    return good, None, bool(info.get("cached"))
+
+
+async def aplan_kind(kind: str, engine: str, pack: dict, items: List[dict], stats: dict,
+                     progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, dict]:
+    """Validated fields per item id for one kind ("titles" | "faqs"); failed items are absent."""
+    header = _header(kind, pack)
+    sem = asyncio.Semaphore(max(1, CONCURRENCY))
+    done: Dict[str, dict] = {}
+    todo = list(items)
+    for attempt in range(RETRIES + 1):
+        if not todo:
+            break
+        batches = pack_batches(kind, todo, header)
+        # retries bypass the cache (template=None): a retry answer may still be only partly
+        # valid, and caching it would re-serve the gaps; _run_batch remembers fully valid ones
+        results = await asyncio.gather(*(_run_batch(kind, engine, header, b, sem, use_cache=attempt == 0)
+                                         for b in batches))
+        for b, (good, error, cached) in zip(batches, results):
+            done.update(good)
+            if error:
+                stats["errors"].append(error)
+            if cached:
+                stats["cache_hits"] += 1
+            else:   # real API calls only (failed requests included)
+                stats["calls"] += 1
+                stats["est_tokens"] += estimate_tokens(header) + sum(
+                    estimate_tokens(_item_line(kind, i)) + OUTPUT_TOKENS[kind] for i in b)
+        todo = [i for i in todo if i["id"] not in done]
+        if todo and attempt < RETRIES:
+            stats["retried_items"] += len(todo)
+        stats["done"][kind] = len(done)
+        if progress:
+            total = sum(stats["done"].values())
+            progress(total / max(1, stats["expected"]), f"{kind}: {len(done)}/{len(items)} pages")
+    return done
+
+
+async def aplan_pages(pack: dict, engine_label: str = "OpenAI (default)", kinds=("titles", "faqs"),
+                      progress: Optional[Callable[[float, str], None]] = None) -> dict:
+    engine = llm_engines.engine_name(engine_label)
+    items = page_items(pack)
+    stats = {"calls": 0, "cache_hits": 0, "est_tokens": 0, "retried_items": 0, "errors": [],
+             "done": {}, "expected": len(items) * len(kinds)}
+    started = time.perf_counter()
+    per_kind = await asyncio.gather(*(aplan_kind(k, engine, pack, items, stats, progress) for k in kinds))
+    found = dict(zip(kinds, per_kind))
+
+    pages, failed = {}, []
+    for item in items:
+        out = {"title": "", "meta": "", "faqs_md": "", "faq_jsonld": "", "status": "ok"}
+        if "titles" in found:
+            t = found["titles"].get(item["id"])
+            if t is None:
+                t, out["status"] = placeholder_titles(item["title"]), "fallback"
+            out.update(t)
+        if "faqs" in found:
+            f = found["faqs"].get(item["id"])
+            if f is None:
+                f, out["status"] = placeholder_faqs(faq_questions(item["keywords"])), "fallback"
+            out.update(f)
+        if out["status"] != "ok":
+            failed.append(item["path"])
+        pages[item["path"]] = out
+
+    elapsed = time.perf_counter() - started
+    return {"pages": pages,
+            "metadata": {"engine": engine, "pages": len(items), "calls": stats["calls"],
+                         "cache_hits": stats["cache_hits"],
+                         "est_tokens": stats["est_tokens"], "retried_items": stats["retried_items"],
+                         "failed": failed, "errors": stats["errors"][:10],
+                         "latency_ms": round(elapsed * 1000, 1),
+                         "ms_per_page": round(elapsed * 1000 / max(1, len(items)), 1)}}
+
+
+def plan_pages(pack: dict, engine_label: str = "OpenAI (default)", kinds=("titles", "faqs"),
+               progress: Optional[Callable[[float, str], None]] = None) -> dict:
+    """
+    Titles/meta and FAQs for every page in pack["pages"]:
+    {"pages": {path: {"title","meta","faqs_md","faq_jsonld","status"}},
+     "metadata": {"engine","pages","calls","cache_hits","est_tokens","retried_items","failed","errors",
+                  "latency_ms","ms_per_page"}}.
+    "calls" counts real API requests; "cache_hits" batches answered from the response cache.
+    Pages still invalid after the retries get the placeholder text and status "fallback".
+    """
+    # progress is called from the llm_engines loop thread
+    return llm_engines.run(aplan_pages(pack, engine_label, tuple(kinds), progress))
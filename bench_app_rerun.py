@@ -0,0 +1,85 @@
+# bench_app_rerun.py
+"""
+Benchmark: idle Streamlit rerun of app.py with and without the app_cache
+history/trend caching (median of N reruns, Streamlit's AppTest, no browser).
+
+Seeds a throwaway project with a long LVI history (CSV backend), renders the
+sidebar panels (Recent LVI, LVI trend) on every rerun, then removes the project.
+"uncached" swaps app_cache.recent_history / app_cache.trend for direct
+history_store / lvi_trends reads; everything else is identical.
+
+    python bench_app_rerun.py                  # 20k history rows, 10 reruns
+    python bench_app_rerun.py --rows 100000 -n 15
+"""
+import argparse, csv, os, shutil, statistics, time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ["LVI_HISTORY_BACKEND"] = "csv"   # never touch the real SQLite history
+os.environ.setdefault("LLM_CACHE", "off")
+os.environ.setdefault("LLM_USAGE", "off")
+
+ROOT = Path(__file__).resolve().parent
+PROJECT = "_bench_rerun"
+
+
+def seed_history(rows: int) -> Path:
+    from history_store import DATA_DIR, HISTORY_COLUMNS
+    d = DATA_DIR / PROJECT
+    d.mkdir(parents=True, exist_ok=True)
+    start = datetime(2024, 1, 1)
+    with open(d / "lvi_history.csv", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(HISTORY_COLUMNS)
+        for i in range(rows):
+            ts = (start + timedelta(minutes=30 * i)).isoformat(timespec="seconds")
+            w.writerow([ts, PROJECT, "example.com", "https://example.com/"] + [40 + (i * 7) % 50] * 6)
+    return d
+
+
+def median_rerun_ms(runs: int) -> float:
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=120)
+    at.session_state["project"] = PROJECT
+    at.run()                           # first run: imports, cold caches
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("-n", "--runs", type=int, default=10)
+    args = ap.parse_args()
+
+    import app_cache
+    from history_store import tail_history
+    from lvi_trends import trend_series
+
+    project_dir = seed_history(args.rows)
+    try:
+        cached = median_rerun_ms(args.runs)
+        recent, trend = app_cache.recent_history, app_cache.trend
+        app_cache.recent_history = lambda project, n=10, domain=None: tail_history(project, n, domain)
+        app_cache.trend = lambda project, domain=None, kpi="lvi", max_points=200: \
+            trend_series(project, domain, kpi, max_points)
+        try:
+            uncached = median_rerun_ms(args.runs)
+        finally:
+            app_cache.recent_history, app_cache.trend = recent, trend
+    finally:
+        shutil.rmtree(project_dir, ignore_errors=True)
+
+    print(f"history rows={args.rows}, reruns={args.runs}")
+    print(f"idle rerun, uncached history/trend : {uncached:8.1f} ms")
+    print(f"idle rerun, app_cache              : {cached:8.1f} ms  ({uncached / cached:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# bench_kpi_scoring.py
+"""
+Benchmark: scalar compute_kpis loop vs vectorized compute_kpis_frame.
+Also asserts both paths give identical results.
+
+    python bench_kpi_scoring.py            # 100k rows
+    python bench_kpi_scoring.py 250000
+"""
+import sys, time, random
+import pandas as pd
+from kpi_scoring import compute_kpis, compute_kpis_frame
+
+def synthetic_audits(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        row = {
+            "url": f"https://example.com/p/{rng.randint(0, 10**6)}",
+            "title": rng.choice(["", "Portable Oxygen Concentrators", None]),
+            "meta_description": rng.choice(["", "Buy online with fast UK delivery."]),
+            "h1_count": rng.randint(0, 3),
+            "h2_count": rng.randint(0, 8),
+            "img_alt_coverage_percent": round(rng.uniform(0, 100), 1),
+            "internal_links": rng.randint(0, 40),
+            "external_links": rng.randint(0, 10),
+            "jsonld_types": rng.choice([[], ["Product"], ["FAQPage", "Organization"]]),
+            "lvi_breakdown": {
+                "answer_blocks": rng.choice([0, 5, 15, 20]),
+                "tables_specs": rng.choice([0, 10]),
+                "eeat": rng.choice([0, 5, 10]),
+            },
+        }
+        if rng.random() < 0.05:  # some failed fetches carry only url/error/lvi
+            row = {"url": row["url"], "error": "timeout", "lvi": 0}
+        rows.append(row)
+    return rows
+
+def main(n: int = 100_000):
+    audits = synthetic_audits(n)
+    serp = [random.Random(i).randint(40, 100) for i in range(n)]
+    df = pd.DataFrame(audits)
+
+    t0 = time.perf_counter()
+    scalar = pd.DataFrame([compute_kpis(a, s) for a, s in zip(audits, serp)])
+    t_scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    frame = compute_kpis_frame(df, serp)
+    t_frame = time.perf_counter() - t0
+
+    flat = pd.json_normalize(audits)
+    t0 = time.perf_counter()
+    compute_kpis_frame(flat, serp)
+    t_flat = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(scalar, frame.reset_index(drop=True), check_dtype=False)
+    print(f"rows={n}")
+    print(f"scalar compute_kpis loop : {t_scalar*1000:9.1f} ms")
+    print(f"compute_kpis_frame       : {t_frame*1000:9.1f} ms  ({t_scalar/t_frame:.1f}x)")
+    print(f"  (json_normalize input) : {t_flat*1000:9.1f} ms")
+    print("results identical ✔")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
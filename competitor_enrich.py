@@ -0,0 +1,211 @@
+# competitor_enrich.py
+"""
+Concurrent competitor outline research (DuckDuckGo top results -> H1 + first H2s).
+
+  - keyword searches and result pages are fetched on one thread pool
+  - pages are streamed and fed to an incremental HTMLParser that stops the
+    download as soon as it has the H1 and MAX_H2 H2s (or MAX_PAGE_BYTES)
+  - a process-wide page cache (PAGE_CACHE_TTL) shares pages across keywords
+    and reruns; at most PER_DOMAIN_LIMIT concurrent requests hit one domain,
+    the search engine included
+
+    enrich_keyword("portable oxygen concentrator", "uk")
+    enrich_keywords(["kw one", "kw two", ...], "uk", max_urls=3)
+"""
+
+import codecs, os, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+try:
+    import requests
+except Exception:  # optional, like the rest of app_v2's network features
+    requests = None
+
+SEARCH_URL = "https://duckduckgo.com/html/"
+USER_AGENT = "Mozilla/5.0"
+MAX_H2 = 6
+MAX_PAGE_BYTES = int(os.getenv("ENRICH_MAX_PAGE_BYTES", str(1024 * 1024)))
+WORKERS = int(os.getenv("ENRICH_WORKERS", "16"))
+PER_DOMAIN_LIMIT = int(os.getenv("ENRICH_PER_DOMAIN", "2"))
+PAGE_CACHE_TTL = float(os.getenv("ENRICH_CACHE_TTL", str(6 * 3600)))
+PAGE_CACHE_MAX = 4096
+CHUNK = 16 * 1024
+
+
+# ---------- Parsers ----------
+class HeadingParser(HTMLParser):
+    """Collects the first H1 and the first MAX_H2 H2s; `done` once it has them."""
+
+    def __init__(self, max_h2: int = MAX_H2):
+        super().__init__(convert_charrefs=True)
+        self.max_h2 = max_h2
+        self.h1 = ""
+        self.h2: List[str] = []
+        self._tag = None
+        self._buf: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return bool(self.h1) and len(self.h2) >= self.max_h2
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("h1", "h2") and self._tag is None:
+            self._tag, self._buf = tag, []
+
+    def handle_endtag(self, tag):
+        if tag != self._tag:
+            return
+        text = " ".join("".join(self._buf).split())
+        if tag == "h1" and not self.h1:
+            self.h1 = text
+        elif tag == "h2" and len(self.h2) < self.max_h2:
+            self.h2.append(text)
+        self._tag = None
+
+    def handle_data(self, data):
+        if self._tag:
+            self._buf.append(data)
+
+
+class ResultLinkParser(HTMLParser):
+    """hrefs of DuckDuckGo HTML result links (a.result__a)."""
+
+    def __init__(self, limit: int):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a" or len(self.links) >= self.limit:
+            return
+        a = dict(attrs)
+        if "result__a" in (a.get("class") or "").split():
+            href = a.get("href") or ""
+            if href.startswith("http"):
+                self.links.append(href)
+
+
+# ---------- Fetching ----------
+_local = threading.local()
+_domain_locks: Dict[str, threading.BoundedSemaphore] = {}
+_domain_guard = threading.Lock()
+_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _session():
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = _local.session = requests.Session()
+        s.headers["User-Agent"] = USER_AGENT
+    return s
+
+def _domain_slot(url: str) -> threading.BoundedSemaphore:
+    host = (urlparse(url).hostname or "").lower()
+    with _domain_guard:
+        sem = _domain_locks.get(host)
+        if sem is None:
+            sem = _domain_locks[host] = threading.BoundedSemaphore(PER_DOMAIN_LIMIT)
+        return sem
+
+def _cached(url: str) -> Optional[dict]:
+    with _cache_lock:
+        hit = _cache.get(url)
+        if hit and time.time() - hit[0] < PAGE_CACHE_TTL:
+            _cache.move_to_end(url)
+            return dict(hit[1])
+    return None
+
+def _store(url: str, result: dict) -> None:
+    with _cache_lock:
+        _cache[url] = (time.time(), result)
+        _cache.move_to_end(url)
+        while len(_cache) > PAGE_CACHE_MAX:
+            _cache.popitem(last=False)
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def _encoding(r) -> str:
+    enc = r.encoding or "utf-8"
+    try:
+        codecs.lookup(enc)
+        return enc
+    except LookupError:
+        return "utf-8"
+
+
+def fetch_headings(url: str, timeout: int = 10) -> dict:
+    """{"url", "h1", "h2"} for one page, reading only as far as the headings."""
+    hit = _cached(url)
+    if hit is not None:
+        return hit
+    result = {"url": url, "h1": "", "h2": []}
+    try:
+        with _domain_slot(url):
+            with _session().get(url, timeout=timeout, stream=True) as r:
+                parser = HeadingParser()
+                decoder = codecs.getincrementaldecoder(_encoding(r))(errors="replace")
+                r.raw.decode_content = True
+                # read1 returns whatever has arrived instead of blocking for a full chunk
+                read_some = getattr(r.raw, "read1", r.raw.read)
+                read = 0
+                while not parser.done and read < MAX_PAGE_BYTES:
+                    chunk = read_some(CHUNK)
+                    if not chunk:
+                        break
+                    parser.feed(decoder.decode(chunk))
+                    read += len(chunk)
+                # leaving the with-block closes the connection and drops the rest of the body
+                result = {"url": url, "h1": parser.h1, "h2": parser.h2}
+    except Exception:
+        return result  # failures are not cached
+    _store(url, result)
+    return result
+
+
+def search_links(keyword: str, max_urls: int = 3, timeout: int = 10) -> List[str]:
+    with _domain_slot(SEARCH_URL):   # the search engine is a host like any other: ENRICH_PER_DOMAIN at once
+        r = _session().get(SEARCH_URL, params={"q": keyword}, timeout=timeout)
+    parser = ResultLinkParser(max_urls)
+    parser.feed(r.text)
+    return parser.links
+
+
+# ---------- Public API ----------
+def enrich_keywords(keywords: List[str], location: str = "uk", max_urls: int = 3,
+                    timeout: int = 10, workers: int = WORKERS) -> Dict[str, dict]:
+    """
+    {keyword: {"engine", "results": [{"url","h1","h2"}...], ["error"]}} for many keywords.
+    Searches run concurrently; each distinct URL is fetched once across all keywords.
+    """
+    keywords = [k.strip() for k in keywords if k and k.strip()]
+    if requests is None:
+        return {k: {"engine": "disabled", "results": [], "error": "requests not installed"} for k in keywords}
+    out: Dict[str, dict] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="enrich") as pool:
+        searches = {k: pool.submit(search_links, k, max_urls, timeout) for k in dict.fromkeys(keywords)}
+        links: Dict[str, List[str]] = {}
+        for k, fut in searches.items():
+            try:
+                links[k] = fut.result()
+            except Exception as e:
+                out[k] = {"engine": "duckduckgo", "results": [], "error": str(e)}
+        urls = dict.fromkeys(u for ls in links.values() for u in ls)
+        pages = {u: pool.submit(fetch_headings, u, timeout) for u in urls}
+        for k, ls in links.items():
+            out[k] = {"engine": "duckduckgo", "results": [pages[u].result() for u in ls]}
+    return {k: out[k] for k in dict.fromkeys(keywords)}
+
+
+def enrich_keyword(head_kw: str, location: str = "uk", max_urls: int = 3, timeout: int = 10) -> dict:
+    """Single-keyword form used by app_v2.serp_enrich."""
+    if not (head_kw or "").strip():
+        return {"engine": "duckduckgo", "results": []}
+    return enrich_keywords([head_kw], location, max_urls, timeout)[head_kw.strip()]
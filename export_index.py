@@ -0,0 +1,150 @@
+# export_index.py
+"""
+Index of files under the exports folder: name, size, mtime, project, kind.
+
+"mtime" is the time record() was called, not the file's st_mtime: zip_export
+hard-links cached bundles, so a re-export of unchanged content keeps the first
+build's st_mtime. Files only seen by rebuild() fall back to st_mtime.
+
+Writers call record() right after producing an export; the runs list reads
+the index (one small JSON file, reloaded only when it changes) instead of
+stat'ing and opening every archive on each rerun. rebuild() rescans the
+folder for a missing index or files copied in by hand.
+
+    idx = get_index("exports")
+    idx.record("exports/Acme_UK_oxygen_20250101_0900.zip", project="Acme")
+    idx.entries(project="Acme", kind="zip", query="oxygen")
+"""
+
+import json, os, tempfile, threading, time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+INDEX_NAME = "_index.json"
+KINDS = {".zip": "zip", ".pdf": "pdf", ".txt": "brief", ".md": "article", ".json": "json"}
+
+
+def kind_of(name: str) -> str:
+    return KINDS.get(Path(name).suffix.lower(), "file")
+
+
+def _guess_project(name: str, kind: str) -> str:
+    """Best effort for files written before the index existed (see app_v2 naming)."""
+    stem = Path(name).stem
+    if kind == "zip":    # <project>_<LOC>_<kw>_<YYYYmmdd>_<HHMM>
+        parts = stem.rsplit("_", 4)
+        return parts[0].replace("_", " ") if len(parts) == 5 else ""
+    if kind == "pdf":    # <project>_<YYYYmmdd>_<HHMM>
+        parts = stem.rsplit("_", 2)
+        return parts[0].replace("_", " ") if len(parts) == 3 else ""
+    return ""
+
+
+class ExportIndex:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.path = self.root / INDEX_NAME
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        self._stamp = None
+
+    # ----- persistence -----
+    def _load(self) -> None:
+        try:
+            stamp = self.path.stat().st_mtime_ns
+        except OSError:
+            self._entries, self._stamp = {}, None
+            self.rebuild()
+            return
+        if stamp == self._stamp:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self._entries = {e["name"]: e for e in data.get("entries", [])}
+        except Exception:
+            self._entries = {}
+        self._stamp = stamp
+
+    def _save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.root)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"entries": list(self._entries.values())}, f)
+        os.replace(tmp, self.path)
+        self._stamp = self.path.stat().st_mtime_ns
+
+    def _entry_at(self, p: Path, project: Optional[str], kind: Optional[str],
+                  when: Optional[float] = None) -> dict:
+        name = p.relative_to(self.root.resolve()).as_posix()
+        st = p.stat()
+        kind = kind or kind_of(name)
+        return {"name": name, "size": st.st_size, "mtime": when if when is not None else st.st_mtime,
+                "project": project if project is not None else _guess_project(p.name, kind), "kind": kind}
+
+    # ----- writers -----
+    def record(self, path, project: Optional[str] = None, kind: Optional[str] = None) -> dict:
+        """Add/refresh one export (path inside root), stamped with the current time."""
+        p = Path(path).resolve()
+        when = time.time()
+        with self._lock:
+            self._load()
+            entry = self._entry_at(p, project, kind, when)
+            self._entries[entry["name"]] = entry
+            self._save()
+        return entry
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            self._load()
+            if self._entries.pop(name, None) is not None:
+                self._save()
+
+    def rebuild(self) -> int:
+        """Rescan root (recursively), keeping known project labels and export times; returns entry count."""
+        known = dict(self._entries)
+        entries = {}
+        if self.root.exists():
+            for p in self.root.rglob("*"):
+                if not p.is_file() or p.name == INDEX_NAME or p.name.endswith(".tmp"):
+                    continue
+                e = self._entry_at(p.resolve(), None, None)
+                if e["name"] in known:
+                    e["project"] = known[e["name"]].get("project", e["project"])
+                    e["mtime"] = known[e["name"]].get("mtime", e["mtime"])
+                entries[e["name"]] = e
+        self._entries = entries
+        self._save()
+        return len(entries)
+
+    # ----- readers -----
+    def entries(self, project: Optional[str] = None, kind: Optional[str] = None, query: str = "") -> List[dict]:
+        """Newest first, optionally filtered by project, kind and a name substring."""
+        with self._lock:
+            self._load()
+            rows = list(self._entries.values())
+        q = (query or "").lower()
+        rows = [e for e in rows
+                if (project is None or e["project"] == project)
+                and (kind is None or e["kind"] == kind)
+                and (not q or q in e["name"].lower())]
+        rows.sort(key=lambda e: e["mtime"], reverse=True)
+        return rows
+
+    def file(self, name: str) -> Path:
+        p = (self.root / name).resolve()
+        if self.root.resolve() not in p.parents:
+            raise ValueError(f"'{name}' is outside the exports folder")
+        return p
+
+
+_INDEXES: Dict[str, ExportIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+def get_index(root) -> ExportIndex:
+    """Process-wide index per exports folder."""
+    key = str(Path(root).resolve())
+    with _INDEXES_LOCK:
+        idx = _INDEXES.get(key)
+        if idx is None:
+            idx = _INDEXES[key] = ExportIndex(root)
+        return idx
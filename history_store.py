@@ -0,0 +1,685 @@
+# history_store.py
+"""
+LVI history store: O(1) appends, indexed by (project, domain, timestamp),
+safe when several Streamlit sessions / cron jobs write at once.
+
+Backends (env LVI_HISTORY_BACKEND):
+- "sqlite" (default): data/lvi_history.sqlite3 in WAL mode; legacy CSVs are
+  imported on first use (per project, or all of them for cross-project reads)
+- "csv": legacy data/<project>/lvi_history.csv files, append-only under a file lock;
+  cross-project reads also include the old root data/lvi_history.csv
+
+Both can still export the classic lvi_history.csv layout.
+"""
+
+import csv, os, sqlite3, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+try:
+    import fcntl  # POSIX advisory locks; absent on Windows
+except ImportError:
+    fcntl = None
+
+HISTORY_COLUMNS = ["timestamp", "project", "domain", "url",
+                   "serp_score", "technical_score", "content_score",
+                   "eeat_score", "speed_score", "lvi"]
+_INT_COLUMNS = HISTORY_COLUMNS[4:]
+KPI_COLUMNS = _INT_COLUMNS
+RESOLUTIONS = ("day", "week", "month")
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+DEFAULT_DB = DATA_DIR / "lvi_history.sqlite3"
+
+
+def _norm(v) -> str:
+    """Project/domain key: stripped text (some project dirs carry trailing spaces)."""
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    return str(v).strip()
+
+def _int_or_none(v):
+    try:
+        if v is None or v == "" or (isinstance(v, float) and v != v):
+            return None
+        return int(float(v))
+    except (TypeError, ValueError):
+        return None
+
+def _clean_row(row: Dict) -> Dict:
+    out = {
+        "timestamp": str(row.get("timestamp") or datetime.utcnow().isoformat(timespec="seconds")),
+        "project": _norm(row.get("project")) or "default",
+        "domain": _norm(row.get("domain")),
+        "url": _norm(row.get("url")),
+    }
+    for c in _INT_COLUMNS:
+        out[c] = _int_or_none(row.get(c))
+    return out
+
+def _ts_key(v) -> Optional[str]:
+    """ISO-8601 text for range bounds (timestamps are stored as ISO strings)."""
+    if v is None:
+        return None
+    if isinstance(v, datetime):
+        return v.isoformat(timespec="seconds")
+    return str(v)
+
+def _bucket(ts: str, resolution: str) -> str:
+    """Start date of the day/week (Monday)/month bucket containing an ISO timestamp."""
+    d = datetime.fromisoformat(str(ts)[:19]).date()
+    if resolution == "week":
+        d = d - timedelta(days=d.weekday())
+    elif resolution == "month":
+        d = d.replace(day=1)
+    return d.isoformat()
+
+def _rollup_params(rows: list) -> list:
+    """UPSERT parameters for the rollup table: one per row x resolution x KPI."""
+    params = []
+    for r in rows:
+        try:
+            buckets = [(res, _bucket(r["timestamp"], res)) for res in RESOLUTIONS]
+        except ValueError:
+            continue  # unparseable timestamp: keep the raw row, skip the rollup
+        for kpi in KPI_COLUMNS:
+            v = r.get(kpi)
+            if v is None:
+                continue
+            for res, b in buckets:
+                params.append((r["project"], r["domain"], res, b, kpi, v, v, v, v, r["timestamp"]))
+    return params
+
+def _rollups_from_frame(df: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    """Same shape as SQLiteHistoryStore.rollups, computed from raw rows."""
+    cols = ["bucket", "kpi", "n", "mean", "min", "max", "last"]
+    if df.empty:
+        return pd.DataFrame(columns=cols)
+    df = df.sort_values("timestamp", kind="stable").copy()
+    def safe_bucket(t):
+        try:
+            return _bucket(t, resolution)
+        except ValueError:
+            return None
+    df["bucket"] = df["timestamp"].map(safe_bucket)
+    df = df.dropna(subset=["bucket"])
+    long = df.melt(id_vars=["bucket"], value_vars=KPI_COLUMNS, var_name="kpi", value_name="v")
+    long["v"] = pd.to_numeric(long["v"], errors="coerce")
+    long = long.dropna(subset=["v"])
+    g = long.groupby(["bucket", "kpi"], sort=True)["v"]
+    out = g.agg(n="count", mean="mean", min="min", max="max", last="last").reset_index()
+    return out[cols]
+
+def _read_lines_backwards(path: Path, block_size: int = 8192):
+    """Yield the lines of a text file last-to-first without reading the whole file."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + tail
+            lines = chunk.split(b"\n")
+            tail = lines.pop(0)  # may be partial; completed by the next block
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8").rstrip("\r")
+        if tail.strip():
+            yield tail.decode("utf-8").rstrip("\r")
+
+
+def _stat_token(path: Path) -> tuple:
+    try:
+        st = path.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return (0, 0)
+
+
+def _legacy_csvs(project: str, data_dir: Path) -> list:
+    """Legacy per-project CSVs whose directory name matches `project` once stripped."""
+    key = _norm(project)
+    if not data_dir.exists():
+        return []
+    return [p / "lvi_history.csv" for p in data_dir.iterdir()
+            if p.is_dir() and _norm(p.name) == key and (p / "lvi_history.csv").exists()]
+
+
+# ---------- SQLite (WAL) backend ----------
+class SQLiteHistoryStore:
+    backend = "sqlite"
+
+    def __init__(self, path: Path = DEFAULT_DB, data_dir: Path = DATA_DIR):
+        self.path = Path(path)
+        self.data_dir = Path(data_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._checked_legacy = set()
+        self._migrated = False
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS lvi_history (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                project TEXT NOT NULL,
+                domain TEXT NOT NULL DEFAULT '',
+                url TEXT NOT NULL DEFAULT '',
+                serp_score INTEGER, technical_score INTEGER, content_score INTEGER,
+                eeat_score INTEGER, speed_score INTEGER, lvi INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS ix_lvi_project_domain_ts ON lvi_history(project, domain, timestamp);
+            CREATE INDEX IF NOT EXISTS ix_lvi_project_ts ON lvi_history(project, timestamp);
+            CREATE TABLE IF NOT EXISTS imported_sources (
+                path TEXT PRIMARY KEY, rows INTEGER, imported_at TEXT
+            );
+            -- incremental day/week/month aggregates per KPI, maintained on every append
+            CREATE TABLE IF NOT EXISTS lvi_rollups (
+                project TEXT NOT NULL, domain TEXT NOT NULL, resolution TEXT NOT NULL,
+                bucket TEXT NOT NULL, kpi TEXT NOT NULL,
+                n INTEGER NOT NULL, total REAL NOT NULL, min REAL, max REAL,
+                last REAL, last_ts TEXT,
+                PRIMARY KEY (project, domain, resolution, bucket, kpi)
+            );
+        """)
+        c = self._conn()
+        if (c.execute("SELECT 1 FROM lvi_rollups LIMIT 1").fetchone() is None
+                and c.execute("SELECT 1 FROM lvi_history LIMIT 1").fetchone() is not None):
+            self.rebuild_rollups()
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread (Streamlit sessions run in separate threads)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            yield c
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+        else:
+            c.execute("COMMIT")
+
+    _UPSERT_ROLLUP = """
+        INSERT INTO lvi_rollups (project, domain, resolution, bucket, kpi, n, total, min, max, last, last_ts)
+        VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?, ?)
+        ON CONFLICT (project, domain, resolution, bucket, kpi) DO UPDATE SET
+            n = n + 1,
+            total = total + excluded.total,
+            min = MIN(min, excluded.min),
+            max = MAX(max, excluded.max),
+            last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+            last_ts = MAX(last_ts, excluded.last_ts)
+    """
+
+    def append(self, row: Dict) -> None:
+        r = _clean_row(row)
+        with self._tx() as c:
+            c.execute(f"INSERT INTO lvi_history ({','.join(HISTORY_COLUMNS)}) "
+                      f"VALUES ({','.join('?' * len(HISTORY_COLUMNS))})",
+                      [r[k] for k in HISTORY_COLUMNS])
+            c.executemany(self._UPSERT_ROLLUP, _rollup_params([r]))
+
+    def rebuild_rollups(self) -> None:
+        """Recompute every rollup from raw history (only needed for pre-rollup databases)."""
+        df = pd.read_sql_query(f"SELECT {','.join(HISTORY_COLUMNS)} FROM lvi_history ORDER BY timestamp, id",
+                               self._conn())
+        rows = [{k: (None if pd.isna(v) else v) for k, v in rec.items()} for rec in df.to_dict("records")]
+        with self._tx() as c:
+            c.execute("DELETE FROM lvi_rollups")
+            c.executemany(self._UPSERT_ROLLUP, _rollup_params(rows))
+
+    def import_csv(self, path: Path, project: Optional[str] = None) -> int:
+        """One-time import of a legacy lvi_history.csv (skipped if already imported)."""
+        path = Path(path)
+        key = str(path.resolve())
+        with self._tx() as c:
+            if c.execute("SELECT 1 FROM imported_sources WHERE path = ?", (key,)).fetchone():
+                return 0
+            try:
+                df = pd.read_csv(path, dtype=str, keep_default_na=False)
+            except (FileNotFoundError, pd.errors.EmptyDataError):
+                df = pd.DataFrame(columns=HISTORY_COLUMNS)
+            rows = []
+            for rec in df.to_dict("records"):
+                if project is not None and not _norm(rec.get("project")):
+                    rec["project"] = project
+                rows.append(_clean_row(rec))
+            c.executemany(f"INSERT INTO lvi_history ({','.join(HISTORY_COLUMNS)}) "
+                          f"VALUES ({','.join('?' * len(HISTORY_COLUMNS))})",
+                          [[r[k] for k in HISTORY_COLUMNS] for r in rows])
+            c.executemany(self._UPSERT_ROLLUP, _rollup_params(rows))
+            c.execute("INSERT INTO imported_sources (path, rows, imported_at) VALUES (?, ?, ?)",
+                      (key, len(rows), datetime.utcnow().isoformat(timespec="seconds")))
+        return len(rows)
+
+    def _ensure_legacy(self, project: str) -> None:
+        # The root CSV mixes projects, so per-project reads need it too: import it up front
+        # so a project's rows don't depend on whether a cross-project read ran first.
+        self._ensure_all_legacy()
+        key = _norm(project)
+        if key in self._checked_legacy:
+            return
+        for p in _legacy_csvs(key, self.data_dir):
+            self.import_csv(p, project=key)
+        self._checked_legacy.add(key)
+
+    def _ensure_all_legacy(self) -> None:
+        """Cross-project reads need every legacy CSV (root file included): migrate once per process."""
+        if not self._migrated:
+            self.migrate_legacy()
+            self._migrated = True
+
+    def read(self, project: Optional[str] = None, domain: Optional[str] = None) -> pd.DataFrame:
+        where, args = [], []
+        if project is None:
+            self._ensure_all_legacy()
+        else:
+            self._ensure_legacy(project)
+            where.append("project = ?"); args.append(_norm(project))
+        if domain is not None:
+            where.append("domain = ?"); args.append(_norm(domain))
+        sql = f"SELECT {','.join(HISTORY_COLUMNS)} FROM lvi_history"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp, id"
+        return pd.read_sql_query(sql, self._conn(), params=args)
+
+    def _where(self, project: str, domain: Optional[str]):
+        self._ensure_legacy(project)
+        where, args = ["project = ?"], [_norm(project)]
+        if domain is not None:
+            where.append("domain = ?"); args.append(_norm(domain))
+        return where, args
+
+    def tail(self, project: str, n: int = 10, domain: Optional[str] = None) -> pd.DataFrame:
+        """Last `n` runs (oldest first) via the (project, domain, timestamp) index."""
+        where, args = self._where(project, domain)
+        sql = (f"SELECT {','.join(HISTORY_COLUMNS)} FROM lvi_history WHERE {' AND '.join(where)} "
+               f"ORDER BY timestamp DESC, id DESC LIMIT ?")
+        df = pd.read_sql_query(sql, self._conn(), params=args + [int(n)])
+        return df.iloc[::-1].reset_index(drop=True)
+
+    def between(self, project: str, start=None, end=None, domain: Optional[str] = None) -> pd.DataFrame:
+        """Runs with start <= timestamp < end (either bound optional), oldest first."""
+        where, args = self._where(project, domain)
+        if start is not None:
+            where.append("timestamp >= ?"); args.append(_ts_key(start))
+        if end is not None:
+            where.append("timestamp < ?"); args.append(_ts_key(end))
+        sql = (f"SELECT {','.join(HISTORY_COLUMNS)} FROM lvi_history WHERE {' AND '.join(where)} "
+               f"ORDER BY timestamp, id")
+        return pd.read_sql_query(sql, self._conn(), params=args)
+
+    def span(self, project: str, domain: Optional[str] = None) -> tuple:
+        """(run count, first timestamp, last timestamp) straight from the index."""
+        where, args = self._where(project, domain)
+        sql = f"SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM lvi_history WHERE {' AND '.join(where)}"
+        return tuple(self._conn().execute(sql, args).fetchone())
+
+    def rollups(self, project: str, resolution: str = "day", domain: Optional[str] = None,
+                start=None, end=None) -> pd.DataFrame:
+        """Bucketed KPI aggregates (n, mean, min, max, last) from the incremental rollup table."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {RESOLUTIONS}")
+        self._ensure_legacy(project)
+        where, args = ["project = ?", "resolution = ?"], [_norm(project), resolution]
+        if domain is not None:
+            where.append("domain = ?"); args.append(_norm(domain))
+        if start is not None:
+            where.append("bucket >= ?"); args.append(_bucket(_ts_key(start), resolution))
+        if end is not None:
+            where.append("bucket < ?"); args.append(_ts_key(end)[:10])
+        # across domains: pool sums/counts; min/max combine; "last" is the most recent bucket value
+        sql = f"""
+            SELECT bucket, kpi, SUM(n) AS n, SUM(total) / SUM(n) AS mean, MIN(min) AS min, MAX(max) AS max,
+                   (SELECT r2.last FROM lvi_rollups r2
+                     WHERE r2.project = r.project AND r2.resolution = r.resolution
+                       AND r2.bucket = r.bucket AND r2.kpi = r.kpi {"AND r2.domain = r.domain" if domain is not None else ""}
+                     ORDER BY r2.last_ts DESC LIMIT 1) AS last
+            FROM lvi_rollups r WHERE {' AND '.join(where)}
+            GROUP BY bucket, kpi ORDER BY bucket, kpi
+        """
+        return pd.read_sql_query(sql, self._conn(), params=args)
+
+    def export_csv(self, dest: Optional[Path] = None, project: Optional[str] = None,
+                   domain: Optional[str] = None) -> str:
+        """Classic lvi_history.csv layout; writes to `dest` if given, returns the CSV text."""
+        text = self.read(project, domain).to_csv(index=False)
+        if dest is not None:
+            Path(dest).write_text(text, encoding="utf-8")
+        return text
+
+    def migrate_legacy(self) -> Dict[str, int]:
+        """Import every legacy CSV (root data/lvi_history.csv + data/*/lvi_history.csv); idempotent."""
+        imported = {}
+        root = self.data_dir / "lvi_history.csv"
+        if root.exists():
+            imported[str(root)] = self.import_csv(root, project="default")
+        for p in sorted(self.data_dir.glob("*/lvi_history.csv")):
+            key = _norm(p.parent.name)
+            imported[str(p)] = self.import_csv(p, project=key)
+            self._checked_legacy.add(key)
+        return imported
+
+    def projects(self) -> list:
+        self._ensure_all_legacy()
+        rows = self._conn().execute("SELECT DISTINCT project FROM lvi_history ORDER BY project").fetchall()
+        return [r[0] for r in rows]
+
+    def version(self, project: Optional[str] = None) -> tuple:
+        """Cheap change token: commits land in the WAL, checkpoints in the main file."""
+        return tuple(_stat_token(Path(str(self.path) + suffix)) for suffix in ("", "-wal"))
+
+    def changes(self, since, until=None) -> pd.DataFrame:
+        """
+        Cross-project LVI movement in [since, until): one row per (project, domain) with runs
+        in the window. Baseline is the last run before `since` (else the first run in the
+        window); every lookup is an index seek, so this stays in milliseconds.
+        """
+        self._ensure_all_legacy()
+        lo, hi = _ts_key(since), _ts_key(until) or "9999"
+        sql = """
+            SELECT project, domain,
+              (SELECT lvi FROM lvi_history h WHERE h.project = k.project AND h.domain = k.domain
+                 AND h.timestamp < :lo ORDER BY h.timestamp DESC, h.id DESC LIMIT 1) AS lvi_before,
+              (SELECT lvi FROM lvi_history h WHERE h.project = k.project AND h.domain = k.domain
+                 AND h.timestamp >= :lo AND h.timestamp < :hi ORDER BY h.timestamp, h.id LIMIT 1) AS lvi_first,
+              (SELECT lvi FROM lvi_history h WHERE h.project = k.project AND h.domain = k.domain
+                 AND h.timestamp < :hi ORDER BY h.timestamp DESC, h.id DESC LIMIT 1) AS lvi_now,
+              (SELECT COUNT(*) FROM lvi_history h WHERE h.project = k.project AND h.domain = k.domain
+                 AND h.timestamp >= :lo AND h.timestamp < :hi) AS runs_in_window,
+              (SELECT MAX(timestamp) FROM lvi_history h WHERE h.project = k.project AND h.domain = k.domain
+                 AND h.timestamp < :hi) AS last_timestamp
+            FROM (SELECT DISTINCT project, domain FROM lvi_history) k
+        """
+        df = pd.read_sql_query(sql, self._conn(), params={"lo": lo, "hi": hi})
+        return _finish_changes(df)
+
+    def export_parquet(self, dest_dir: Path) -> Path:
+        """Columnar copy partitioned by project (dest/project=<name>/*.parquet) for DuckDB/pandas."""
+        return _export_parquet(self.read(), dest_dir)
+
+
+# ---------- Append-only CSV backend ----------
+class CSVHistoryStore:
+    backend = "csv"
+
+    def __init__(self, data_dir: Path = DATA_DIR):
+        self.data_dir = Path(data_dir)
+        self._frames: "OrderedDict[tuple, tuple]" = OrderedDict()   # (path, domain) -> (stat token, frame)
+        self._frames_lock = threading.Lock()
+
+    def _paths(self) -> list:
+        """Every history file: the legacy root data/lvi_history.csv, then data/*/lvi_history.csv."""
+        root = self.data_dir / "lvi_history.csv"
+        return ([root] if root.exists() else []) + sorted(self.data_dir.glob("*/lvi_history.csv"))
+
+    def _path(self, project: str, create: bool = False) -> Path:
+        matches = _legacy_csvs(project, self.data_dir)
+        if matches:
+            return matches[0]
+        d = self.data_dir / (_norm(project) or "default")
+        if create:
+            d.mkdir(parents=True, exist_ok=True)
+        return d / "lvi_history.csv"
+
+    @contextmanager
+    def _locked(self, path: Path):
+        with open(str(path) + ".lock", "a") as lf:
+            if fcntl:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def append(self, row: Dict) -> None:
+        r = _clean_row(row)
+        path = self._path(r["project"], create=True)
+        with self._locked(path):
+            header = None
+            if path.exists() and path.stat().st_size > 0:
+                with open(path, newline="", encoding="utf-8") as f:
+                    header = next(csv.reader(f), None)
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                if not header:
+                    header = HISTORY_COLUMNS
+                    w.writerow(header)
+                # keep whatever column order the existing file uses
+                w.writerow(["" if r.get(k) is None else r.get(k, "") for k in header])
+
+    def read(self, project: Optional[str] = None, domain: Optional[str] = None) -> pd.DataFrame:
+        paths = [self._path(project)] if project is not None else self._paths()
+        frames = []
+        for p in paths:
+            if p.exists() and p.stat().st_size > 0:
+                df = pd.read_csv(p)
+                if p.parent == self.data_dir:
+                    # legacy root file: rows without a project are "default", as in migrate_legacy
+                    df["project"] = df["project"].fillna("default") if "project" in df else "default"
+                frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        df = pd.concat(frames, ignore_index=True).reindex(columns=HISTORY_COLUMNS)
+        if domain is not None:
+            df = df[df["domain"].map(_norm) == _norm(domain)]
+        return df.reset_index(drop=True)
+
+    def _whole(self, project: str, domain: Optional[str]) -> pd.DataFrame:
+        """The project's full history, parsed once per file change (span and full-range reads share it)."""
+        path = self._path(project)
+        key, token = (str(path), None if domain is None else _norm(domain)), _stat_token(path)
+        with self._frames_lock:
+            hit = self._frames.get(key)
+            if hit is not None and hit[0] == token:
+                self._frames.move_to_end(key)
+                return hit[1].copy()
+        df = self.read(project, domain)
+        with self._frames_lock:
+            self._frames[key] = (token, df)
+            while len(self._frames) > 8:
+                self._frames.popitem(last=False)
+        return df.copy()
+
+    def _scan_backwards(self, project: str, domain: Optional[str], stop):
+        """Rows newest-first from the project's file; `stop(row)` ends the scan."""
+        path = self._path(project)
+        if not path.exists() or path.stat().st_size == 0:
+            return [], HISTORY_COLUMNS
+        with open(path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), None) or HISTORY_COLUMNS
+        header_line = ",".join(header)
+        rows = []
+        for line in _read_lines_backwards(path):
+            values = next(csv.reader([line]))
+            if values == header or line == header_line:
+                break
+            rec = dict(zip(header, values))
+            if domain is not None and _norm(rec.get("domain")) != _norm(domain):
+                continue
+            if stop(rec, rows):
+                break
+            rows.append(rec)
+        return rows, header
+
+    def _frame(self, rows: list) -> pd.DataFrame:
+        df = pd.DataFrame(list(reversed(rows)), columns=HISTORY_COLUMNS)
+        for c in _INT_COLUMNS:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+        return df
+
+    def tail(self, project: str, n: int = 10, domain: Optional[str] = None) -> pd.DataFrame:
+        """Last `n` runs (oldest first), reading the CSV from the end."""
+        rows, _ = self._scan_backwards(project, domain, lambda rec, acc: len(acc) >= n)
+        return self._frame(rows)
+
+    def between(self, project: str, start=None, end=None, domain: Optional[str] = None) -> pd.DataFrame:
+        """Runs with start <= timestamp < end; the append-only file is scanned backwards until `start`."""
+        lo, hi = _ts_key(start), _ts_key(end)
+        if lo is None:
+            df = self._whole(project, domain)
+            return df if hi is None else df[df["timestamp"].astype(str) < hi].reset_index(drop=True)
+        rows, _ = self._scan_backwards(project, domain,
+                                       lambda rec, acc: lo is not None and rec.get("timestamp", "") < lo)
+        if hi is not None:
+            rows = [r for r in rows if r.get("timestamp", "") < hi]
+        return self._frame(rows)
+
+    def export_csv(self, dest: Optional[Path] = None, project: Optional[str] = None,
+                   domain: Optional[str] = None) -> str:
+        text = self.read(project, domain).to_csv(index=False)
+        if dest is not None:
+            Path(dest).write_text(text, encoding="utf-8")
+        return text
+
+    def projects(self) -> list:
+        names = {_norm(p.parent.name) for p in self.data_dir.glob("*/lvi_history.csv")}
+        root = self.data_dir / "lvi_history.csv"
+        if root.exists() and root.stat().st_size > 0:
+            legacy = pd.read_csv(root, dtype=str, keep_default_na=False)
+            names.update(_norm(v) or "default" for v in legacy.get("project", pd.Series(["default"])))
+        return sorted(names)
+
+    def version(self, project: Optional[str] = None) -> tuple:
+        if project is None:
+            return tuple(_stat_token(p) for p in self._paths())
+        return (_stat_token(self._path(project)),)
+
+    def span(self, project: str, domain: Optional[str] = None) -> tuple:
+        df = self._whole(project, domain)
+        if df.empty:
+            return 0, None, None
+        ts = df["timestamp"].astype(str)
+        return len(df), ts.min(), ts.max()
+
+    def rollups(self, project: str, resolution: str = "day", domain: Optional[str] = None,
+                start=None, end=None) -> pd.DataFrame:
+        """CSV files carry no rollup table, so buckets are aggregated from the (range-scanned) rows."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {RESOLUTIONS}")
+        lo = _bucket(_ts_key(start), resolution) if start is not None else None
+        df = self.between(project, lo, _ts_key(end)[:10] if end is not None else None, domain)
+        return _rollups_from_frame(df, resolution)
+
+    def changes(self, since, until=None) -> pd.DataFrame:
+        """Same result as SQLiteHistoryStore.changes, computed by reading every project file."""
+        lo, hi = _ts_key(since), _ts_key(until) or "9999"
+        df = self.read()
+        df = df[df["timestamp"].astype(str) < hi].copy()
+        df["project"] = df["project"].map(_norm)
+        df["domain"] = df["domain"].map(_norm)
+        df = df.sort_values("timestamp", kind="stable")
+        out = []
+        for (project, domain), g in df.groupby(["project", "domain"], sort=True):
+            before, window = g[g["timestamp"] < lo], g[g["timestamp"] >= lo]
+            out.append({
+                "project": project, "domain": domain,
+                "lvi_before": before["lvi"].iloc[-1] if not before.empty else None,
+                "lvi_first": window["lvi"].iloc[0] if not window.empty else None,
+                "lvi_now": g["lvi"].iloc[-1],
+                "runs_in_window": len(window),
+                "last_timestamp": g["timestamp"].iloc[-1],
+            })
+        return _finish_changes(pd.DataFrame(out, columns=["project", "domain", "lvi_before", "lvi_first",
+                                                          "lvi_now", "runs_in_window", "last_timestamp"]))
+
+    def export_parquet(self, dest_dir: Path) -> Path:
+        return _export_parquet(self.read(), dest_dir)
+
+
+# ---------- Cross-project helpers ----------
+def _finish_changes(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[df["runs_in_window"] > 0].copy()
+    baseline = pd.to_numeric(df["lvi_before"], errors="coerce").fillna(pd.to_numeric(df["lvi_first"], errors="coerce"))
+    df["delta"] = pd.to_numeric(df["lvi_now"], errors="coerce") - baseline
+    cols = ["project", "domain", "lvi_before", "lvi_now", "delta", "runs_in_window", "last_timestamp"]
+    return df[cols].sort_values(["delta", "project"]).reset_index(drop=True)
+
+def _export_parquet(df: pd.DataFrame, dest_dir: Path) -> Path:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(dest_dir, partition_cols=["project"], index=False)
+    return dest_dir
+
+
+# ---------- Module-level access ----------
+_STORES: Dict[tuple, object] = {}
+_STORES_LOCK = threading.Lock()
+
+def get_store(backend: Optional[str] = None):
+    """Process-wide store for the configured backend (LVI_HISTORY_BACKEND=sqlite|csv)."""
+    backend = (backend or os.getenv("LVI_HISTORY_BACKEND", "sqlite")).lower()
+    key = (backend, str(DATA_DIR))
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            if backend == "csv":
+                store = CSVHistoryStore(DATA_DIR)
+            elif backend == "sqlite":
+                store = SQLiteHistoryStore(DEFAULT_DB, DATA_DIR)
+            else:
+                raise ValueError(f"Unknown LVI_HISTORY_BACKEND '{backend}' (use sqlite or csv)")
+            _STORES[key] = store
+    return store
+
+def append_row(row: Dict) -> None:
+    get_store().append(row)
+
+def load_history(project: Optional[str] = None, domain: Optional[str] = None) -> pd.DataFrame:
+    return get_store().read(project, domain)
+
+def tail_history(project: str, n: int = 10, domain: Optional[str] = None) -> pd.DataFrame:
+    """Last `n` runs for a project (optionally one domain), oldest first, without a full scan."""
+    return get_store().tail(project, n, domain)
+
+def history_between(project: str, start=None, end=None, domain: Optional[str] = None) -> pd.DataFrame:
+    return get_store().between(project, start, end, domain)
+
+def history_csv(project: Optional[str] = None, domain: Optional[str] = None) -> str:
+    """lvi_history.csv text for exports/ZIP bundles."""
+    return get_store().export_csv(project=project, domain=domain)
+
+def lvi_changes(days: int = 7, now: Optional[datetime] = None) -> pd.DataFrame:
+    """LVI movement for every project/domain over the last `days` (largest drops first)."""
+    from datetime import timedelta
+    now = now or datetime.utcnow()
+    return get_store().changes(now - timedelta(days=days), now + timedelta(seconds=1))
+
+def lvi_drops(threshold: float = 5, days: int = 7, now: Optional[datetime] = None) -> pd.DataFrame:
+    """E.g. all clients whose LVI dropped by more than 5 this week."""
+    df = lvi_changes(days, now)
+    return df[df["delta"] < -threshold].reset_index(drop=True)
+
+def history_rollups(project: str, resolution: str = "day", domain: Optional[str] = None,
+                    start=None, end=None) -> pd.DataFrame:
+    return get_store().rollups(project, resolution, domain, start, end)
+
+def history_span(project: str, domain: Optional[str] = None) -> tuple:
+    return get_store().span(project, domain)
+
+def history_version(project: Optional[str] = None) -> tuple:
+    """Token that changes whenever the project's history may have changed (for cache keys)."""
+    store = get_store()
+    return (store.backend,) + store.version(project)
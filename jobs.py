@@ -0,0 +1,223 @@
+# jobs.py
+"""
+Background job runner for the Streamlit portals.
+
+Long network-bound work (SERP, competitor compare, snapshots) runs on a
+process-wide thread pool instead of the script thread, so a rerun never cancels
+it and several sessions can run snapshots side by side.
+
+    job_id = submit("serp", run_serp_queries, domain, kws, gl="uk")
+    info = status(job_id)          # {"status": "running", "progress": 0.4, ...}
+    value = result(job_id)         # once info["status"] == "done"
+
+A job function that accepts a `progress` keyword gets a callback
+`progress(fraction, message)`. Status is persisted to data/jobs/<id>.json and
+results to data/jobs/<id>.pkl, so a page reload (or a restarted server) can
+reattach to a job by id. Persisted jobs older than JOB_TTL_SECONDS are pruned
+when the runner starts and then at most every JOB_PRUNE_INTERVAL seconds on submit.
+"""
+
+import contextvars, json, os, pickle, threading, time, traceback, uuid, inspect
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import QUEUE_DEPTH
+
+JOBS_DIR = Path(__file__).resolve().parent / "data" / "jobs"
+MAX_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+PRUNE_INTERVAL = int(os.getenv("JOB_PRUNE_INTERVAL", "3600"))
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+_lock = threading.Lock()
+_jobs: Dict[str, Dict[str, Any]] = {}
+_results: Dict[str, Any] = {}
+_pool: Optional[ThreadPoolExecutor] = None
+_last_prune = 0.0
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="llmseo-job")
+        return _pool
+
+
+def _maybe_prune() -> None:
+    """prune() on first use and then at most every PRUNE_INTERVAL seconds."""
+    global _last_prune
+    now = time.time()
+    with _lock:
+        if now - _last_prune < PRUNE_INTERVAL:
+            return
+        _last_prune = now
+    try:
+        prune()
+    except OSError:
+        pass  # e.g. read-only data dir; try again next interval
+
+
+def _meta_path(job_id: str) -> Path:
+    return JOBS_DIR / f"{job_id}.json"
+
+def _result_path(job_id: str) -> Path:
+    return JOBS_DIR / f"{job_id}.pkl"
+
+def _valid_id(job_id: str) -> bool:
+    return bool(job_id) and all(c in "0123456789abcdef" for c in job_id) and len(job_id) == 32
+
+
+def _persist(job: Dict[str, Any]) -> None:
+    """Atomically write job status (temp file + rename)."""
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    p = _meta_path(job["id"])
+    tmp = p.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(job, default=str))
+    os.replace(tmp, p)
+
+
+def _update(job_id: str, **fields) -> Dict[str, Any]:
+    with _lock:
+        job = _jobs[job_id]
+        job.update(fields)
+        snap = dict(job)
+    _persist(snap)
+    return snap
+
+
+def _run(job_id: str, fn: Callable, args: tuple, kwargs: dict) -> None:
+    QUEUE_DEPTH.dec(queue="jobs")
+    _update(job_id, status=RUNNING, started=time.time())
+
+    def progress(fraction: float, message: str = "") -> None:
+        _update(job_id, progress=max(0.0, min(1.0, float(fraction))), message=message)
+
+    try:
+        if "progress" in inspect.signature(fn).parameters:
+            kwargs = {**kwargs, "progress": progress}
+        value = fn(*args, **kwargs)
+        try:
+            JOBS_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = _result_path(job_id).with_suffix(".pkl.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, _result_path(job_id))
+        except Exception:
+            pass  # unpicklable results stay in memory only
+        with _lock:
+            _results[job_id] = value
+        _update(job_id, status=DONE, progress=1.0, finished=time.time())
+    except Exception as e:
+        _update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}",
+                trace=traceback.format_exc(limit=5), finished=time.time())
+
+
+def submit(kind: str, fn: Callable, *args, owner: str = "", **kwargs) -> str:
+    """Queue fn(*args, **kwargs) on the pool; returns the new job id."""
+    _maybe_prune()
+    job_id = uuid.uuid4().hex
+    job = {"id": job_id, "kind": kind, "owner": owner, "status": PENDING, "progress": 0.0,
+           "message": "", "error": "", "submitted": time.time(), "started": None, "finished": None}
+    with _lock:
+        _jobs[job_id] = job
+    _persist(job)
+    QUEUE_DEPTH.inc(queue="jobs")
+    # the job runs in the submitter's context (e.g. the current llm_usage project)
+    _executor().submit(contextvars.copy_context().run, _run, job_id, fn, args, kwargs)
+    return job_id
+
+
+def status(job_id: str) -> Optional[Dict[str, Any]]:
+    """Current status dict for a job, from memory or from disk after a restart."""
+    if not _valid_id(job_id):
+        return None
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            return dict(job)
+    p = _meta_path(job_id)
+    if not p.exists():
+        return None
+    try:
+        job = json.loads(p.read_text())
+    except Exception:
+        return None
+    if job.get("status") not in FINISHED:
+        # The process that owned this job is gone; it will never finish.
+        job.update(status=FAILED, error="Job was interrupted by a server restart.")
+    return job
+
+
+def result(job_id: str, default: Any = None) -> Any:
+    """Result of a finished job (memory first, then the persisted pickle)."""
+    if not _valid_id(job_id):
+        return default
+    with _lock:
+        if job_id in _results:
+            return _results[job_id]
+    p = _result_path(job_id)
+    if not p.exists():
+        return default
+    try:
+        with open(p, "rb") as f:
+            value = pickle.load(f)
+    except Exception:
+        return default
+    with _lock:
+        _results[job_id] = value
+    return value
+
+
+def active(owner: str = "") -> List[Dict[str, Any]]:
+    """In-process jobs that have not finished yet (optionally for one owner)."""
+    with _lock:
+        return [dict(j) for j in _jobs.values()
+                if j["status"] not in FINISHED and (not owner or j.get("owner") == owner)]
+
+
+def forget(job_id: str) -> None:
+    """Drop a job from memory and disk."""
+    with _lock:
+        _jobs.pop(job_id, None)
+        _results.pop(job_id, None)
+    for p in (_meta_path(job_id), _result_path(job_id)):
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def prune(max_age: int = JOB_TTL_SECONDS) -> int:
+    """
+    Remove persisted jobs (status, result pickle, leftover temp files) older than
+    max_age seconds, except jobs still running in this process; returns how many
+    jobs were removed.
+    """
+    if not JOBS_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age
+    with _lock:
+        running = {j for j, job in _jobs.items() if job["status"] not in FINISHED}
+    removed = set()
+    for p in JOBS_DIR.iterdir():
+        job_id = p.name.split(".", 1)[0]
+        if job_id in running:
+            continue
+        try:
+            if p.stat().st_mtime >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        if _valid_id(job_id) and p.suffix == ".json":
+            forget(job_id)
+            removed.add(job_id)
+        elif p.suffix in (".pkl", ".tmp"):   # orphaned result or an interrupted write
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+    return len(removed)
@@ -0,0 +1,103 @@
+# json_stream.py
+"""
+Incremental JSON parsing for streamed LLM output.
+
+JSONItemStream is fed text chunks as they arrive and returns each element of
+one array (the value of `key` in the top-level object, or a top-level array
+when key is None) as soon as that element's closing bracket has been seen:
+
+    parser = JSONItemStream("faqs")
+    for chunk in llm_engines.stream("openai", prompt):
+        for item in parser.feed(chunk):      # {"q": ..., "a": ...} once complete
+            show(item)
+        preview(parser.partial)              # the item still being written, best effort
+
+Only new characters are scanned on each feed (a small state machine over
+strings/brackets), so the cost is linear in the response length. Text before
+the JSON (e.g. a ```json fence) is ignored.
+"""
+
+import json
+from typing import List, Optional
+
+_CLOSE = {"{": "}", "[": "]"}
+
+
+class JSONItemStream:
+    def __init__(self, key: Optional[str] = "faqs"):
+        self.key = key
+        self.items: List[object] = []
+        self.done = False              # the target array has closed
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []    # open brackets
+        self._in_str = False
+        self._esc = False
+        self._str_start = 0
+        self._last_str = None          # last complete string literal (key detection)
+        self._expect_array = False     # just saw  "<key>":
+        self._array_depth = None       # stack depth inside the target array
+        self._item_start = None        # offset of the element being read
+
+    def feed(self, chunk: str) -> List[object]:
+        """Consume chunk; return the array elements completed by it."""
+        self._text += chunk or ""
+        t, i, out = self._text, self._pos, []
+        while i < len(t):
+            c = t[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    self._last_str = t[self._str_start + 1:i]
+            elif c == '"':
+                self._in_str, self._str_start = True, i
+            elif c == ":":
+                self._expect_array = len(self._stack) == 1 and self._last_str == self.key
+            elif c in "{[":
+                at_target = (self._expect_array or (self.key is None and not self._stack))
+                if c == "[" and at_target and self._array_depth is None and not self.done:
+                    self._array_depth = len(self._stack) + 1
+                elif len(self._stack) == self._array_depth and self._item_start is None:
+                    self._item_start = i
+                self._stack.append(c)
+                self._expect_array = False
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                depth = len(self._stack)
+                if self._item_start is not None and depth == self._array_depth:
+                    try:
+                        item = json.loads(t[self._item_start:i + 1])
+                        self.items.append(item)
+                        out.append(item)
+                    except ValueError:
+                        pass
+                    self._item_start = None
+                elif c == "]" and self._array_depth is not None and depth == self._array_depth - 1:
+                    self.done, self._array_depth = True, None
+            elif not c.isspace():
+                self._expect_array = False
+            i += 1
+        self._pos = i
+        return out
+
+    @property
+    def partial(self) -> Optional[dict]:
+        """The element still being written, closed off heuristically; None if not parseable yet."""
+        if self._item_start is None:
+            return None
+        frag = self._text[self._item_start:]
+        if self._in_str:
+            frag = (frag[:-1] if self._esc else frag) + '"'
+        closers = "".join(_CLOSE[b] for b in reversed(self._stack[self._array_depth:]))
+        for candidate in (frag, frag.rstrip().rstrip(","), frag.rstrip() + " null"):
+            try:
+                value = json.loads(candidate + closers)
+            except ValueError:
+                continue
+            return value if isinstance(value, dict) else None
+        return None
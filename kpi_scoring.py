@@ -1,5 +1,8 @@
 # kpi_scoring.py
-from typing import Dict
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib, json
+import numpy as np
 import pandas as pd
 
 WEIGHTS = {
@@ -10,6 +13,34 @@ WEIGHTS = {
     "speed": 15,
 }
 
+# History rows store these component scores; they are the canonical values.
+# LVI is a derived view of them under a weight profile (see recompute_history_lvi).
+COMPONENT_COLUMNS = {
+    "serp": "serp_score",
+    "technical": "technical_score",
+    "content": "content_score",
+    "eeat": "eeat_score",
+    "speed": "speed_score",
+}
+
+def resolve_weights(weights: Optional[Dict] = None) -> Dict[str, float]:
+    """Merge a (possibly partial) weight profile over WEIGHTS and validate it."""
+    merged = dict(WEIGHTS)
+    for k, v in (weights or {}).items():
+        if k not in WEIGHTS:
+            raise ValueError(f"Unknown LVI weight '{k}' (expected one of {sorted(WEIGHTS)})")
+        if v < 0:
+            raise ValueError(f"LVI weight '{k}' must be >= 0")
+        merged[k] = v
+    if sum(merged.values()) <= 0:
+        raise ValueError("LVI weights must not all be zero")
+    return merged
+
+def weights_hash(weights: Optional[Dict] = None) -> str:
+    """Stable short hash identifying a weight profile."""
+    canon = json.dumps(resolve_weights(weights), sort_keys=True)
+    return hashlib.sha1(canon.encode("utf-8")).hexdigest()[:12]
+
 def clamp(n, lo, hi):
     return max(lo, min(hi, n))
 
@@ -24,6 +55,57 @@ def serp_score_from_df(df: pd.DataFrame, domain: str) -> int:
     # Simple mapping: 1 → 98-100, 5 → ~70, 10 → ~45 (clamped)
     return clamp(int(105 - avg_pos * 7), 40, 100)
 
+def serp_host(links: pd.Series) -> pd.Series:
+    """Lower-cased host of each result link with any leading 'www.' removed."""
+    return (links.fillna("").astype(str).str.lower()
+            .str.extract(r"^(?:[a-z][a-z0-9+.-]*://)?(?:www\.)?([^/:?#\s]+)", expand=False)
+            .fillna(""))
+
+def serp_scores_grouped(df: pd.DataFrame, by=None, domains: Optional[list] = None) -> pd.DataFrame:
+    """
+    SERP scores for every domain and every group in one groupby pass over a SERP
+    frame (run_serp_queries rows). `by` is an optional column or list of columns
+    (e.g. "keyword" or a keyword-cluster column). If `domains` is given, only
+    those are scored (subdomains count towards their parent) and each one gets
+    a row per group even without results.
+    Uses the serp_score_from_df mapping: no results -> 40, empty frame -> 50.
+    Columns: [*by, "domain", "results", "avg_position", "serp_score"].
+    """
+    by = [by] if isinstance(by, str) else list(by or [])
+    cols = by + ["domain", "results", "avg_position", "serp_score"]
+    wanted = []
+    for d in domains or []:
+        h = serp_host(pd.Series([d])).iloc[0]
+        if h and h not in wanted:
+            wanted.append(h)
+
+    if df is None or df.empty:
+        if by or not wanted:
+            return pd.DataFrame(columns=cols)
+        return pd.DataFrame({"domain": wanted, "results": 0, "avg_position": np.nan, "serp_score": 50})[cols]
+
+    hosts = serp_host(df["link"])
+    if wanted:
+        label = pd.Series("", index=df.index)
+        for d in wanted:
+            label = label.mask((label == "") & ((hosts == d) | hosts.str.endswith("." + d)), d)
+        hosts = label
+    work = df[by].assign(domain=hosts, position=pd.to_numeric(df["position"], errors="coerce"))
+    work = work[(work["domain"] != "") & work["position"].notna()]
+
+    g = (work.groupby(by + ["domain"], sort=False)["position"]
+         .agg(results="count", avg_position="mean").reset_index())
+    if wanted:
+        groups = df[by].drop_duplicates() if by else pd.DataFrame(index=[0])
+        full = groups.merge(pd.DataFrame({"domain": wanted}), how="cross")
+        g = full.merge(g, on=by + ["domain"], how="left")
+        g["results"] = g["results"].fillna(0).astype(int)
+
+    avg = g["avg_position"].to_numpy(dtype=float)
+    mapped = np.clip(np.trunc(105 - np.nan_to_num(avg) * 7), 40, 100)
+    g["serp_score"] = np.where(g["results"].to_numpy() > 0, mapped, 40).astype(int)
+    return g[cols].reset_index(drop=True)
+
 def score_technical(a: Dict) -> int:
     score = 0
     if a.get("h1_count", 0) == 1: score += 25
@@ -55,21 +137,23 @@ def score_eeat(a: Dict) -> int:
 def score_speed(a: Dict) -> int:
     return 60  # placeholder until PageSpeed/Lighthouse
 
-def combine_lvi(serp_score: int, tech: int, content: int, eeat: int, speed: int) -> int:
-    total_w = sum(WEIGHTS.values())
-    weighted = (serp_score*WEIGHTS["serp"] +
-                tech*WEIGHTS["technical"] +
-                content*WEIGHTS["content"] +
-                eeat*WEIGHTS["eeat"] +
-                speed*WEIGHTS["speed"])
+def combine_lvi(serp_score: int, tech: int, content: int, eeat: int, speed: int,
+                weights: Optional[Dict] = None) -> int:
+    w = resolve_weights(weights) if weights else WEIGHTS
+    total_w = sum(w.values())
+    weighted = (serp_score*w["serp"] +
+                tech*w["technical"] +
+                content*w["content"] +
+                eeat*w["eeat"] +
+                speed*w["speed"])
     return int(round(weighted / total_w))
 
-def compute_kpis(audit_row: Dict, serp_score: int) -> Dict:
+def compute_kpis(audit_row: Dict, serp_score: int, weights: Optional[Dict] = None) -> Dict:
     tech = score_technical(audit_row)
     content = score_content(audit_row)
     eeat = score_eeat(audit_row)
     speed = score_speed(audit_row)
-    lvi = combine_lvi(serp_score, tech, content, eeat, speed)
+    lvi = combine_lvi(serp_score, tech, content, eeat, speed, weights)
     return {
         "serp_score": serp_score,
         "technical_score": tech,
@@ -79,3 +163,145 @@ def compute_kpis(audit_row: Dict, serp_score: int) -> Dict:
         "lvi": lvi,
     }
 
+
+# ---------- Batch (vectorized) scoring ----------
+# Same thresholds as the scalar scorers above, applied column-wise so thousands
+# of audit rows score in one pass. Results are identical to compute_kpis().
+
+def _num_col(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Numeric column as float array; missing column / NaN behave like a.get(col, 0)."""
+    if col not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+def _truthy_col(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Truthiness of a text column (None/NaN/"" are falsy, like a.get(col))."""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return np.fromiter((bool(v) and v == v for v in df[col].to_numpy(dtype=object)),
+                       dtype=bool, count=len(df))
+
+def _len_col(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.zeros(len(df))
+    return np.fromiter((len(v) if isinstance(v, (list, tuple, set)) else 0
+                        for v in df[col].to_numpy(dtype=object)), dtype=float, count=len(df))
+
+def _breakdown_col(df: pd.DataFrame, key: str) -> np.ndarray:
+    """lvi_breakdown[key] from either a flattened column (pd.json_normalize) or a dict column."""
+    flat = f"lvi_breakdown.{key}"
+    if flat in df.columns:
+        return _num_col(df, flat)
+    if "lvi_breakdown" not in df.columns:
+        return np.zeros(len(df))
+    vals = ((v.get(key, 0) or 0) if isinstance(v, dict) else 0 for v in df["lvi_breakdown"].to_numpy(dtype=object))
+    return np.nan_to_num(np.fromiter(vals, dtype=float, count=len(df)))
+
+def score_technical_frame(df: pd.DataFrame) -> np.ndarray:
+    score = (np.where(_num_col(df, "h1_count") == 1, 25, 0)
+             + np.where(_num_col(df, "h2_count") >= 2, 20, 0)
+             + np.where(_truthy_col(df, "title"), 15, 0)
+             + np.where(_truthy_col(df, "meta_description"), 10, 0)
+             + np.where(_num_col(df, "internal_links") >= 5, 15, 0)
+             + np.where(_len_col(df, "jsonld_types") >= 1, 15, 0))
+    return np.clip(score, 0, 100).astype(np.int64)
+
+def score_content_frame(df: pd.DataFrame) -> np.ndarray:
+    alt_pct = _num_col(df, "img_alt_coverage_percent")
+    s = (np.minimum(_breakdown_col(df, "answer_blocks"), 20)
+         + np.minimum(_breakdown_col(df, "tables_specs"), 10)
+         + np.select([alt_pct >= 60, alt_pct >= 30], [15, 8], 0)
+         + np.where(_num_col(df, "h2_count") >= 3, 15, 0))
+    return np.clip(s, 0, 100).astype(np.int64)
+
+def score_eeat_frame(df: pd.DataFrame) -> np.ndarray:
+    ext = _num_col(df, "external_links")
+    add = np.select([ext >= 5, ext >= 2], [10, 5], 0)
+    return np.clip(_breakdown_col(df, "eeat") * 8 + add, 0, 100).astype(np.int64)
+
+def score_speed_frame(df: pd.DataFrame) -> np.ndarray:
+    return np.full(len(df), 60, dtype=np.int64)  # mirrors score_speed placeholder
+
+def combine_lvi_frame(serp_score, tech, content, eeat, speed, weights: Optional[Dict] = None) -> np.ndarray:
+    w = resolve_weights(weights) if weights else WEIGHTS
+    total_w = sum(w.values())
+    weighted = (np.asarray(serp_score) * w["serp"] +
+                np.asarray(tech) * w["technical"] +
+                np.asarray(content) * w["content"] +
+                np.asarray(eeat) * w["eeat"] +
+                np.asarray(speed) * w["speed"])
+    # np.round is round-half-to-even, same as Python's round()
+    return np.round(weighted / total_w).astype(np.int64)
+
+def compute_kpis_frame(audits: pd.DataFrame, serp_score, weights: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Vectorized compute_kpis over a DataFrame of audit rows (one row per audit_url() dict,
+    or its pd.json_normalize form). serp_score is a scalar or a per-row sequence.
+    Returns a frame with the same keys as compute_kpis(), indexed like `audits`.
+    """
+    n = len(audits)
+    serp = np.broadcast_to(np.asarray(serp_score, dtype=np.int64), (n,))
+    tech = score_technical_frame(audits)
+    content = score_content_frame(audits)
+    eeat = score_eeat_frame(audits)
+    speed = score_speed_frame(audits)
+    lvi = combine_lvi_frame(serp, tech, content, eeat, speed, weights)
+    return pd.DataFrame({
+        "serp_score": serp,
+        "technical_score": tech,
+        "content_score": content,
+        "eeat_score": eeat,
+        "speed_score": speed,
+        "lvi": lvi,
+    }, index=audits.index)
+
+
+# ---------- LVI as a derived view over history ----------
+_LVI_VIEW_CACHE: "OrderedDict[tuple, pd.Series]" = OrderedDict()
+_LVI_VIEW_CACHE_MAX = 64
+
+def _history_fingerprint(components: pd.DataFrame) -> int:
+    return int(pd.util.hash_pandas_object(components, index=True).sum())
+
+def recompute_history_lvi(history: pd.DataFrame, weights: Optional[Dict] = None,
+                          history_key=None) -> pd.DataFrame:
+    """
+    Re-derive LVI for a whole history frame (lvi_history.csv rows) under a weight
+    profile, in one vectorized pass over the stored component scores. Rows missing
+    a component (e.g. no speed run) keep their stored LVI rather than scoring it as 0.
+    Results are cached per (history_key, profile hash); history_key defaults to a
+    content fingerprint, so pass e.g. (project, history_version(project)) to skip hashing.
+    Returns a copy with `lvi` recomputed, `lvi_stored` holding the original
+    value and `weights_profile` set to the profile hash.
+    """
+    out = history.copy()
+    profile = weights_hash(weights)
+    if out.empty:
+        out["lvi_stored"] = pd.Series(dtype=float)
+        out["lvi"] = pd.Series(dtype="int64")
+        out["weights_profile"] = profile
+        return out
+
+    cols = list(COMPONENT_COLUMNS.values())
+    components = out.reindex(columns=cols).apply(pd.to_numeric, errors="coerce")
+    key = (history_key if history_key is not None else _history_fingerprint(components), profile)
+
+    lvi = _LVI_VIEW_CACHE.get(key)
+    if lvi is None or len(lvi) != len(out):
+        lvi = pd.Series(combine_lvi_frame(*(components[c].fillna(0).to_numpy() for c in cols),
+                                          weights=weights), index=out.index)
+        _LVI_VIEW_CACHE[key] = lvi
+        if len(_LVI_VIEW_CACHE) > _LVI_VIEW_CACHE_MAX:
+            _LVI_VIEW_CACHE.popitem(last=False)
+    else:
+        _LVI_VIEW_CACHE.move_to_end(key)
+
+    stored = out["lvi"] if "lvi" in out.columns else pd.Series(np.nan, index=out.index)
+    rescored = lvi.to_numpy()
+    incomplete = components.isna().any(axis=1).to_numpy()
+    if incomplete.any():
+        rescored = np.where(incomplete, pd.to_numeric(stored, errors="coerce").to_numpy(dtype=float), rescored)
+    out["lvi_stored"] = stored
+    out["lvi"] = rescored
+    out["weights_profile"] = profile
+    return out
@@ -0,0 +1,164 @@
+# llm_cache.py
+"""
+Persistent LLM response cache (data/llm_cache.sqlite3, WAL).
+
+Responses are keyed by (engine, model, temperature, normalized prompt, template
+version), so regenerating a plan with unchanged inputs is served from disk
+without an API call. Bump a drafter's template version when its prompt or the
+way its output is parsed changes meaning; old entries then simply stop matching.
+
+  - entries expire after LLM_CACHE_TTL seconds (default 7 days)
+  - the cache keeps at most LLM_CACHE_MAX_ENTRIES rows, evicting least recently used
+  - lookups are counted per entry and in a persistent hit/miss tally (stats()),
+    and reported to metrics as cache "llm"
+
+    cache = get_cache()
+    txt = cache.get("openai", "gpt-4o-mini", 0.3, prompt, "titles-v1")
+    cache.put("openai", "gpt-4o-mini", 0.3, prompt, "titles-v1", txt)
+
+LLM_CACHE=off makes llm_engines bypass the cache.
+"""
+
+import hashlib, json, os, sqlite3, threading, time
+from pathlib import Path
+from typing import Dict, Optional
+
+import metrics
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+DEFAULT_DB = DATA_DIR / "llm_cache.sqlite3"
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+PRUNE_EVERY = 50   # puts between size checks
+
+
+def enabled() -> bool:
+    return os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+def normalize_prompt(prompt: str) -> str:
+    """Whitespace-insensitive form: strip each line, collapse runs of spaces, drop blank lines."""
+    lines = (" ".join(line.split()) for line in (prompt or "").splitlines())
+    return "\n".join(l for l in lines if l)
+
+def cache_key(engine: str, model: str, temperature: float, prompt: str, template: str) -> str:
+    raw = "\0".join([engine, model or "", f"{float(temperature):.3f}", template or "", normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def json_object(text: str) -> bool:
+    """Validator for JSON-returning prompts: only parseable objects are worth caching."""
+    try:
+        return isinstance(json.loads((text or "").strip()), dict)
+    except ValueError:
+        return False
+
+
+class LLMCache:
+    def __init__(self, path: Path = DEFAULT_DB, ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._puts = 0
+        self._puts_lock = threading.Lock()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                engine TEXT NOT NULL, model TEXT NOT NULL, temperature REAL NOT NULL,
+                template TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL, last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS ix_llm_last_used ON llm_responses(last_used);
+            CREATE TABLE IF NOT EXISTS llm_cache_stats (
+                engine TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0, misses INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread (Streamlit sessions / job workers run in separate threads)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, engine: str, hit: bool) -> None:
+        col = "hits" if hit else "misses"
+        self._conn().execute(f"INSERT INTO llm_cache_stats (engine, {col}) VALUES (?, 1) "
+                             f"ON CONFLICT (engine) DO UPDATE SET {col} = {col} + 1", (engine,))
+        metrics.record_cache("llm", hit)
+
+    def get(self, engine: str, model: str, temperature: float, prompt: str, template: str) -> Optional[str]:
+        key = cache_key(engine, model, temperature, prompt, template)
+        now = time.time()
+        c = self._conn()
+        row = c.execute("SELECT response, created FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            if row is not None:
+                c.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            self._count(engine, False)
+            return None
+        c.execute("UPDATE llm_responses SET hits = hits + 1, last_used = ? WHERE key = ?", (now, key))
+        self._count(engine, True)
+        return row[0]
+
+    def put(self, engine: str, model: str, temperature: float, prompt: str, template: str, response: str) -> None:
+        key = cache_key(engine, model, temperature, prompt, template)
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO llm_responses "
+            "(key, engine, model, temperature, template, response, created, last_used, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, engine, model or "", float(temperature), template or "", response, now, now))
+        with self._puts_lock:
+            self._puts += 1
+            due = self._puts % PRUNE_EVERY == 1
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop expired rows and the least recently used ones above max_entries; returns rows removed."""
+        c = self._conn()
+        n = c.execute("DELETE FROM llm_responses WHERE created < ?", (time.time() - self.ttl,)).rowcount
+        total = c.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        if total > self.max_entries:
+            n += c.execute("DELETE FROM llm_responses WHERE key IN "
+                           "(SELECT key FROM llm_responses ORDER BY last_used LIMIT ?)",
+                           (total - self.max_entries,)).rowcount
+        return n
+
+    def clear(self) -> None:
+        c = self._conn()
+        c.execute("DELETE FROM llm_responses")
+        c.execute("DELETE FROM llm_cache_stats")
+
+    def stats(self) -> Dict[str, object]:
+        """{"entries","hits","misses","hit_ratio","by_engine": {engine: {"hits","misses"}}}."""
+        c = self._conn()
+        entries = c.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        by_engine = {e: {"hits": h, "misses": m}
+                     for e, h, m in c.execute("SELECT engine, hits, misses FROM llm_cache_stats ORDER BY engine")}
+        hits = sum(v["hits"] for v in by_engine.values())
+        misses = sum(v["misses"] for v in by_engine.values())
+        return {"entries": entries, "hits": hits, "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0, "by_engine": by_engine}
+
+
+_CACHES: Dict[str, LLMCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+def get_cache(path: Optional[Path] = None) -> LLMCache:
+    """Process-wide cache per database file."""
+    path = Path(path or DEFAULT_DB)
+    key = str(path.resolve())
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = LLMCache(path)
+        return cache
@@ -0,0 +1,767 @@
+# llm_engines.py
+"""
+LLM engine registry: one long-lived, pooled client per provider behind a common interface.
+
+    complete("openai" | "claude" | "grok", prompt, max_tokens=900, temperature=0.4) -> str
+                                                           # max_tokens=None: provider default
+    await acomplete(...)                                   # same, for asyncio callers
+    engine_name("Claude (Anthropic)") -> "claude"          # map the app's engine labels
+    complete(..., template="titles-v1", validate=json_object)   # cached via llm_cache
+    await ahedged_complete("openai", "claude", prompt, ...)  # -> (text, winning engine)
+    run(ahedged_complete(...))                             # from sync code, on the shared loop
+    for piece in stream("grok", prompt, ...): ...          # text deltas as they are generated
+
+Clients are built on first use and reused across calls and threads, so repeated
+plan generation pays for TLS/connection setup once per provider instead of per call.
+Sync clients are shared process-wide (rebuilt only if the API key changes); async
+clients are kept per event loop, since httpx/SDK async pools are loop-bound. Sync
+entry points (plan building, hedging, batch planning) therefore submit their
+coroutines to one long-lived background loop with run() instead of starting a
+new asyncio.run() loop per call, so the async clients and their connection
+pools are built once and reused.
+
+With a template version, responses are served from / stored in the persistent
+llm_cache (only responses that pass `validate`, default non-empty, are stored).
+
+stream() yields the response incrementally (OpenAI/xAI stream=True, Anthropic
+messages.stream); a cache hit is yielded as one piece, and the joined text is
+cached afterwards like a complete() answer. Pass a StreamCancel to abort it from
+another thread: cancel() closes the open provider response, so a stalled read
+ends at once instead of at the HTTP timeout.
+
+Every call is accounted in llm_usage (tokens, cost, latency per project,
+engine and day) and admitted against the current project's daily budget:
+near the budget the engine's cheap model is used, past it only cached answers
+are served (llm_usage.BudgetExceeded otherwise, which callers treat like any
+other engine error).
+
+Each engine keeps recent call latencies per template; ahedged_complete uses
+their LLM_HEDGE_PERCENTILE as the delay before hedging to a second engine.
+
+Missing keys raise RuntimeError (callers fall back, as before). Provider SDKs are
+optional: openai / anthropic are imported lazily, xAI uses requests (sync) and
+httpx (async, if installed; otherwise the sync client runs in a worker thread).
+An injected client factory gets an async client built from the injected
+client's api_key where possible. Sync fallbacks run on a dedicated pool rather
+than the loop's default executor, so asyncio.run() never waits for a call a
+hedge has already abandoned.
+"""
+
+import asyncio, contextvars, functools, json, os, socket, threading, time, weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import metrics
+
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# sync-client calls made from async code (no async client for the provider/factory)
+_SYNC_POOL = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="llm-sync")
+
+# Hedging: fire a secondary engine once the primary is slower than its usual pXX.
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "4.0"))   # until enough samples exist
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MIN_SAMPLES = 10
+LATENCY_WINDOW = 200
+
+
+# ---------- Shared event loop ----------
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="llm-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+async def _adopt(ctx: contextvars.Context, coro):
+    # the task runs with the submitting thread's context (llm_usage project etc.)
+    for var, value in ctx.items():
+        var.set(value)
+    return await coro
+
+def run(coro, timeout: Optional[float] = None):
+    """
+    Run a coroutine on the process-wide background loop and wait for its result
+    (the sync counterpart of `await`). Callbacks the coroutine makes run on the
+    loop thread. Raises concurrent.futures.TimeoutError (and cancels) after `timeout`.
+    """
+    loop = _background_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("llm_engines.run() called from the background loop; await the coroutine instead.")
+    fut = asyncio.run_coroutine_threadsafe(_adopt(contextvars.copy_context(), coro), loop)
+    try:
+        return fut.result(timeout)
+    except FutureTimeout:
+        fut.cancel()
+        raise
+
+
+# ---------- Stream cancellation ----------
+class StreamCancel:
+    """Closes a running stream's provider response from another thread (e.g. at a deadline)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resources = []
+        self.cancelled = False
+
+    def attach(self, resource) -> None:
+        """Register an open response/stream (anything with close()); closed now if already cancelled."""
+        with self._lock:
+            if self.cancelled:
+                _close_quietly(resource)
+            else:
+                self._resources.append(resource)
+
+    def detach(self, resource) -> None:
+        """Unregister before the response is released (its connection may go back to the pool)."""
+        with self._lock:
+            if resource in self._resources:
+                self._resources.remove(resource)
+
+    def cancel(self) -> None:
+        # closed under the lock, so a resource is never closed after detach()
+        with self._lock:
+            self.cancelled = True
+            for r in self._resources:
+                _close_quietly(r)
+            self._resources = []
+
+def _close_quietly(resource) -> None:
+    try:
+        resource.close()
+    except Exception:
+        pass
+
+
+def _socket_of(response):
+    """Underlying socket of a streamed requests or httpx response, if reachable."""
+    conn = getattr(getattr(response, "raw", None), "_connection", None)      # requests / urllib3
+    if getattr(conn, "sock", None) is not None:
+        return conn.sock
+    ns = (getattr(response, "extensions", None) or {}).get("network_stream")   # httpx / httpcore
+    return ns.get_extra_info("socket") if ns is not None else None
+
+class _ResponseShutdown:
+    """
+    StreamCancel handle for a streamed HTTP response: shuts its socket down, which wakes
+    a read blocked on it (closing the response from another thread does not).
+    """
+    def __init__(self, response):
+        self.response = response
+
+    def close(self) -> None:
+        sock = _socket_of(self.response)
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+        else:
+            self.response.close()
+
+@contextmanager
+def _cancellable(cancel: Optional[StreamCancel], response):
+    """Let `cancel` shut `response` down while the block reads it (not once it is released)."""
+    if cancel is None:
+        yield
+        return
+    handle = _ResponseShutdown(response)
+    cancel.attach(handle)
+    try:
+        yield
+    finally:
+        cancel.detach(handle)
+
+
+# ---------- Latency samples (per engine and template) ----------
+_latencies: Dict[Tuple[str, str], deque] = {}
+_latencies_lock = threading.Lock()
+
+def record_latency(engine: str, template: Optional[str], seconds: float) -> None:
+    with _latencies_lock:
+        _latencies.setdefault((engine, template or ""), deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+def latency_percentile(engine: str, template: Optional[str] = None, pct: float = HEDGE_PERCENTILE,
+                       min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+    """pct-th percentile (seconds) of recent successful API calls, or None with too few samples."""
+    with _latencies_lock:
+        samples = sorted(_latencies.get((engine, template or ""), ()))
+    if len(samples) < max(1, min_samples):
+        return None
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+def hedge_delay(engine: str, template: Optional[str] = None) -> float:
+    p = latency_percentile(engine, template)
+    return max(HEDGE_MIN_DELAY, HEDGE_DEFAULT_DELAY if p is None else p)
+
+
+# ---------- Usage accounting and budgets (llm_usage) ----------
+def _usage():
+    try:
+        import llm_usage
+        return llm_usage if llm_usage.enabled() else None
+    except Exception:
+        return None
+
+def _account(engine, model, prompt, text, usage, seconds, downgraded=False) -> None:
+    u = _usage()
+    if u is not None:
+        try:
+            u.record_call(engine, model, prompt, text, usage, seconds * 1000, downgraded)
+        except Exception:
+            pass  # accounting must never fail a call
+
+def _account_hit(engine, model) -> None:
+    u = _usage()
+    if u is not None:
+        try:
+            u.record_hit(engine, model)
+        except Exception:
+            pass
+
+def _admit(engine: "Engine", model, prompt, temperature, template) -> Tuple[str, Optional[str]]:
+    """
+    Budget check before an API call: (model to call, cached answer or None).
+    Over the downgrade threshold the cheap model is used (or its cached answer);
+    over budget only a cached answer will do.
+    """
+    u = _usage()
+    try:
+        state, spent, budget = u.budget_state() if u is not None else ("ok", 0.0, 0.0)
+    except Exception:
+        return model, None
+    if state == "ok":
+        return model, None
+    cheap = engine.cheap_model()
+    if cheap != model:
+        hit = _cache_get(engine.name, cheap, temperature, prompt, template)
+        if hit is not None:
+            _account_hit(engine.name, cheap)
+            return cheap, hit
+    if state == "downgrade":
+        return cheap, None
+    raise u.BudgetExceeded(f"LLM budget for project '{u.current_project()}' used up today "
+                           f"(${spent:.2f} of ${budget:.2f}); no cached answer for this request.")
+
+
+# ---------- Response cache (llm_cache) ----------
+def _response_cache():
+    try:
+        import llm_cache
+        return llm_cache.get_cache() if llm_cache.enabled() else None
+    except Exception:
+        return None  # e.g. read-only data dir: run uncached
+
+def _cache_get(engine, model, temperature, prompt, template) -> Optional[str]:
+    cache = _response_cache() if template else None
+    if cache is None:
+        return None
+    try:
+        return cache.get(engine, model, temperature, prompt, template)
+    except Exception:
+        return None
+
+def _cache_put(engine, model, temperature, prompt, template, text, validate) -> None:
+    cache = _response_cache() if template else None
+    if cache is None or not (validate(text) if validate else (text or "").strip()):
+        return
+    try:
+        cache.put(engine, model, temperature, prompt, template, text)
+    except Exception:
+        pass
+
+
+class Engine:
+    """Base engine: subclasses implement _new_client / _call / _new_async_client / _acall (/ _stream)."""
+    name = ""
+    key_env = ""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._client_key = None
+        self._async: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.factory: Optional[Callable[[], object]] = None   # injected sync client builder
+
+    # ----- config -----
+    def api_key(self) -> str:
+        return os.getenv(self.key_env, "")
+
+    def model(self) -> str:
+        raise NotImplementedError
+
+    def cheap_model(self) -> str:
+        """Model used once the project nears its budget."""
+        return self.model()
+
+    def available(self) -> bool:
+        return self.factory is not None or bool(self.api_key())
+
+    def _require_key(self) -> str:
+        key = self.api_key()
+        if not key:
+            raise RuntimeError(f"{self.key_env} missing.")
+        return key
+
+    # ----- pooled clients -----
+    def client(self):
+        """Shared sync client (built once; rebuilt if the API key changes)."""
+        if self.factory is not None:
+            key = "<factory>"
+        else:
+            key = self._require_key()
+        with self._lock:
+            if self._client is None or self._client_key != key:
+                self._client = self.factory() if self.factory is not None else self._new_client(key)
+                self._client_key = key
+            return self._client
+
+    def reset(self) -> None:
+        with self._lock:
+            self._client = self._client_key = None
+            self._async = weakref.WeakKeyDictionary()
+
+    def _async_key(self) -> Optional[str]:
+        if self.factory is not None:
+            # same credentials as the injected sync client, when it exposes them
+            return getattr(self.client(), "api_key", None) or None
+        return self._require_key()
+
+    def async_client(self):
+        """Async client for the running event loop, or None if the provider (or factory) has none."""
+        loop = asyncio.get_running_loop()
+        key = self._async_key()
+        if key is None:
+            return None
+        with self._lock:
+            hit = self._async.get(loop)
+            if hit is None or hit[0] != key:
+                client = self._new_async_client(key)
+                if client is None:
+                    return None
+                hit = self._async[loop] = (key, client)
+            return hit[1]
+
+    # ----- calls -----
+    def complete(self, prompt: str, max_tokens: Optional[int] = 900, temperature: float = 0.4,
+                 model: Optional[str] = None, template: Optional[str] = None,
+                 validate: Optional[Callable[[str], bool]] = None, info: Optional[dict] = None) -> str:
+        """info (optional dict) gets "cached": whether the answer came from the response cache."""
+        info = {} if info is None else info
+        info["cached"] = False
+        requested = model = model or self.model()
+        hit = _cache_get(self.name, model, temperature, prompt, template)
+        if hit is None:
+            model, hit = _admit(self, model, prompt, temperature, template)
+        else:
+            _account_hit(self.name, model)
+        if hit is not None:
+            info["cached"] = True
+            return hit
+        client = self.client()
+        if client is None:
+            raise RuntimeError(f"{self.name} client unavailable.")
+        usage: dict = {}
+        start = time.perf_counter()
+        with metrics.stage(f"llm_{self.name}"):
+            text = self._call(client, prompt, max_tokens, temperature, model, usage)
+        elapsed = time.perf_counter() - start
+        record_latency(self.name, template, elapsed)
+        _account(self.name, model, prompt, text, usage, elapsed, model != requested)
+        _cache_put(self.name, model, temperature, prompt, template, text, validate)
+        return text
+
+    async def acomplete(self, prompt: str, max_tokens: Optional[int] = 900, temperature: float = 0.4,
+                        model: Optional[str] = None, template: Optional[str] = None,
+                        validate: Optional[Callable[[str], bool]] = None, info: Optional[dict] = None) -> str:
+        client = self.async_client()
+        if client is None:
+            call = functools.partial(self.complete, prompt, max_tokens, temperature, model, template, validate, info)
+            return await asyncio.get_running_loop().run_in_executor(_SYNC_POOL, contextvars.copy_context().run, call)
+        info = {} if info is None else info
+        info["cached"] = False
+        requested = model = model or self.model()
+        hit = _cache_get(self.name, model, temperature, prompt, template)
+        if hit is None:
+            model, hit = _admit(self, model, prompt, temperature, template)
+        else:
+            _account_hit(self.name, model)
+        if hit is not None:
+            info["cached"] = True
+            return hit
+        usage: dict = {}
+        start = time.perf_counter()
+        with metrics.stage(f"llm_{self.name}"):
+            text = await self._acall(client, prompt, max_tokens, temperature, model, usage)
+        elapsed = time.perf_counter() - start
+        record_latency(self.name, template, elapsed)
+        _account(self.name, model, prompt, text, usage, elapsed, model != requested)
+        _cache_put(self.name, model, temperature, prompt, template, text, validate)
+        return text
+
+    def stream(self, prompt: str, max_tokens: Optional[int] = 900, temperature: float = 0.4,
+               model: Optional[str] = None, template: Optional[str] = None,
+               validate: Optional[Callable[[str], bool]] = None,
+               cancel: Optional[StreamCancel] = None) -> Iterator[str]:
+        """Yield the response text in pieces as the provider generates it (see StreamCancel)."""
+        requested = model = model or self.model()
+        hit = _cache_get(self.name, model, temperature, prompt, template)
+        if hit is None:
+            model, hit = _admit(self, model, prompt, temperature, template)
+        else:
+            _account_hit(self.name, model)
+        if hit is not None:
+            yield hit
+            return
+        client = self.client()
+        if client is None:
+            raise RuntimeError(f"{self.name} client unavailable.")
+        usage: dict = {}
+        start = time.perf_counter()
+        parts = []
+        finished = False
+        try:
+            with metrics.stage(f"llm_{self.name}"):
+                for piece in self._stream(client, prompt, max_tokens, temperature, model, usage, cancel):
+                    if piece:
+                        parts.append(piece)
+                        yield piece
+            finished = True
+        finally:
+            # also when the consumer stops early (generator closed) or the stream fails:
+            # the tokens received so far are billed and count against the budget
+            elapsed = time.perf_counter() - start
+            text = "".join(parts)
+            _account(self.name, model, prompt, text, usage, elapsed, model != requested)
+            if finished:
+                record_latency(self.name, template, elapsed)
+                _cache_put(self.name, model, temperature, prompt, template, text, validate)
+
+    def _new_client(self, key: str):
+        raise NotImplementedError
+
+    def _new_async_client(self, key: str):
+        return None
+
+    # _call / _acall / _stream fill `usage` with prompt_tokens / completion_tokens when the provider reports them;
+    # _stream attaches its open response to `cancel` (if given) so another thread can close it
+    def _call(self, client, prompt, max_tokens, temperature, model, usage) -> str:
+        raise NotImplementedError
+
+    async def _acall(self, client, prompt, max_tokens, temperature, model, usage) -> str:
+        raise NotImplementedError
+
+    def _stream(self, client, prompt, max_tokens, temperature, model, usage,
+                cancel: Optional[StreamCancel] = None) -> Iterator[str]:
+        # providers without streaming: one piece
+        yield self._call(client, prompt, max_tokens, temperature, model, usage)
+
+
+# ---------- OpenAI ----------
+def _openai_usage(resp, usage: dict) -> None:
+    u = getattr(resp, "usage", None)
+    if u is not None:
+        usage["prompt_tokens"] = getattr(u, "prompt_tokens", 0) or 0
+        usage["completion_tokens"] = getattr(u, "completion_tokens", 0) or 0
+
+
+class OpenAIEngine(Engine):
+    name = "openai"
+    key_env = "OPENAI_API_KEY"
+
+    def model(self) -> str:
+        return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+    def _new_client(self, key: str):
+        from openai import OpenAI
+        return OpenAI(api_key=key, timeout=TIMEOUT)
+
+    def _new_async_client(self, key: str):
+        try:
+            from openai import AsyncOpenAI
+        except Exception:
+            return None
+        return AsyncOpenAI(api_key=key, timeout=TIMEOUT)
+
+    def _kwargs(self, prompt, max_tokens, temperature, model) -> dict:
+        kw = {"model": model, "messages": [{"role": "user", "content": prompt}], "temperature": temperature}
+        if max_tokens:
+            kw["max_tokens"] = max_tokens
+        return kw
+
+    def cheap_model(self) -> str:
+        return os.getenv("OPENAI_CHEAP_MODEL", "gpt-4o-mini")
+
+    def _call(self, client, prompt, max_tokens, temperature, model, usage) -> str:
+        r = client.chat.completions.create(**self._kwargs(prompt, max_tokens, temperature, model))
+        _openai_usage(r, usage)
+        return r.choices[0].message.content or ""
+
+    async def _acall(self, client, prompt, max_tokens, temperature, model, usage) -> str:
+        r = await client.chat.completions.create(**self._kwargs(prompt, max_tokens, temperature, model))
+        _openai_usage(r, usage)
+        return r.choices[0].message.content or ""
+
+    def _stream(self, client, prompt, max_tokens, temperature, model, usage,
+                cancel: Optional[StreamCancel] = None) -> Iterator[str]:
+        chunks = client.chat.completions.create(stream=True, stream_options={"include_usage": True},
+                                                **self._kwargs(prompt, max_tokens, temperature, model))
+        with _cancellable(cancel, getattr(chunks, "response", chunks)):
+            for chunk in chunks:
+                _openai_usage(chunk, usage)   # last chunk, with empty choices
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+
+# ---------- Claude (Anthropic) ----------
+def _anthropic_text(resp) -> str:
+    # Anthropic returns a list of content blocks; pick the first text block
+    for block in resp.content:
+        if getattr(block, "type", "") == "text":
+            return block.text
+    return ""
+
+def _anthropic_usage(resp, usage: dict) -> None:
+    u = getattr(resp, "usage", None)
+    if u is not None:
+        usage["prompt_tokens"] = getattr(u, "input_tokens", 0) or 0
+        usage["completion_tokens"] = getattr(u, "output_tokens", 0) or 0
+
+
+class ClaudeEngine(Engine):
+    name = "claude"
+    key_env = "ANTHROPIC_API_KEY"
+
+    def model(self) -> str:
+        return os.getenv("CLAUDE_MODEL", "claude-3-opus-20240229")
+
+    def _new_client(self, key: str):
+        import anthropic
+        return anthropic.Anthropic(api_key=key, timeout=TIMEOUT)
+
+    def _new_async_client(self, key: str):
+        try:
+            import anthropic
+        except Exception:
+            return None
+        return anthropic.AsyncAnthropic(api_key=key, timeout=TIMEOUT)
+
+    def cheap_model(self) -> str:
+        return os.getenv("CLAUDE_CHEAP_MODEL", "claude-3-haiku-20240307")
+
+    def _call(self, client, prompt, max_tokens, temperature, model, usage) -> str:
+        resp = client.messages.create(model=model, max_tokens=max_tokens or 900, temperature=temperature,
+                                      messages=[{"role": "user", "content": prompt}])
+        _anthropic_usage(resp, usage)
+        return _anthropic_text(resp)
+
+    async def _acall(self, client, prompt, max_tokens, temperature, model, usage) -> str:
+        resp = await client.messages.create(model=model, max_tokens=max_tokens or 900, temperature=temperature,
+                                            messages=[{"role": "user", "content": prompt}])
+        _anthropic_usage(resp, usage)
+        return _anthropic_text(resp)
+
+    def _stream(self, client, prompt, max_tokens, temperature, model, usage,
+                cancel: Optional[StreamCancel] = None) -> Iterator[str]:
+        with client.messages.stream(model=model, max_tokens=max_tokens or 900, temperature=temperature,
+                                    messages=[{"role": "user", "content": prompt}]) as s:
+            with _cancellable(cancel, getattr(s, "response", s)):
+                yield from s.text_stream
+            _anthropic_usage(s.get_final_message(), usage)
+
+
+# ---------- Grok (xAI, OpenAI-compatible REST) ----------
+def _rest_usage(data: dict) -> dict:
+    u = data.get("usage") or {}
+    return {k: u[k] for k in ("prompt_tokens", "completion_tokens") if u.get(k)}
+
+def _sse_data(raw) -> Iterator[str]:
+    """Payloads of `data:` lines from a server-sent-events body, as soon as each line arrives."""
+    read = getattr(raw, "read1", None) or raw.read   # read1: don't wait for a full buffer
+    buf = b""
+    while True:
+        chunk = read(8192)
+        if not chunk:
+            break
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            if line.startswith(b"data:"):
+                yield line[5:].strip().decode("utf-8")
+    if buf.startswith(b"data:"):
+        yield buf[5:].strip().decode("utf-8")
+
+
+class GrokEngine(Engine):
+    name = "grok"
+    key_env = "XAI_API_KEY"
+
+    def model(self) -> str:
+        return os.getenv("GROK_MODEL", "grok-beta")  # adjust if your account lists a different name
+
+    def base_url(self) -> str:
+        return os.getenv("XAI_BASE_URL", "https://api.x.ai/v1")
+
+    def _headers(self, key: str) -> dict:
+        return {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+
+    def _payload(self, prompt, max_tokens, temperature, model) -> dict:
+        return {"model": model, "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens or 900, "temperature": temperature}
+
+    def _new_client(self, key: str):
+        import requests
+        from requests.adapters import HTTPAdapter
+        s = requests.Session()
+        s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+        s.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+        s.headers.update(self._headers(key))
+        return s
+
+    def _new_async_client(self, key: str):
+        try:
+            import httpx
+        except Exception:
+            return None
+        return httpx.AsyncClient(headers=self._headers(key), timeout=TIMEOUT,
+                                 limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE))
+
+    def cheap_model(self) -> str:
+        return os.getenv("GROK_CHEAP_MODEL", "grok-3-mini")
+
+    def _call(self, client, prompt, max_tokens, temperature, model, usage) -> str:
+        r = client.post(f"{self.base_url()}/chat/completions",
+                        json=self._payload(prompt, max_tokens, temperature, model), timeout=TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        usage.update(_rest_usage(data))
+        return data["choices"][0]["message"]["content"]
+
+    async def _acall(self, client, prompt, max_tokens, temperature, model, usage) -> str:
+        r = await client.post(f"{self.base_url()}/chat/completions",
+                              json=self._payload(prompt, max_tokens, temperature, model))
+        r.raise_for_status()
+        data = r.json()
+        usage.update(_rest_usage(data))
+        return data["choices"][0]["message"]["content"]
+
+    def _stream(self, client, prompt, max_tokens, temperature, model, usage,
+                cancel: Optional[StreamCancel] = None) -> Iterator[str]:
+        payload = dict(self._payload(prompt, max_tokens, temperature, model), stream=True,
+                       stream_options={"include_usage": True})
+        with client.post(f"{self.base_url()}/chat/completions", json=payload, timeout=TIMEOUT, stream=True) as r, \
+                _cancellable(cancel, r):
+            r.raise_for_status()
+            r.raw.decode_content = True
+            for data in _sse_data(r.raw):
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage.update(_rest_usage(event))
+                choices = event.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+
+
+# ---------- Registry ----------
+ENGINES: Dict[str, Engine] = {e.name: e for e in (OpenAIEngine(), ClaudeEngine(), GrokEngine())}
+
+
+def engine_name(label: str) -> str:
+    """App selectbox label ("Claude (Anthropic)", "Grok (xAI)", "OpenAI (default)") -> registry name."""
+    label = (label or "").lower()
+    if label.startswith("claude"):
+        return "claude"
+    if label.startswith("grok"):
+        return "grok"
+    return "openai"
+
+def get_engine(name: str) -> Engine:
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM engine '{name}'. Known: {', '.join(ENGINES)}")
+
+def available(name: str) -> bool:
+    return get_engine(name).available()
+
+def complete(name: str, prompt: str, max_tokens: Optional[int] = 900, temperature: float = 0.4,
+             model: Optional[str] = None, template: Optional[str] = None,
+             validate: Optional[Callable[[str], bool]] = None, info: Optional[dict] = None) -> str:
+    return get_engine(name).complete(prompt, max_tokens, temperature, model, template, validate, info)
+
+async def acomplete(name: str, prompt: str, max_tokens: Optional[int] = 900, temperature: float = 0.4,
+                    model: Optional[str] = None, template: Optional[str] = None,
+                    validate: Optional[Callable[[str], bool]] = None, info: Optional[dict] = None) -> str:
+    return await get_engine(name).acomplete(prompt, max_tokens, temperature, model, template, validate, info)
+
+def remember(name: str, prompt: str, text: str, temperature: float = 0.4, model: Optional[str] = None,
+             template: Optional[str] = None) -> None:
+    """Cache `text` as the answer to prompt (e.g. after a JSON repair), if template caching applies."""
+    _cache_put(name, model or get_engine(name).model(), temperature, prompt, template, text, None)
+
+def stream(name: str, prompt: str, max_tokens: Optional[int] = 900, temperature: float = 0.4,
+           model: Optional[str] = None, template: Optional[str] = None,
+           validate: Optional[Callable[[str], bool]] = None,
+           cancel: Optional[StreamCancel] = None) -> Iterator[str]:
+    return get_engine(name).stream(prompt, max_tokens, temperature, model, template, validate, cancel)
+
+
+# ---------- Hedged requests ----------
+def hedge_partner(primary: str, preferred: Optional[str] = None) -> Optional[str]:
+    """Secondary engine for `primary`: `preferred` if usable, else the first other engine with a key."""
+    order = ([preferred] if preferred else []) + ["claude", "grok", "openai"]
+    for name in order:
+        if name in ENGINES and name != primary and ENGINES[name].available():
+            return name
+    return None
+
+async def ahedged_complete(primary: str, secondary: Optional[str], prompt: str, max_tokens: Optional[int] = 900,
+                           temperature: float = 0.4, template: Optional[str] = None,
+                           validate: Optional[Callable[[str], bool]] = None,
+                           delay: Optional[float] = None) -> Tuple[str, str]:
+    """
+    Send prompt to `primary`; if it has not produced a valid answer after `delay`
+    (default: its recent HEDGE_PERCENTILE latency for this template), or fails
+    before that, send the same prompt to `secondary`. The first response passing
+    `validate` wins and the other request is cancelled. Returns (text, engine).
+    """
+    validate = validate or (lambda t: bool((t or "").strip()))
+    delay = hedge_delay(primary, template) if delay is None else delay
+    tasks = {asyncio.ensure_future(acomplete(primary, prompt, max_tokens, temperature, None, template, validate)): primary}
+    hedged = secondary is None
+    errors = []
+
+    def fire_secondary():
+        nonlocal hedged
+        hedged = True
+        tasks[asyncio.ensure_future(acomplete(secondary, prompt, max_tokens, temperature, None, template, validate))] = secondary
+
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, timeout=None if hedged else delay,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:          # primary is past its usual latency
+                fire_secondary()
+                continue
+            for task in done:
+                name = tasks.pop(task)
+                if task.exception() is None and validate(task.result()):
+                    if secondary is not None and hedged:    # the secondary was fired
+                        metrics.LLM_HEDGES.inc(primary=primary, secondary=secondary, winner=name)
+                    return task.result(), name
+                errors.append(f"{name}: {task.exception() or 'invalid response'}")
+            if not hedged:        # primary failed fast: no point waiting out the delay
+                fire_secondary()
+        raise RuntimeError("No valid LLM response (" + "; ".join(errors) + ")")
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,276 @@
+# llm_json.py
+"""
+Tolerant parsing and validation of JSON answers from the LLM drafters.
+
+Models wrap JSON in ```json fences, add a sentence before or after it, use
+trailing commas, Python literals, single quotes, raw newlines inside strings,
+or stop mid-object at max_tokens. loads() recovers all of these locally:
+
+    loads('Sure!\\n```json\\n{"title": "A", "meta": "B",}\\n```')  -> {"title": "A", "meta": "B"}
+
+parse(text, schema) additionally checks the shape. A schema is a dict of
+required keys -> type (or tuple of types), a nested schema dict, or a
+one-element list [item schema] for a non-empty list; empty values count as missing:
+
+    parse(txt, {"faqs": [{"q": str, "a": str}]})
+
+complete_json() is the drafters' call path: one completion, local repair, and
+only if that still fails, a short repair prompt (the broken answer + what is
+wrong, not the original request) up to LLM_JSON_REPAIRS times. Only well-formed
+answers are cached (validator is strict); an answer fixed by the repair prompt
+is cached under the original prompt, so the next identical request is a cache
+hit, while one only patched up locally is not. Outcomes are counted in
+metrics.LLM_JSON_REPAIRS (engine, result).
+"""
+
+import json, os, re
+from typing import Callable, List, Optional
+
+import llm_engines
+import metrics
+
+REPAIRS = int(os.getenv("LLM_JSON_REPAIRS", "1"))
+REPAIR_EXCERPT = 4000          # chars of the broken answer quoted back to the model
+
+# Response shapes of the plan drafters
+TITLES_SCHEMA = {"title": str, "meta": str}
+FAQS_SCHEMA = {"faqs_md": str, "faq_jsonld": (str, dict, list)}
+
+_FENCE = re.compile(r"```[a-zA-Z0-9_-]*\s*\n?(.*?)(?:```|$)", re.S)
+_LITERALS = {"True": "true", "False": "false", "None": "null", "true": "true", "false": "false", "null": "null"}
+_CLOSE = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    """Answer could not be turned into JSON of the expected shape."""
+    def __init__(self, errors: List[str], text: str = ""):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+        self.text = text
+
+
+# ---------- Extraction / repair ----------
+def _extract(text: str) -> str:
+    """The JSON-looking part: inside the first fence if any, from the first { or [."""
+    text = (text or "").strip()
+    m = _FENCE.search(text)
+    if m and re.search(r"[{\[]", m.group(1)):
+        text = m.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    return text[min(starts):] if starts else text
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    k = len(out) - 1
+    while k >= 0 and out[k].isspace():
+        k -= 1
+    if k >= 0 and out[k] == ",":
+        del out[k]
+
+def _next_char(s: str, i: int) -> str:
+    while i < len(s) and s[i].isspace():
+        i += 1
+    return s[i] if i < len(s) else ""
+
+def repair(text: str) -> str:
+    """
+    Best-effort JSON from a damaged answer: stops after the first complete
+    value (trailing prose), quotes bare keys, converts single-quoted strings and
+    Python literals, escapes raw control characters in strings, drops comments
+    and trailing commas, and closes strings/brackets left open by truncation.
+    """
+    s = _extract(text)
+    out: List[str] = []
+    stack: List[str] = []
+    quote = None
+    i, n = 0, len(s)
+    while i < n:
+        c = s[i]
+        if quote:
+            if c == "\\" and i + 1 < n:
+                out.append("'" if s[i + 1] == "'" else s[i:i + 2])
+                i += 2
+                continue
+            if c == quote:
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')
+            else:
+                out.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}.get(c, c))
+            i += 1
+            continue
+        if c in "\"'":
+            quote = c
+            out.append('"')
+        elif s.startswith("//", i) or s.startswith("/*", i):
+            end = s.find("\n" if s[i + 1] == "/" else "*/", i + 2)
+            i = n if end < 0 else end + (0 if s[i + 1] == "/" else 2)
+            continue
+        elif c in "{[":
+            stack.append(c)
+            out.append(c)
+        elif c in "}]":
+            _drop_trailing_comma(out)
+            out.append(c)
+            if stack:
+                stack.pop()
+            if not stack:
+                break          # first complete value; ignore what follows
+        elif c.isalpha() or c == "_":
+            j = i
+            while j < n and (s[j].isalnum() or s[j] == "_"):
+                j += 1
+            word = s[i:j]
+            if _next_char(s, j) == ":" and word not in _LITERALS:
+                out.append(f'"{word}"')
+            else:
+                out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    if quote:
+        out.append('"')
+    body = "".join(out).rstrip()
+    if not stack:
+        return body
+    # truncated: drop a dangling separator / key, then close what is open
+    closers = "".join(_CLOSE[b] for b in reversed(stack))
+    for _ in range(4):
+        candidate = body.rstrip().rstrip(",")
+        if candidate.endswith(":"):
+            candidate += " null"
+        try:
+            json.loads(candidate + closers)
+            return candidate + closers
+        except ValueError:
+            cut = body.rfind(",")
+            if cut < 0:
+                break
+            body = body[:cut]
+    return body + closers
+
+def loads(text: str):
+    """json.loads that tolerates fences, surrounding prose and common damage; ValueError if hopeless."""
+    raw = (text or "").strip()
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    try:
+        return json.loads(_extract(raw))
+    except ValueError:
+        return json.loads(repair(raw))
+
+
+# ---------- Validation ----------
+def _type_names(t) -> str:
+    types = t if isinstance(t, tuple) else (t,)
+    return " or ".join({str: "string", dict: "object", list: "list", int: "integer",
+                        float: "number", bool: "boolean"}.get(x, x.__name__) for x in types)
+
+def check(value, schema, path: str = "") -> List[str]:
+    """Problems with value against schema ([] when it matches)."""
+    where = path or "the answer"
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            return [f"{where} must be a JSON object"]
+        errors = []
+        for key, sub in schema.items():
+            item = value.get(key)
+            if item is None or item in ("", [], {}):
+                errors.append(f'missing "{path + "." if path else ""}{key}"')
+            else:
+                errors += check(item, sub, f"{path}.{key}" if path else key)
+        return errors
+    if isinstance(schema, list):
+        if not isinstance(value, list) or not value:
+            return [f"{where} must be a non-empty list"]
+        return [e for i, v in enumerate(value) for e in check(v, schema[0], f"{path}[{i}]")]
+    if not isinstance(value, schema):
+        return [f"{where} must be a {_type_names(schema)}"]
+    return []
+
+def parse(text: str, schema=None) -> dict:
+    """loads() + check(); JSONRepairError with the problems if either fails."""
+    try:
+        data = loads(text)
+    except ValueError as e:
+        raise JSONRepairError([f"not valid JSON ({e})"], text)
+    errors = check(data, schema if schema is not None else {})
+    if errors:
+        raise JSONRepairError(errors, text)
+    return data
+
+def validator(schema=None, strict: bool = True) -> Callable[[str], bool]:
+    """
+    Cache/hedge validator: True when the text is JSON of the schema's shape. Strict
+    (the default) only strips fences and surrounding prose, so answers that needed
+    repair - truncated JSON closed off, trailing commas - are never cached;
+    strict=False accepts anything parse() recovers.
+    """
+    def valid(text: str) -> bool:
+        try:
+            data = json.JSONDecoder().raw_decode(_extract(text))[0] if strict else loads(text)
+        except ValueError:
+            return False
+        return not check(data, schema if schema is not None else {})
+    return valid
+
+
+# ---------- Repair round-trip ----------
+def _shape(schema):
+    if isinstance(schema, dict):
+        return {k: _shape(v) for k, v in schema.items()}
+    if isinstance(schema, list):
+        return [_shape(schema[0])]
+    return f"<{_type_names(schema)}>"
+
+def repair_prompt(text: str, errors: List[str], schema=None) -> str:
+    excerpt = (text or "")[:REPAIR_EXCERPT]
+    return f"""
+Your previous answer could not be used: {"; ".join(errors)}.
+Return ONLY the corrected JSON (no fences, no commentary), in this shape:
+{json.dumps(_shape(schema if schema is not None else {}))}
+Previous answer:
+{excerpt}
+"""
+
+def complete_json(engine: str, prompt: str, schema=None, max_tokens: Optional[int] = 900, temperature: float = 0.4,
+                  model: Optional[str] = None, template: Optional[str] = None, repairs: int = REPAIRS) -> dict:
+    """
+    Completion parsed into schema. Provider errors (missing key, HTTP) propagate
+    unchanged; a JSONRepairError means the answer stayed unusable after `repairs` re-asks.
+    """
+    valid = validator(schema)
+    text = llm_engines.complete(engine, prompt, max_tokens=max_tokens, temperature=temperature,
+                                model=model, template=template, validate=valid)
+    try:
+        data = parse(text, schema)
+        if not _strict(text):
+            metrics.LLM_JSON_REPAIRS.inc(engine=engine, result="local")
+        return data
+    except JSONRepairError as e:
+        error = e
+    for _ in range(max(0, repairs)):
+        text = llm_engines.complete(engine, repair_prompt(error.text, error.errors, schema),
+                                    max_tokens=max_tokens, temperature=0.0, model=model)
+        try:
+            data = parse(text, schema)
+        except JSONRepairError as e:
+            error = e
+            continue
+        metrics.LLM_JSON_REPAIRS.inc(engine=engine, result="reprompt")
+        llm_engines.remember(engine, prompt, json.dumps(data), temperature, model, template)
+        return data
+    metrics.LLM_JSON_REPAIRS.inc(engine=engine, result="failed")
+    raise error
+
+def _strict(text: str) -> bool:
+    try:
+        json.loads((text or "").strip())
+        return True
+    except ValueError:
+        return False
@@ -1,50 +1,321 @@
 # llm_plan_helper.py
-def build_llm_plan(engine_label: str, domain: str, target_url: str, keywords: list, audit_row: dict, kpi: dict) -> dict:
+"""
+LLM plan = suggested title/meta + FAQs/JSON-LD for one page.
+
+The two drafts are independent requests, so build_llm_plan issues them
+concurrently (asyncio over a small worker pool, since the drafters use the
+pooled sync clients) under one shared LLM_PLAN_TIMEOUT. Each call falls back
+on its own: selected engine -> OpenAI on error -> placeholder on timeout.
+Per-call latency and fallbacks are returned in plan["metadata"].
+
+Hedging (hedge=True or LLM_HEDGE=on): each call sends the shared prompt
+(llmseo_agent.titles_prompt / faqs_prompt) to the selected engine and, once
+that engine is slower than its usual p90 (llm_engines.hedge_delay), also to a
+second engine (LLM_HEDGE_SECONDARY, default the first other engine with a
+key). The first answer that parses as the expected JSON wins.
+
+draft_titles / draft_faqs are the same per-call steps for callers that
+schedule them separately (the snapshot stage graph).
+
+stream_llm_plan is the progressive variant for the UI: titles/meta are drafted
+in the background while the FAQs stream (llmseo_agent.stream_faqs), and events
+are yielded as pieces become available, so the first content shows after the
+first streamed tokens instead of after the whole FAQ JSON.
+"""
+
+import asyncio, contextvars, os, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import llm_engines
+import llm_json
+from llm_plugins import claude_titles_and_meta, claude_faqs_and_schema, grok_titles_and_meta, grok_faqs_and_schema
+from llmseo_agent import (draft_titles_and_meta, draft_faqs_and_schema, placeholder_titles, placeholder_faqs,
+                          titles_prompt, faqs_prompt, parse_titles, parse_faqs, stream_faqs, faq_fields,
+                          TITLES_TEMPLATE, FAQS_TEMPLATE)
+
+# engine name (llm_engines) -> (titles/meta drafter, FAQ drafter); OpenAI is the fallback.
+DRAFTERS = {
+    "claude": (claude_titles_and_meta, claude_faqs_and_schema),
+    "grok": (grok_titles_and_meta, grok_faqs_and_schema),
+    "openai": (draft_titles_and_meta, draft_faqs_and_schema),
+}
+
+EXTRA_QUESTIONS = [
+    "Can I fly with a portable oxygen concentrator in the UK?",
+    "Portable vs home oxygen concentrators: which is right for me?",
+]
+
+PLAN_TIMEOUT = float(os.getenv("LLM_PLAN_TIMEOUT", "60"))
+HEDGE = os.getenv("LLM_HEDGE", "off").lower() in ("1", "on", "true", "yes")
+HEDGE_SECONDARY = os.getenv("LLM_HEDGE_SECONDARY", "")   # claude | grok | openai; empty = first available
+# Dedicated pool: a call that outlives the timeout keeps its thread, but the
+# plan's coroutine does not wait for it (only the deadline does).
+# Work is submitted with the caller's context so llm_usage accounts it to the right project.
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_PLAN_WORKERS", "8")), thread_name_prefix="llm-plan")
+# Streamed FAQ readers get their own pool, so open streams never starve build_llm_plan's drafts.
+_STREAM_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_STREAM_WORKERS", "4")),
+                                  thread_name_prefix="llm-stream")
+
+
+def faq_topic(domain: str) -> str:
+    return f"{domain} oxygen"
+
+def faq_questions(keywords: List[str]) -> List[str]:
+    return keywords[:3] + EXTRA_QUESTIONS
+
+
+def _draft(kind: int, engine: str, *args) -> Tuple[dict, str]:
+    """(result, engine that served it) for drafter `kind` (0 titles, 1 faqs); errors fall back to OpenAI."""
+    try:
+        return DRAFTERS[engine][kind](*args), engine
+    except Exception:
+        if engine == "openai":
+            raise
+        return DRAFTERS["openai"][kind](*args), "openai"
+
+def draft_titles(engine: str, url: str, page_title: str, h1_count: int, lvi: int, keywords: List[str]) -> Tuple[dict, str]:
+    return _draft(0, engine, url, page_title, h1_count, lvi, keywords)
+
+def draft_faqs(engine: str, topic: str, questions: List[str]) -> Tuple[dict, str]:
+    return _draft(1, engine, topic, questions)
+
+
+def timed_draft(fn: Callable, placeholder: Callable[[], dict], engine: str, *args,
+                timeout: Optional[float] = None) -> Tuple[dict, dict]:
     """
-    Returns dict: {"suggested_title","suggested_meta","faqs_md","faq_jsonld"}.
-    Uses OpenAI by default; switches to Claude or Grok if keys are present and engine selected.
+    One plan call with its own deadline, for stage graphs that schedule titles and
+    FAQs separately: (value, {"latency_ms", "served_by", "fallback"}).
     """
-    import json
+    start = time.perf_counter()
+    fut = _POOL.submit(contextvars.copy_context().run, fn, engine, *args)
+    try:
+        value, served = fut.result(timeout=PLAN_TIMEOUT if timeout is None else timeout)
+        fallback = None if served == engine else "error"
+    except FutureTimeout:
+        value, served, fallback = placeholder(), "placeholder", "timeout"
+    except Exception:
+        value, served, fallback = placeholder(), "placeholder", "error"
+    return value, {"latency_ms": round((time.perf_counter() - start) * 1000, 1), "served_by": served, "fallback": fallback}
+
+
+async def _call(fn: Callable, *args) -> Tuple[dict, str, float]:
+    start = time.perf_counter()
+    value, served = await asyncio.get_running_loop().run_in_executor(_POOL, contextvars.copy_context().run, fn, *args)
+    return value, served, (time.perf_counter() - start) * 1000
+
+
+# kind -> (max_tokens, temperature, template, validator)
+_HEDGED = {
+    "titles": (400, 0.3, TITLES_TEMPLATE, llm_json.validator(llm_json.TITLES_SCHEMA)),
+    "faqs": (1500, 0.4, FAQS_TEMPLATE, llm_json.validator(llm_json.FAQS_SCHEMA)),
+}
+
+async def _hedged(kind: str, primary: str, secondary: str, prompt: str,
+                  parse: Callable[[str], dict]) -> Tuple[dict, str, float]:
+    max_tokens, temperature, template, validate = _HEDGED[kind]
+    start = time.perf_counter()
+    text, served = await llm_engines.ahedged_complete(primary, secondary, prompt, max_tokens=max_tokens,
+                                                      temperature=temperature, template=template, validate=validate)
+    return parse(text), served, (time.perf_counter() - start) * 1000
+
+
+async def abuild_llm_plan(engine_label: str, domain: str, target_url: str, keywords: list, audit_row: dict,
+                          kpi: dict, timeout: Optional[float] = None, hedge: Optional[bool] = None) -> dict:
+    """Async build_llm_plan: both drafts in flight at once, sharing one deadline."""
+    engine = llm_engines.engine_name(engine_label)
     url_for_ai = target_url or (f"https://{domain}" if domain else "")
     page_title = audit_row.get("title", "")
     h1_count = audit_row.get("h1_count", 0)
     lvi = kpi.get("lvi", audit_row.get("lvi", 0))
     kw_list = keywords[:]
+    questions = faq_questions(kw_list)
 
-    try:
-        if engine_label.startswith("Claude"):
-            from llm_plugins import claude_titles_and_meta, claude_faqs_and_schema
-            tm = claude_titles_and_meta(url_for_ai, page_title, h1_count, lvi, kw_list)
-            faq_pack = claude_faqs_and_schema(f"{domain} oxygen", kw_list[:3] + [
-                "Can I fly with a portable oxygen concentrator in the UK?",
-                "Portable vs home oxygen concentrators: which is right for me?",
-            ])
-        elif engine_label.startswith("Grok"):
-            from llm_plugins import grok_titles_and_meta, grok_faqs_and_schema
-            tm = grok_titles_and_meta(url_for_ai, page_title, h1_count, lvi, kw_list)
-            faq_pack = grok_faqs_and_schema(f"{domain} oxygen", kw_list[:3] + [
-                "Can I fly with a portable oxygen concentrator in the UK?",
-                "Portable vs home oxygen concentrators: which is right for me?",
-            ])
+    secondary = llm_engines.hedge_partner(engine, HEDGE_SECONDARY or None) if (HEDGE if hedge is None else hedge) else None
+    started = time.perf_counter()
+    if secondary:
+        tasks = {
+            "titles": asyncio.ensure_future(_hedged("titles", engine, secondary,
+                                                    titles_prompt(url_for_ai, page_title, h1_count, lvi, kw_list),
+                                                    lambda t: parse_titles(t, page_title))),
+            "faqs": asyncio.ensure_future(_hedged("faqs", engine, secondary,
+                                                  faqs_prompt(faq_topic(domain), questions), parse_faqs)),
+        }
+    else:
+        tasks = {
+            "titles": asyncio.ensure_future(_call(draft_titles, engine, url_for_ai, page_title, h1_count, lvi, kw_list)),
+            "faqs": asyncio.ensure_future(_call(draft_faqs, engine, faq_topic(domain), questions)),
+        }
+    await asyncio.wait(tasks.values(), timeout=PLAN_TIMEOUT if timeout is None else timeout)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    placeholders = {"titles": lambda: placeholder_titles(page_title), "faqs": lambda: placeholder_faqs(questions)}
+    values: Dict[str, dict] = {}
+    meta = {"engine": engine, "hedge": secondary, "latency_ms": {}, "served_by": {}, "fallback": {}}
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            values[name], served, ms, fallback = placeholders[name](), "placeholder", elapsed, "timeout"
+        elif task.exception() is not None:
+            values[name], served, ms, fallback = placeholders[name](), "placeholder", elapsed, "error"
         else:
-            from llmseo_agent import draft_titles_and_meta, draft_faqs_and_schema
-            tm = draft_titles_and_meta(url_for_ai, page_title, h1_count, lvi, kw_list)
-            faq_pack = draft_faqs_and_schema(f"{domain} oxygen", kw_list[:3] + [
-                "Can I fly with a portable oxygen concentrator in the UK?",
-                "Portable vs home oxygen concentrators: which is right for me?",
-            ])
-    except Exception:
-        from llmseo_agent import draft_titles_and_meta, draft_faqs_and_schema
-        tm = draft_titles_and_meta(url_for_ai, page_title, h1_count, lvi, kw_list)
-        faq_pack = draft_faqs_and_schema(f"{domain} oxygen", kw_list[:3] + [
-            "Can I fly with a portable oxygen concentrator in the UK?",
-            "Portable vs home oxygen concentrators: which is right for me?",
-        ])
+            values[name], served, ms = task.result()
+            fallback = None if served == engine else ("hedge" if served == secondary else "error")
+        meta["latency_ms"][name] = round(ms, 1)
+        meta["served_by"][name] = served
+        meta["fallback"][name] = fallback
+    meta["latency_ms"]["total"] = round(elapsed, 1)
 
+    tm, faq_pack = values["titles"], values["faqs"]
     return {
         "suggested_title": tm.get("title", ""),
         "suggested_meta": tm.get("meta", ""),
         "faqs_md": faq_pack.get("faqs_md", ""),
-        "faq_jsonld": faq_pack.get("faq_jsonld", "")
+        "faq_jsonld": faq_pack.get("faq_jsonld", ""),
+        "metadata": meta,
     }
 
+
+def build_llm_plan(engine_label: str, domain: str, target_url: str, keywords: list, audit_row: dict, kpi: dict,
+                   timeout: Optional[float] = None, hedge: Optional[bool] = None) -> dict:
+    """
+    Returns dict: {"suggested_title","suggested_meta","faqs_md","faq_jsonld","metadata"}.
+    Uses OpenAI by default; switches to Claude or Grok if keys are present and engine selected.
+    metadata: {"engine", "hedge", "latency_ms": {"titles","faqs","total"}, "served_by", "fallback"}.
+    """
+    # on the shared llm_engines loop, so its async clients (and TLS pools) are reused across plans
+    return llm_engines.run(abuild_llm_plan(engine_label, domain, target_url, keywords, audit_row, kpi, timeout, hedge))
+
+
+def _titles_job(engine: str, secondary: Optional[str], url: str, page_title: str, h1_count: int, lvi: int,
+                keywords: List[str]) -> Tuple[dict, str, float]:
+    if secondary:
+        return llm_engines.run(_hedged("titles", engine, secondary, titles_prompt(url, page_title, h1_count, lvi, keywords),
+                                       lambda t: parse_titles(t, page_title)))
+    start = time.perf_counter()
+    value, served = draft_titles(engine, url, page_title, h1_count, lvi, keywords)
+    return value, served, (time.perf_counter() - start) * 1000
+
+
+def _pump_faqs(gen: Iterator[Tuple[str, object]], events: queue.Queue, stop: threading.Event) -> None:
+    """Move stream_faqs events onto `events` until done, failed ("error") or `stop` is set."""
+    try:
+        for event in gen:
+            if stop.is_set():
+                break
+            events.put(event)
+    except Exception as e:
+        events.put(("error", e))
+    finally:
+        gen.close()   # closes the provider stream; llm_engines accounts what was received
+
+
+def stream_llm_plan(engine_label: str, domain: str, target_url: str, keywords: list, audit_row: dict, kpi: dict,
+                    timeout: Optional[float] = None, hedge: Optional[bool] = None) -> Iterator[Tuple[str, object]]:
+    """
+    build_llm_plan, yielded progressively:
+      ("titles", {"title","meta"})   when the title/meta draft is ready,
+      ("item", {"q","a"})            each FAQ pair as soon as it is complete,
+      ("partial", {"q","a"})         the FAQ pair still being written,
+      ("plan", plan)                 last: same dict as build_llm_plan, metadata also has
+                                     latency_ms["first_content"] and "streamed".
+    If the engine cannot stream, the FAQs come from draft_faqs (OpenAI fallback) in one piece.
+    The whole plan shares LLM_PLAN_TIMEOUT: at the deadline the provider stream is closed and
+    the FAQ pairs received so far (or the placeholder) are used, fallback "timeout".
+    """
+    engine = llm_engines.engine_name(engine_label)
+    url_for_ai = target_url or (f"https://{domain}" if domain else "")
+    page_title = audit_row.get("title", "")
+    h1_count = audit_row.get("h1_count", 0)
+    lvi = kpi.get("lvi", audit_row.get("lvi", 0))
+    kw_list = keywords[:]
+    questions = faq_questions(kw_list)
+    deadline = PLAN_TIMEOUT if timeout is None else timeout
+    secondary = llm_engines.hedge_partner(engine, HEDGE_SECONDARY or None) if (HEDGE if hedge is None else hedge) else None
+
+    started = time.perf_counter()
+    elapsed = lambda: (time.perf_counter() - started) * 1000
+    meta = {"engine": engine, "hedge": secondary, "latency_ms": {}, "served_by": {}, "fallback": {}, "streamed": False}
+    titles_fut = _POOL.submit(contextvars.copy_context().run, _titles_job, engine, secondary,
+                              url_for_ai, page_title, h1_count, lvi, kw_list)
+    tm, first = None, None
+
+    def titles_ready(wait: Optional[float] = None) -> bool:
+        """Collect the titles draft once: without waiting (wait=None) or up to `wait` seconds."""
+        nonlocal tm
+        if tm is not None or (wait is None and not titles_fut.done()):
+            return False
+        try:
+            tm, served, ms = titles_fut.result(timeout=wait)
+            fallback = None if served == engine else ("hedge" if served == secondary else "error")
+        except FutureTimeout:
+            tm, served, ms, fallback = placeholder_titles(page_title), "placeholder", elapsed(), "timeout"
+        except Exception:
+            tm, served, ms, fallback = placeholder_titles(page_title), "placeholder", elapsed(), "error"
+        meta["latency_ms"]["titles"] = round(ms, 1)
+        meta["served_by"]["titles"], meta["fallback"]["titles"] = served, fallback
+        return True
+
+    # The FAQ stream is consumed on a worker so the deadline holds even while the provider stalls;
+    # at the deadline `cancel` closes the provider response, which frees that worker too.
+    events: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+    stop = threading.Event()
+    cancel = llm_engines.StreamCancel()
+    _STREAM_POOL.submit(contextvars.copy_context().run, _pump_faqs,
+                        stream_faqs(faq_topic(domain), questions, engine, cancel=cancel), events, stop)
+    faq_pack, pairs, failed = None, [], False
+    try:
+        while faq_pack is None and not failed:
+            remaining = deadline - elapsed() / 1000
+            if remaining <= 0:
+                break
+            try:
+                kind, value = events.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                kind, value = None, None
+            if titles_ready():
+                first = first or elapsed()
+                yield "titles", tm
+            if kind == "done":
+                faq_pack = value
+                meta["served_by"]["faqs"], meta["fallback"]["faqs"], meta["streamed"] = engine, None, True
+            elif kind in ("item", "partial"):
+                if kind == "item":
+                    pairs.append(value)
+                first = first or elapsed()
+                yield kind, value
+            elif kind == "error":
+                failed = True
+    finally:
+        stop.set()   # deadline passed or the consumer went away: stop reading the stream
+        cancel.cancel()
+
+    if faq_pack is None and not failed:
+        # deadline: keep the pairs already shown, else the placeholder
+        faq_pack = faq_fields(pairs) if pairs else placeholder_faqs(questions)
+        meta["served_by"]["faqs"] = engine if pairs else "placeholder"
+        meta["fallback"]["faqs"], meta["streamed"] = "timeout", bool(pairs)
+    elif faq_pack is None:
+        fut = _POOL.submit(contextvars.copy_context().run, draft_faqs, engine, faq_topic(domain), questions)
+        try:
+            faq_pack, served = fut.result(timeout=max(0.0, deadline - elapsed() / 1000))
+            meta["served_by"]["faqs"], meta["fallback"]["faqs"] = served, None if served == engine else "error"
+        except FutureTimeout:
+            faq_pack = placeholder_faqs(questions)
+            meta["served_by"]["faqs"], meta["fallback"]["faqs"] = "placeholder", "timeout"
+        except Exception:
+            faq_pack = placeholder_faqs(questions)
+            meta["served_by"]["faqs"], meta["fallback"]["faqs"] = "placeholder", "error"
+    meta["latency_ms"]["faqs"] = round(elapsed(), 1)
+
+    if titles_ready(wait=max(0.0, deadline - elapsed() / 1000)):
+        yield "titles", tm
+    meta["latency_ms"]["first_content"] = round(first or elapsed(), 1)
+    meta["latency_ms"]["total"] = round(elapsed(), 1)
+    yield "plan", {
+        "suggested_title": tm.get("title", ""),
+        "suggested_meta": tm.get("meta", ""),
+        "faqs_md": faq_pack.get("faqs_md", ""),
+        "faq_jsonld": faq_pack.get("faq_jsonld", ""),
+        "metadata": meta,
+    }
@@ -2,29 +2,28 @@
 """
 Optional LLM engines for LLMSEO: Claude (Anthropic) and Grok (xAI).
 If keys are not set, calls will raise RuntimeError so the app can fall back to OpenAI.
+Clients are pooled and reused across calls by llm_engines.
 """
 
-import os, json, requests
+from typing import Iterator
+
+import llm_engines
+from llm_json import complete_json, validator, JSONRepairError, TITLES_SCHEMA, FAQS_SCHEMA
+from llmseo_agent import faqs_from
+
+# Response-cache template versions (see llm_cache); bump when a prompt's meaning changes.
+TITLES_TEMPLATE = "titles-v1"
+FAQS_TEMPLATE = "faqs-v1"
 
 # ---------- Claude (Anthropic) ----------
-def claude_complete(prompt: str, max_tokens: int = 900) -> str:
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise RuntimeError("ANTHROPIC_API_KEY missing.")
-    import anthropic
-    client = anthropic.Anthropic(api_key=api_key)
-    model = os.getenv("CLAUDE_MODEL", "claude-3-opus-20240229")
-    resp = client.messages.create(
-        model=model,
-        max_tokens=max_tokens,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.4,
-    )
-    # Anthropic returns a list of content blocks; pick the first text block
-    for block in resp.content:
-        if getattr(block, "type", "") == "text":
-            return block.text
-    return ""
+def claude_complete(prompt: str, max_tokens: int = 900, template: str = None) -> str:
+    return llm_engines.complete("claude", prompt, max_tokens=max_tokens, temperature=0.4,
+                                template=template, validate=validator() if template else None)
+
+def claude_stream(prompt: str, max_tokens: int = 900, template: str = None) -> Iterator[str]:
+    """claude_complete, yielding text as it is generated."""
+    return llm_engines.stream("claude", prompt, max_tokens=max_tokens, temperature=0.4,
+                              template=template, validate=validator() if template else None)
 
 def claude_titles_and_meta(url: str, page_title: str, h1_count: int, lvi: int, keywords: list) -> dict:
     prompt = f"""
@@ -33,10 +32,9 @@ for the page at {url}. Current title: "{page_title}". H1 count: {h1_count}. LVI:
 Target keywords: {', '.join(keywords[:5])}.
 Return strict JSON with keys: title, meta. No extra text.
 """
-    txt = claude_complete(prompt, max_tokens=400).strip()
     try:
-        return json.loads(txt)
-    except Exception:
+        return complete_json("claude", prompt, TITLES_SCHEMA, max_tokens=400, template=TITLES_TEMPLATE)
+    except JSONRepairError:
         return {"title": f"{(page_title or 'Page')[:45]} | LLMSEO", "meta": "Add benefits, key specs, and a clear CTA."}
 
 def claude_faqs_and_schema(topic: str, questions: list) -> dict:
@@ -48,31 +46,21 @@ Return strict JSON with keys:
 Questions: {questions[:6]}
 No extra commentary.
 """
-    txt = claude_complete(prompt, max_tokens=1500).strip()
     try:
-        data = json.loads(txt)
-        return {"faqs_md": data.get("faqs_md",""), "faq_jsonld": data.get("faq_jsonld","")}
-    except Exception:
+        data = complete_json("claude", prompt, FAQS_SCHEMA, max_tokens=1500, template=FAQS_TEMPLATE)
+        return faqs_from(data)
+    except JSONRepairError:
         return {"faqs_md": "", "faq_jsonld": ""}
 
 # ---------- Grok (xAI) ----------
-def grok_complete(prompt: str, max_tokens: int = 900) -> str:
-    api_key = os.getenv("XAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("XAI_API_KEY missing.")
-    base = os.getenv("XAI_BASE_URL", "https://api.x.ai/v1")
-    model = os.getenv("GROK_MODEL", "grok-beta")  # adjust if your account lists a different name
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": max_tokens,
-        "temperature": 0.4,
-    }
-    r = requests.post(f"{base}/chat/completions", headers=headers, json=payload, timeout=60)
-    r.raise_for_status()
-    data = r.json()
-    return data["choices"][0]["message"]["content"]
+def grok_complete(prompt: str, max_tokens: int = 900, template: str = None) -> str:
+    return llm_engines.complete("grok", prompt, max_tokens=max_tokens, temperature=0.4,
+                                template=template, validate=validator() if template else None)
+
+def grok_stream(prompt: str, max_tokens: int = 900, template: str = None) -> Iterator[str]:
+    """grok_complete, yielding text as it is generated."""
+    return llm_engines.stream("grok", prompt, max_tokens=max_tokens, temperature=0.4,
+                              template=template, validate=validator() if template else None)
 
 def grok_titles_and_meta(url: str, page_title: str, h1_count: int, lvi: int, keywords: list) -> dict:
     prompt = f"""
@@ -82,8 +70,7 @@ Target keywords: {', '.join(keywords[:5])}.
 Return strict JSON with keys: title, meta only.
 """
     try:
-        txt = grok_complete(prompt, max_tokens=500).strip()
-        return json.loads(txt)
+        return complete_json("grok", prompt, TITLES_SCHEMA, max_tokens=500, template=TITLES_TEMPLATE)
     except Exception:
         return {"title": f"{(page_title or 'Page')[:45]} | LLMSEO", "meta": "Add benefits, key specs, and a clear CTA."}
 
@@ -96,9 +83,8 @@ Output strict JSON with:
 Questions: {questions[:6]}
 """
     try:
-        txt = grok_complete(prompt, max_tokens=1500).strip()
-        data = json.loads(txt)
-        return {"faqs_md": data.get("faqs_md",""), "faq_jsonld": data.get("faq_jsonld","")}
+        data = complete_json("grok", prompt, FAQS_SCHEMA, max_tokens=1500, template=FAQS_TEMPLATE)
+        return faqs_from(data)
     except Exception:
         return {"faqs_md": "", "faq_jsonld": ""}
 
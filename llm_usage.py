@@ -0,0 +1,276 @@
+# llm_usage.py
+"""
+Token / cost accounting and per-project daily budgets for LLM calls.
+
+llm_engines reports every call here: prompt and completion tokens (the
+provider's usage when returned, else ~4 characters per token), cost from
+PRICES, latency and cache hits. Rows are aggregated per (day, project, engine,
+model) in data/llm_usage.sqlite3 (WAL), and latency is kept as a fixed-bucket
+histogram per (day, project, engine), so the store grows by a few rows per day
+rather than one per call.
+
+The project is a context variable, set by the app for its script run and
+carried into jobs, stage graphs and plan workers:
+
+    with llm_usage.project("Acme"):
+        build_llm_plan(...)
+    summary("Acme") -> {"spend", "budget", "state", "calls", ..., "by_engine": {engine: {"p50_ms", ...}}}
+
+Budgets are USD per project per UTC day (set_budget(), default LLM_BUDGET_DAILY_USD, 0 = none):
+  - spend >= LLM_BUDGET_DOWNGRADE_AT x budget (default 0.8): calls go to the engine's cheap model
+  - spend >= budget: only cached answers are served; other calls raise BudgetExceeded
+
+Prices are USD per 1M tokens (input, output), matched by model-name prefix;
+LLM_PRICES='{"my-model": [1.0, 2.0]}' adds or overrides entries.
+"""
+
+import contextlib, contextvars, datetime, json, os, sqlite3, threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import metrics
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+DEFAULT_DB = DATA_DIR / "llm_usage.sqlite3"
+DEFAULT_BUDGET = float(os.getenv("LLM_BUDGET_DAILY_USD", "0"))
+DOWNGRADE_AT = float(os.getenv("LLM_BUDGET_DOWNGRADE_AT", "0.8"))
+
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "claude-3-opus": (15.00, 75.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3-haiku": (0.25, 1.25),
+    "grok-beta": (5.00, 15.00),
+    "grok-2": (2.00, 10.00),
+    "grok-3-mini": (0.30, 0.50),
+}
+try:
+    PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+except ValueError:
+    pass
+
+# latency histogram bucket upper bounds (ms); one overflow bucket above the last
+LATENCY_BUCKETS_MS = (100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 12000, 20000, 30000, 60000)
+
+
+class BudgetExceeded(RuntimeError):
+    """The project's daily LLM budget is spent and the answer is not cached."""
+
+
+def enabled() -> bool:
+    return os.getenv("LLM_USAGE", "on").lower() not in ("0", "off", "false", "no")
+
+
+# ---------- Current project ----------
+_project: contextvars.ContextVar = contextvars.ContextVar("llm_project", default="")
+
+def current_project() -> str:
+    return _project.get() or "default"
+
+def set_project(name: str) -> contextvars.Token:
+    return _project.set(name or "")
+
+@contextlib.contextmanager
+def project(name: str) -> Iterator[None]:
+    token = _project.set(name or "")
+    try:
+        yield
+    finally:
+        _project.reset(token)
+
+
+# ---------- Pricing ----------
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // 4 + 1
+
+def price(model: str) -> Tuple[float, float]:
+    """(input, output) USD per 1M tokens for the longest matching model prefix; (0, 0) if unknown."""
+    best = ""
+    for name in PRICES:
+        if (model or "").startswith(name) and len(name) > len(best):
+            best = name
+    return PRICES.get(best, (0.0, 0.0))
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    p_in, p_out = price(model)
+    return (prompt_tokens * p_in + completion_tokens * p_out) / 1_000_000
+
+def _today() -> str:
+    return datetime.datetime.utcnow().date().isoformat()
+
+def _percentile(counts: Dict[int, int], pct: float) -> Optional[float]:
+    """Upper bound (ms) of the bucket holding the pct-th percentile; inf for the overflow bucket."""
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank, seen = pct / 100 * total, 0
+    for bucket in sorted(counts):
+        seen += counts[bucket]
+        if seen >= rank:
+            return float(LATENCY_BUCKETS_MS[bucket]) if bucket < len(LATENCY_BUCKETS_MS) else float("inf")
+    return float("inf")
+
+
+# ---------- Store ----------
+class UsageStore:
+    def __init__(self, path: Path = DEFAULT_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                day TEXT NOT NULL, project TEXT NOT NULL, engine TEXT NOT NULL, model TEXT NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0, cache_hits INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0, completion_tokens INTEGER NOT NULL DEFAULT 0,
+                estimated INTEGER NOT NULL DEFAULT 0, downgraded INTEGER NOT NULL DEFAULT 0,
+                cost_usd REAL NOT NULL DEFAULT 0, latency_ms REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, project, engine, model)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS llm_latency (
+                day TEXT NOT NULL, project TEXT NOT NULL, engine TEXT NOT NULL, bucket INTEGER NOT NULL,
+                n INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, project, engine, bucket)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS llm_budgets (
+                project TEXT PRIMARY KEY, daily_usd REAL NOT NULL
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread, as in llm_cache
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def record(self, project: str, engine: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               latency_ms: Optional[float] = None, cached: bool = False, estimated: bool = False,
+               downgraded: bool = False) -> float:
+        """Add one call (or cache hit) to today's totals; returns its cost in USD."""
+        usd = 0.0 if cached else cost(model, prompt_tokens, completion_tokens)
+        day = _today()
+        c = self._conn()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            c.execute(
+                "INSERT INTO llm_usage (day, project, engine, model, calls, cache_hits, prompt_tokens, completion_tokens, "
+                "estimated, downgraded, cost_usd, latency_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (day, project, engine, model) DO UPDATE SET "
+                "calls = calls + excluded.calls, cache_hits = cache_hits + excluded.cache_hits, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "estimated = estimated + excluded.estimated, downgraded = downgraded + excluded.downgraded, "
+                "cost_usd = cost_usd + excluded.cost_usd, latency_ms = latency_ms + excluded.latency_ms",
+                (day, project, engine, model or "", 0 if cached else 1, 1 if cached else 0,
+                 prompt_tokens, completion_tokens, int(estimated), int(downgraded), usd,
+                 0.0 if cached or latency_ms is None else latency_ms))
+            if not cached and latency_ms is not None:
+                c.execute("INSERT INTO llm_latency (day, project, engine, bucket, n) VALUES (?, ?, ?, ?, 1) "
+                          "ON CONFLICT (day, project, engine, bucket) DO UPDATE SET n = n + 1",
+                          (day, project, engine, bisect_left(LATENCY_BUCKETS_MS, latency_ms)))
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+        return usd
+
+    # ----- budgets -----
+    def budget(self, project: str) -> float:
+        row = self._conn().execute("SELECT daily_usd FROM llm_budgets WHERE project = ?", (project,)).fetchone()
+        return float(row[0]) if row else DEFAULT_BUDGET
+
+    def set_budget(self, project: str, daily_usd: float) -> None:
+        self._conn().execute("INSERT OR REPLACE INTO llm_budgets (project, daily_usd) VALUES (?, ?)",
+                             (project, max(0.0, float(daily_usd))))
+
+    def spend(self, project: str, day: Optional[str] = None) -> float:
+        row = self._conn().execute("SELECT COALESCE(SUM(cost_usd), 0) FROM llm_usage WHERE day = ? AND project = ?",
+                                   (day or _today(), project)).fetchone()
+        return float(row[0])
+
+    def budget_state(self, project: str) -> Tuple[str, float, float]:
+        """("ok" | "downgrade" | "exhausted", spend, budget) for today."""
+        budget = self.budget(project)
+        if budget <= 0:
+            return "ok", 0.0, budget
+        spent = self.spend(project)
+        if spent >= budget:
+            return "exhausted", spent, budget
+        return ("downgrade" if spent >= DOWNGRADE_AT * budget else "ok"), spent, budget
+
+    # ----- reporting -----
+    def summary(self, project: str, day: Optional[str] = None) -> dict:
+        """Totals for one project and day, with latency percentiles per engine."""
+        day = day or _today()
+        c = self._conn()
+        by_engine: Dict[str, dict] = {}
+        for engine, calls, hits, pt, ct, usd, ms in c.execute(
+                "SELECT engine, SUM(calls), SUM(cache_hits), SUM(prompt_tokens), SUM(completion_tokens), "
+                "SUM(cost_usd), SUM(latency_ms) FROM llm_usage WHERE day = ? AND project = ? "
+                "GROUP BY engine ORDER BY engine", (day, project)):
+            by_engine[engine] = {"calls": calls, "cache_hits": hits, "prompt_tokens": pt, "completion_tokens": ct,
+                                 "cost_usd": usd, "mean_ms": ms / calls if calls else None}
+        hist: Dict[str, Dict[int, int]] = {}
+        for engine, bucket, n in c.execute("SELECT engine, bucket, n FROM llm_latency WHERE day = ? AND project = ?",
+                                           (day, project)):
+            hist.setdefault(engine, {})[bucket] = n
+        for engine, row in by_engine.items():
+            for pct in (50, 90, 99):
+                row[f"p{pct}_ms"] = _percentile(hist.get(engine, {}), pct)
+        state, spent, budget = self.budget_state(project)
+        total = lambda k: sum(r[k] for r in by_engine.values())
+        return {"day": day, "project": project, "spend": sum(r["cost_usd"] for r in by_engine.values()),
+                "budget": budget, "state": state if day == _today() else "ok",
+                "calls": total("calls"), "cache_hits": total("cache_hits"),
+                "prompt_tokens": total("prompt_tokens"), "completion_tokens": total("completion_tokens"),
+                "by_engine": by_engine}
+
+
+_STORES: Dict[str, UsageStore] = {}
+_STORES_LOCK = threading.Lock()
+
+def get_store(path: Optional[Path] = None) -> UsageStore:
+    """Process-wide store per database file."""
+    path = Path(path or DEFAULT_DB)
+    key = str(path.resolve())
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = _STORES[key] = UsageStore(path)
+        return store
+
+
+# ---------- Call-site helpers (llm_engines) ----------
+def record_call(engine: str, model: str, prompt: str, text: str, usage: dict, latency_ms: float,
+                downgraded: bool = False) -> float:
+    """Account one API call; tokens are estimated from the text when the provider sent no usage."""
+    estimated = not usage.get("prompt_tokens") and not usage.get("completion_tokens")
+    pt = usage.get("prompt_tokens") or estimate_tokens(prompt)
+    ct = usage.get("completion_tokens") or estimate_tokens(text)
+    usd = get_store().record(current_project(), engine, model, pt, ct, latency_ms,
+                             estimated=estimated, downgraded=downgraded)
+    metrics.LLM_TOKENS.inc(pt, engine=engine, kind="prompt")
+    metrics.LLM_TOKENS.inc(ct, engine=engine, kind="completion")
+    metrics.LLM_COST.inc(usd, engine=engine)
+    return usd
+
+def record_hit(engine: str, model: str) -> None:
+    get_store().record(current_project(), engine, model, cached=True)
+
+def budget_state() -> Tuple[str, float, float]:
+    return get_store().budget_state(current_project())
+
+def set_budget(project_name: str, daily_usd: float) -> None:
+    get_store().set_budget(project_name, daily_usd)
+
+def summary(project_name: Optional[str] = None, day: Optional[str] = None) -> dict:
+    return get_store().summary(project_name or current_project(), day)
@@ -1,70 +1,109 @@
 # llmseo_agent.py
 import os, json
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
+
+import llm_engines
+import llm_json
+from json_stream import JSONItemStream
+from llm_json import TITLES_SCHEMA, FAQS_SCHEMA
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# Response-cache template versions: bump when a prompt/parse change should invalidate cached answers.
+TITLES_TEMPLATE = "titles-v1"
+FAQS_TEMPLATE = "faqs-v1"
+FAQS_STREAM_TEMPLATE = "faqs-stream-v1"
+
+# OpenAI client: the pooled client of llm_engines' "openai" engine, built lazily on
+# first use (fails open to placeholder if key missing). Apps can inject a shared
+# instance with set_client() / set_client_factory() (e.g. a st.cache_resource client).
+_engine = llm_engines.get_engine("openai")
+
+def make_client(api_key: str = None):
+    """New OpenAI client for api_key (default OPENAI_API_KEY), or None if unavailable."""
+    api_key = api_key or os.getenv("OPENAI_API_KEY") or OPENAI_API_KEY
+    if not api_key:
+        return None
+    try:
+        from openai import OpenAI
+        return OpenAI(api_key=api_key)
+    except Exception:
+        return None
+
+def set_client(client) -> None:
+    set_client_factory(lambda: client)
 
-# OpenAI client (fails open to placeholder if key missing)
-try:
-    from openai import OpenAI
-    _client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-except Exception:
-    _client = None
+def set_client_factory(factory) -> None:
+    """Build the client with factory() on first use instead of the engine default."""
+    _engine.factory = factory
+    _engine.reset()
 
-def _fallback_titles(page_title: str):
+def get_client():
+    try:
+        return _engine.client()
+    except Exception:
+        return None
+
+def _complete_json(prompt: str, temperature: float, template: str, schema: dict) -> dict:
+    return llm_json.complete_json("openai", prompt, schema, max_tokens=None, temperature=temperature,
+                                  model=MODEL, template=template)
+
+def placeholder_titles(page_title: str):
     return {
         "title": f"{(page_title or 'Page')[:45]} | LLMSEO",
         "meta": "LLMSEO placeholder: add benefits, key specs, and a clear CTA within 155 characters."
     }
 
-def draft_titles_and_meta(url: str, page_title: str, h1_count: int, lvi: int, target_keywords: List[str]) -> Dict[str,str]:
-    """
-    Suggest concise HTML <title> (<= 60 chars) and meta description (<= 155 chars).
-    """
-    if not _client:
-        return _fallback_titles(page_title)
+def placeholder_faqs(questions: List[str], answer: str = "Add a concise, factual 80–120 word answer.") -> Dict[str, str]:
+    faqs = [{"q": q, "a": answer} for q in questions[:5]]
+    jsonld = {
+        "@context":"https://schema.org",
+        "@type":"FAQPage",
+        "mainEntity":[{"@type":"Question","name":f["q"],"acceptedAnswer":{"@type":"Answer","text":f["a"]}} for f in faqs]
+    }
+    return {
+        "faqs_md": "\n\n".join([f"**Q:** {f['q']}\n**A:** {f['a']}" for f in faqs]),
+        "faq_jsonld": json.dumps(jsonld, indent=2)
+    }
 
-    prompt = f"""
+def titles_prompt(url: str, page_title: str, h1_count: int, lvi: int, target_keywords: List[str]) -> str:
+    return f"""
 You are an SEO editor. Suggest a compelling HTML <title> (<=60 chars) and meta description (<=155 chars)
 for the page at {url}. Current title: "{page_title}". H1 count: {h1_count}. LVI: {lvi}.
 Target keywords: {', '.join(target_keywords[:5])}.
 Return JSON with keys: title, meta. No extra commentary.
 """
 
+def titles_fields(data: dict, page_title: str) -> Dict[str, str]:
+    data = data if isinstance(data, dict) else {}
+    return {
+        "title": data.get("title") or placeholder_titles(page_title)["title"],
+        "meta": data.get("meta") or placeholder_titles(page_title)["meta"]
+    }
+
+def parse_titles(txt: str, page_title: str) -> Dict[str, str]:
     try:
-        r = _client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role":"user","content":prompt}],
-            temperature=0.3,
-        )
-        txt = (r.choices[0].message.content or "").strip()
-        data = json.loads(txt) if txt.startswith("{") else {}
-        return {
-            "title": data.get("title") or _fallback_titles(page_title)["title"],
-            "meta": data.get("meta") or _fallback_titles(page_title)["meta"]
-        }
-    except Exception:
-        return _fallback_titles(page_title)
+        data = llm_json.loads(txt)
+    except ValueError:
+        data = {}
+    return titles_fields(data, page_title)
 
-def draft_faqs_and_schema(topic: str, questions: List[str]) -> Dict[str, str]:
+def draft_titles_and_meta(url: str, page_title: str, h1_count: int, lvi: int, target_keywords: List[str]) -> Dict[str,str]:
     """
-    Create 4–6 Q&A pairs (80–120 words each) and a valid FAQPage JSON-LD block.
+    Suggest concise HTML <title> (<= 60 chars) and meta description (<= 155 chars).
     """
-    if not _client:
-        # Safe placeholder if OPENAI_API_KEY not set
-        faqs = [{"q": q, "a": "Add a concise, factual 80–120 word answer."} for q in questions[:5]]
-        jsonld = {
-            "@context":"https://schema.org",
-            "@type":"FAQPage",
-            "mainEntity":[{"@type":"Question","name":f["q"],"acceptedAnswer":{"@type":"Answer","text":f["a"]}} for f in faqs]
-        }
-        return {
-            "faqs_md": "\n\n".join([f"**Q:** {f['q']}\n**A:** {f['a']}" for f in faqs]),
-            "faq_jsonld": json.dumps(jsonld, indent=2)
-        }
+    if not get_client():
+        return placeholder_titles(page_title)
+
+    prompt = titles_prompt(url, page_title, h1_count, lvi, target_keywords)
+
+    try:
+        return titles_fields(_complete_json(prompt, 0.3, TITLES_TEMPLATE, TITLES_SCHEMA), page_title)
+    except Exception:
+        return placeholder_titles(page_title)
 
-    prompt = f"""
+def faqs_prompt(topic: str, questions: List[str]) -> str:
+    return f"""
 Create 4–6 concise Q&A pairs (80–120 words each) for the topic "{topic}" with UK context where relevant.
 Return strict JSON with keys:
 - faqs_md: Markdown list of Q&A (use **Q:** and **A:**)
@@ -73,15 +112,28 @@ Questions to cover (adapt/merge if needed): {questions[:6]}
 No extra commentary.
 """
 
+def faqs_from(data: dict) -> Dict[str, str]:
+    """faqs_md / faq_jsonld from a parsed answer; JSON-LD given as an object is serialized."""
+    jsonld = data.get("faq_jsonld", "")
+    if isinstance(jsonld, (dict, list)):
+        jsonld = json.dumps(jsonld, indent=2)
+    return {"faqs_md": data.get("faqs_md",""), "faq_jsonld": jsonld}
+
+def parse_faqs(txt: str) -> Dict[str, str]:
+    return faqs_from(llm_json.loads(txt))
+
+def draft_faqs_and_schema(topic: str, questions: List[str]) -> Dict[str, str]:
+    """
+    Create 4–6 Q&A pairs (80–120 words each) and a valid FAQPage JSON-LD block.
+    """
+    if not get_client():
+        # Safe placeholder if OPENAI_API_KEY not set
+        return placeholder_faqs(questions)
+
+    prompt = faqs_prompt(topic, questions)
+
     try:
-        r = _client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role":"user","content":prompt}],
-            temperature=0.4,
-        )
-        txt = (r.choices[0].message.content or "").strip()
-        data = json.loads(txt)
-        return {"faqs_md": data.get("faqs_md",""), "faq_jsonld": data.get("faq_jsonld","")}
+        return faqs_from(_complete_json(prompt, 0.4, FAQS_TEMPLATE, FAQS_SCHEMA))
     except Exception:
         # Minimal fallback
         faqs = [{"q": q, "a": "Answer here (80–120 words)."} for q in questions[:5]]
@@ -93,3 +145,55 @@ No extra commentary.
         return {"faqs_md": "\n".join([f"**Q:** {f['q']}\n**A:** {f['a']}" for f in faqs]),
                 "faq_jsonld": json.dumps(jsonld, indent=2)}
 
+
+def faq_fields(pairs: List[dict]) -> Dict[str, str]:
+    """faqs_md + FAQPage JSON-LD from [{"q","a"}] (same shapes as draft_faqs_and_schema)."""
+    jsonld = {
+        "@context":"https://schema.org",
+        "@type":"FAQPage",
+        "mainEntity":[{"@type":"Question","name":p["q"],"acceptedAnswer":{"@type":"Answer","text":p["a"]}} for p in pairs]
+    }
+    return {"faqs_md": "\n\n".join(f"**Q:** {p['q']}\n**A:** {p['a']}" for p in pairs),
+            "faq_jsonld": json.dumps(jsonld, indent=2)}
+
+def faqs_stream_prompt(topic: str, questions: List[str]) -> str:
+    # Q&A objects only (JSON-LD is built locally), so each pair can be shown as soon as it closes
+    return f"""
+Create 4–6 concise Q&A pairs (80–120 words each) for the topic "{topic}" with UK context where relevant.
+Return strict JSON: {{"faqs": [{{"q": "question", "a": "answer"}}, ...]}}
+Questions to cover (adapt/merge if needed): {questions[:6]}
+No extra commentary.
+"""
+
+def stream_faqs(topic: str, questions: List[str], engine: str = "openai",
+                max_tokens: int = 1500, cancel=None) -> Iterator[Tuple[str, object]]:
+    """
+    Streamed FAQ drafting on any llm_engines engine. Yields
+      ("item", {"q","a"})          each pair as soon as it is complete,
+      ("partial", {"q", "a"...})   the pair currently being written (best effort),
+      ("done", {"faqs_md","faq_jsonld"}) once, at the end.
+    Raises if nothing usable arrived (missing key, provider error) so callers can
+    fall back to draft_faqs_and_schema; an error after some pairs keeps those.
+    `cancel` (llm_engines.StreamCancel) lets another thread close the provider stream.
+    """
+    parser = JSONItemStream("faqs")
+    pairs = []
+    try:
+        for piece in llm_engines.stream(engine, faqs_stream_prompt(topic, questions), max_tokens=max_tokens,
+                                        temperature=0.4, model=MODEL if engine == "openai" else None,
+                                        template=FAQS_STREAM_TEMPLATE, validate=llm_json.validator(),
+                                        cancel=cancel):
+            for item in parser.feed(piece):
+                if isinstance(item, dict) and str(item.get("q", "")).strip() and str(item.get("a", "")).strip():
+                    pair = {"q": str(item["q"]).strip(), "a": str(item["a"]).strip()}
+                    pairs.append(pair)
+                    yield "item", pair
+            partial = parser.partial
+            if partial and partial.get("q"):
+                yield "partial", partial
+    except Exception:
+        if not pairs:
+            raise
+    if not pairs:
+        raise ValueError("No FAQ items in the streamed response.")
+    yield "done", faq_fields(pairs)
@@ -6,6 +6,15 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from collections import deque
 
+try:
+    from metrics import instrument, stage, INFLIGHT_CRAWLS, QUEUE_DEPTH
+except ModuleNotFoundError:
+    # started from the service directory: the shared metrics.py lives at the repo root
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).resolve().parents[3]))
+    from metrics import instrument, stage, INFLIGHT_CRAWLS, QUEUE_DEPTH
+
 
 app = FastAPI()
 
@@ -18,6 +27,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts/latency/errors + GET /metrics (Prometheus text format)
+instrument(app, "v3")
+
 
 class ScoreRequest(BaseModel):
     url: HttpUrl
@@ -64,7 +76,7 @@ def health():
 def fetch_html(url: str) -> str:
     """Download the HTML for a given URL."""
     try:
-        with httpx.Client(timeout=10.0, follow_redirects=True) as client:
+        with stage("fetch"), httpx.Client(timeout=10.0, follow_redirects=True) as client:
             resp = client.get(url)
             resp.raise_for_status()
             return resp.text
@@ -172,45 +184,48 @@ def score_mobile(soup: BeautifulSoup, html: str) -> int:
 
 def compute_scores_for_html(url: str, html: str, depth: int = 0) -> tuple[SiteScores, PageScores, BeautifulSoup]:
     """Compute scores for a single HTML page and return soup for reuse."""
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text(" ", strip=True)
-    words = text.split()
-    word_count = len(words)
-
-    content = score_content(word_count)
-    aeo = score_aeo(soup, text)
-    tech = score_tech(url, html, soup)
-    mobile = score_mobile(soup, html)
-
-    overall = int(
-        0.3 * content +
-        0.3 * aeo +
-        0.2 * tech +
-        0.2 * mobile
-    )
+    with stage("parse"):
+        soup = BeautifulSoup(html, "html.parser")
+        text = soup.get_text(" ", strip=True)
+        words = text.split()
+        word_count = len(words)
+
+    with stage("score"):
+        content = score_content(word_count)
+        aeo = score_aeo(soup, text)
+        tech = score_tech(url, html, soup)
+        mobile = score_mobile(soup, html)
+
+        overall = int(
+            0.3 * content +
+            0.3 * aeo +
+            0.2 * tech +
+            0.2 * mobile
+        )
 
     title_tag = soup.find("title")
     title = title_tag.get_text(strip=True) if title_tag else None
 
-    site_scores = SiteScores(
-        overall=overall,
-        content=content,
-        aeo=aeo,
-        tech=tech,
-        mobile=mobile,
-    )
-
-    page_scores = PageScores(
-        url=url,
-        depth=depth,
-        title=title,
-        word_count=word_count,
-        overall=overall,
-        content=content,
-        aeo=aeo,
-        tech=tech,
-        mobile=mobile,
-    )
+    with stage("serialize"):
+        site_scores = SiteScores(
+            overall=overall,
+            content=content,
+            aeo=aeo,
+            tech=tech,
+            mobile=mobile,
+        )
+
+        page_scores = PageScores(
+            url=url,
+            depth=depth,
+            title=title,
+            word_count=word_count,
+            overall=overall,
+            content=content,
+            aeo=aeo,
+            tech=tech,
+            mobile=mobile,
+        )
 
     return site_scores, page_scores, soup
 
@@ -267,30 +282,38 @@ def crawl_site(payload: ScoreRequest, max_pages: int = 20, max_depth: int = 2):
     visited: set[str] = set()
     queue: deque[tuple[str, int]] = deque()
     queue.append((root_url, 0))
+    QUEUE_DEPTH.inc(queue="crawl")
 
     pages: list[PageScores] = []
 
-    while queue and len(pages) < max_pages:
-        url, depth = queue.popleft()
-        if url in visited or depth > max_depth:
-            continue
-        visited.add(url)
-
+    with INFLIGHT_CRAWLS.track_inprogress():
         try:
-            html = fetch_html(url)
-        except HTTPException:
-            # skip pages that fail
-            continue
-
-        site_scores, page_scores, soup = compute_scores_for_html(url, html, depth)
-        pages.append(page_scores)
-
-        # enqueue internal links
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            absolute = urljoin(url, href)
-            if absolute not in visited and is_same_domain(root_url, absolute):
-                queue.append((absolute, depth + 1))
+            while queue and len(pages) < max_pages:
+                url, depth = queue.popleft()
+                QUEUE_DEPTH.dec(queue="crawl")
+                if url in visited or depth > max_depth:
+                    continue
+                visited.add(url)
+
+                try:
+                    html = fetch_html(url)
+                except HTTPException:
+                    # skip pages that fail
+                    continue
+
+                site_scores, page_scores, soup = compute_scores_for_html(url, html, depth)
+                pages.append(page_scores)
+
+                # enqueue internal links
+                for a in soup.find_all("a", href=True):
+                    href = a["href"]
+                    absolute = urljoin(url, href)
+                    if absolute not in visited and is_same_domain(root_url, absolute):
+                        queue.append((absolute, depth + 1))
+                        QUEUE_DEPTH.inc(queue="crawl")
+        finally:
+            # whatever is left unvisited is dropped with this crawl
+            QUEUE_DEPTH.dec(len(queue), queue="crawl")
 
     return pages
 
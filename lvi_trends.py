@@ -0,0 +1,108 @@
+# lvi_trends.py
+"""
+Chart-ready LVI/KPI series at a resolution that fits the chart.
+Picks raw runs, LTTB-downsampled raw runs, or day/week/month rollups from
+history_store so st.line_chart / PDF tables never receive thousands of points.
+"""
+from datetime import datetime
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from history_store import history_span, history_between, history_rollups, history_version
+from kpi_scoring import COMPONENT_COLUMNS, combine_lvi_frame, recompute_history_lvi
+
+MAX_POINTS = 200         # default chart budget
+LTTB_RAW_LIMIT = 5000    # above this many raw runs, start from rollups instead
+_BUCKET_DAYS = {"day": 1, "week": 7, "month": 30}
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of the points
+    to keep (always includes the first and last point), preserving the visual shape.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # threshold-2 inner buckets
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # average of the next bucket (or the last point for the final bucket)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[nlo:max(nhi, nlo + 1)].mean()
+        avg_y = y[nlo:max(nhi, nlo + 1)].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _span_days(first: str, last: str) -> float:
+    try:
+        return (datetime.fromisoformat(str(last)[:19]) - datetime.fromisoformat(str(first)[:19])).total_seconds() / 86400
+    except ValueError:
+        return 0.0
+
+def pick_resolution(n_runs: int, first: str, last: str, max_points: int = MAX_POINTS) -> str:
+    """'raw' while the raw series is small enough to downsample, else the finest rollup that fits."""
+    if n_runs <= LTTB_RAW_LIMIT:
+        return "raw"
+    days = _span_days(first, last)
+    for res in ("day", "week", "month"):
+        if days / _BUCKET_DAYS[res] <= max_points:
+            return res
+    return "month"
+
+def _rescored_rollups(r: pd.DataFrame, agg: str, weights: dict) -> pd.Series:
+    """
+    LVI per bucket under `weights`, from the bucket aggregates of the component scores.
+    Buckets missing a component keep their stored LVI aggregate.
+    """
+    wide = r[r["kpi"].isin(list(COMPONENT_COLUMNS.values()) + ["lvi"])].pivot(index="bucket", columns="kpi", values=agg)
+    components = wide.reindex(columns=list(COMPONENT_COLUMNS.values()))
+    lvi = combine_lvi_frame(*(components[c].fillna(0).to_numpy() for c in components.columns), weights=weights)
+    stored = wide["lvi"].to_numpy(dtype=float) if "lvi" in wide.columns else np.full(len(wide), np.nan)
+    return pd.Series(np.where(components.isna().any(axis=1).to_numpy(), stored, lvi),
+                     index=wide.index, name="lvi")
+
+def trend_series(project: str, domain=None, kpi: str = "lvi", max_points: int = MAX_POINTS,
+                 agg: str = "mean", weights=None) -> Tuple[pd.DataFrame, str]:
+    """
+    (frame indexed by timestamp/bucket with one `kpi` column, resolution used).
+    Resolution is chosen from the run count and time span; the result has at most
+    `max_points` rows (LTTB-downsampled when needed). With a weight profile, LVI is
+    re-scored from the stored component scores (kpi_scoring.recompute_history_lvi).
+    """
+    n, first, last = history_span(project, domain)
+    if not n:
+        return pd.DataFrame(columns=[kpi]), "raw"
+    resolution = pick_resolution(n, first, last, max_points)
+    rescore = weights is not None and kpi == "lvi"
+    if resolution == "raw":
+        df = history_between(project, domain=domain)
+        if rescore:
+            df = recompute_history_lvi(df, weights, history_key=("trend", project, domain, history_version(project)))
+        df = df[["timestamp", kpi]].dropna()
+        series = df.set_index("timestamp")[kpi]
+    elif rescore:
+        series = _rescored_rollups(history_rollups(project, resolution, domain), agg, weights)
+    else:
+        r = history_rollups(project, resolution, domain)
+        series = r[r["kpi"] == kpi].set_index("bucket")[agg].rename(kpi)
+    if len(series) > max_points:
+        idx = lttb(np.arange(len(series)), series.to_numpy(dtype=float), max_points)
+        series = series.iloc[idx]
+    return series.to_frame(), resolution
+
+def trend_rows(project: str, domain=None, max_points: int = 12, weights=None) -> Tuple[list, str]:
+    """Compact trend for PDF tables: ([{"period", "lvi"}...], resolution)."""
+    df, resolution = trend_series(project, domain, "lvi", max_points, weights=weights)
+    rows = [{"period": str(k), "lvi": int(round(float(v)))} for k, v in df["lvi"].items()]
+    return rows, resolution
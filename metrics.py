@@ -0,0 +1,256 @@
+# metrics.py
+"""
+In-process operational metrics with Prometheus text exposition.
+Shared by both FastAPI apps (llmseo_v3 backend and server/app); stdlib only.
+
+    from metrics import instrument, stage
+    instrument(app, "v3")            # request metrics + GET /metrics
+    with stage("fetch"): ...         # per-stage latency histogram
+
+The Streamlit portal records the LLM, cache and job metrics in its own process;
+set METRICS_PORT to serve them from there too (start_http_server, daemon thread).
+"""
+
+import os, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_PORT = os.getenv("METRICS_PORT", "")
+METRICS_ADDR = os.getenv("METRICS_ADDR", "127.0.0.1")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(l, "")) for l in self.labels)
+
+    def samples(self) -> List[Tuple[str, Sequence[Tuple[str, str]], float]]:
+        with self._lock:
+            return [("", tuple(zip(self.labels, k)), v) for k, v in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labels)
+
+    def observe(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            state = self._values.get(k)
+            if state is None:
+                state = self._values[k] = [[0] * len(self.buckets), 0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for k, (counts, total, n) in sorted(self._values.items()):
+                base = tuple(zip(self.labels, k))
+                for b, c in zip(self.buckets, counts):
+                    out.append(("_bucket", base + (("le", _fmt_value(b)),), c))
+                out.append(("_bucket", base + (("le", "+Inf"),), n))
+                out.append(("_sum", base, total))
+                out.append(("_count", base, n))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for suffix, pairs, value in m.samples():
+                lines.append(f"{m.name}{suffix}{_fmt_labels(pairs)} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------- Metric definitions ----------
+STAGE_SECONDS = Histogram("llmseo_stage_duration_seconds",
+                          "Latency of pipeline stages (fetch, parse, score, serialize).", ("stage",))
+REQUESTS = Counter("llmseo_http_requests_total",
+                   "HTTP requests handled, by app, method, route and status.", ("app", "method", "route", "status"))
+REQUEST_ERRORS = Counter("llmseo_http_request_errors_total",
+                         "HTTP requests that ended in a 5xx or an unhandled exception.", ("app", "route"))
+REQUEST_SECONDS = Histogram("llmseo_http_request_duration_seconds",
+                            "End-to-end HTTP request latency.", ("app", "route"))
+CACHE_REQUESTS = Counter("llmseo_cache_requests_total",
+                         "Cache lookups by cache name and result (hit/miss).", ("cache", "result"))
+CACHE_HIT_RATIO = Gauge("llmseo_cache_hit_ratio",
+                        "Lifetime hit ratio per cache (hits / lookups).", ("cache",))
+INFLIGHT_CRAWLS = Gauge("llmseo_inflight_crawls", "Site crawls currently running.")
+QUEUE_DEPTH = Gauge("llmseo_queue_depth", "Items waiting in a work queue.", ("queue",))
+LLM_HEDGES = Counter("llmseo_llm_hedges_total",
+                     "Hedged LLM requests (secondary engine fired), by primary, secondary and winner.",
+                     ("primary", "secondary", "winner"))
+LLM_TOKENS = Counter("llmseo_llm_tokens_total",
+                     "LLM tokens used by API calls, by engine and kind (prompt/completion).", ("engine", "kind"))
+LLM_COST = Counter("llmseo_llm_cost_usd_total", "Estimated LLM spend in USD, by engine.", ("engine",))
+LLM_JSON_REPAIRS = Counter("llmseo_llm_json_repairs_total",
+                           "LLM JSON answers that needed repair, by engine and result (local/reprompt/failed).",
+                           ("engine", "result"))
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage into STAGE_SECONDS."""
+    return STAGE_SECONDS.time(stage=name)
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+    misses = CACHE_REQUESTS.value(cache=cache, result="miss")
+    CACHE_HIT_RATIO.set(hits / (hits + misses), cache=cache)
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ---------- FastAPI wiring ----------
+def instrument(app, app_name: str) -> None:
+    """Add request counting/latency middleware and a GET /metrics route to a FastAPI app."""
+    from fastapi.responses import Response
+
+    @app.middleware("http")
+    async def _metrics_middleware(request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            REQUESTS.inc(app=app_name, method=request.method, route=route, status=str(status))
+            REQUEST_SECONDS.observe(time.perf_counter() - start, app=app_name, route=route)
+            if status >= 500:
+                REQUEST_ERRORS.inc(app=app_name, route=route)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        return Response(content=render(), media_type=CONTENT_TYPE)
+
+
+# ---------- Standalone exporter (non-FastAPI processes) ----------
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+def start_http_server(port: int, addr: str = METRICS_ADDR) -> ThreadingHTTPServer:
+    """Serve GET /metrics on a daemon thread; one server per process (later calls return it)."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            server = ThreadingHTTPServer((addr, int(port)), _Handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            _server = server
+        return _server
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    """start_http_server(METRICS_PORT) when the env var is set; None otherwise."""
+    return start_http_server(int(METRICS_PORT)) if METRICS_PORT else None
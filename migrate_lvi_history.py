@@ -0,0 +1,31 @@
+# migrate_lvi_history.py
+"""
+One-shot migration of the scattered lvi_history.csv files into the single
+history store (data/lvi_history.sqlite3) that all writers now target.
+
+    python migrate_lvi_history.py                  # import root + data/*/lvi_history.csv
+    python migrate_lvi_history.py --parquet data/warehouse   # + columnar copy partitioned by project
+
+Safe to re-run: files already imported are skipped. Project names are stripped
+of trailing spaces and rows without a project land under "default"; column
+order differences between files are handled by name.
+"""
+import argparse
+from history_store import get_store
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--parquet", help="also write a Parquet copy partitioned by project to this directory")
+    args = ap.parse_args()
+
+    store = get_store("sqlite")
+    imported = store.migrate_legacy()
+    for path, n in imported.items():
+        print(f"{'imported' if n else 'skipped '} {n:5d} rows  {path}")
+    print(f"✅ {sum(imported.values())} rows migrated → {store.path} ({len(store.projects())} projects)")
+
+    if args.parquet:
+        print(f"✅ Parquet warehouse written → {store.export_parquet(args.parquet)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# project_state.py
+"""
+Project-state store for app_v2 (projects/<name>.json).
+
+app_v2 saves the project inputs on every rerun (i.e. every keystroke). This
+store makes that cheap:
+  - save() hashes the content (ignoring the "ts" stamp) and is a no-op when unchanged
+  - changed projects are written by a debounced background flusher
+    (FLUSH_DEBOUNCE_SECONDS of quiet, at most FLUSH_MAX_DELAY_SECONDS after the first change)
+  - writes are atomic (temp file + os.replace) and run outside the store lock, so save()
+    never waits on the disk; a failed write is logged and re-queued, and pending writes
+    are flushed at exit
+  - names()/get() serve an in-memory index; the folder is re-read only when its mtime changes
+
+    store = get_project_store("projects")
+    store.save({"project": "Acme", "domain": "acme.com", ...})
+    store.names(); store.get("Acme")
+"""
+
+import atexit, hashlib, json, logging, os, tempfile, threading, time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+FLUSH_DEBOUNCE_SECONDS = float(os.getenv("PROJECT_FLUSH_DEBOUNCE", "2.0"))
+FLUSH_MAX_DELAY_SECONDS = float(os.getenv("PROJECT_FLUSH_MAX_DELAY", "10.0"))
+
+log = logging.getLogger(__name__)
+
+
+def file_name(project: str) -> str:
+    return f"{project.replace(' ', '_')}.json"
+
+def display_name(fname: str) -> str:
+    return fname[:-len(".json")].replace("_", " ")
+
+def content_hash(snap: dict) -> str:
+    body = {k: v for k, v in snap.items() if k != "ts"}
+    return hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ProjectStore:
+    def __init__(self, root, debounce: float = FLUSH_DEBOUNCE_SECONDS, max_delay: float = FLUSH_MAX_DELAY_SECONDS):
+        self.root = Path(root)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()        # one writer at a time, in queue order
+        self._wake = threading.Condition(self._lock)
+        self._snaps: Dict[str, dict] = {}       # display name -> snapshot
+        self._hashes: Dict[str, str] = {}       # display name -> content hash
+        self._mtimes: Dict[str, int] = {}       # file name -> mtime_ns we last read/wrote
+        self._dir_mtime = None
+        self._dirty: Dict[str, dict] = {}
+        self._writing: set = set()              # names being written right now (outside the lock)
+        self._first_dirty = 0.0
+        self._last_change = 0.0
+        self._flusher: Optional[threading.Thread] = None
+        atexit.register(self.flush)
+
+    # ----- index -----
+    def _refresh(self) -> None:
+        """Re-read the folder only if it changed; parse only files whose mtime moved."""
+        try:
+            mtime = self.root.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._dir_mtime:
+            return
+        seen = set()
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".json") or not entry.is_file():
+                continue
+            seen.add(entry.name)
+            m = entry.stat().st_mtime_ns
+            if self._mtimes.get(entry.name) == m:
+                continue
+            name = display_name(entry.name)
+            if name in self._dirty or name in self._writing:
+                continue  # our pending write wins
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    snap = json.load(f)
+            except Exception:
+                continue
+            self._snaps[name] = snap
+            self._hashes[name] = content_hash(snap)
+            self._mtimes[entry.name] = m
+        for fname in set(self._mtimes) - seen:
+            self._mtimes.pop(fname, None)
+            name = display_name(fname)
+            if name not in self._dirty and name not in self._writing:
+                self._snaps.pop(name, None)
+                self._hashes.pop(name, None)
+        self._dir_mtime = mtime
+
+    def names(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self._snaps)
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            snap = self._snaps.get(name)
+            return dict(snap) if snap is not None else None
+
+    # ----- writes -----
+    def save(self, snap: dict) -> bool:
+        """Queue snap for writing if its content changed; returns True if it did."""
+        project = (snap.get("project") or "").strip()
+        if not project:
+            return False
+        name = display_name(file_name(project))
+        h = content_hash(snap)
+        with self._lock:
+            self._refresh()
+            if self._hashes.get(name) == h:
+                return False
+            now = time.monotonic()
+            if not self._dirty:
+                self._first_dirty = now
+            self._last_change = now
+            self._snaps[name] = snap
+            self._hashes[name] = h
+            self._dirty[name] = snap
+            self._ensure_flusher()
+            self._wake.notify()
+        return True
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name="project-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                while True:
+                    while not self._dirty:
+                        self._wake.wait()
+                    now = time.monotonic()
+                    due = min(self._last_change + self.debounce, self._first_dirty + self.max_delay)
+                    if now >= due:
+                        break
+                    self._wake.wait(due - now)
+            self._write_dirty()
+
+    def _write_dirty(self) -> None:
+        """Write all pending snapshots; the file I/O runs without self._lock held."""
+        with self._io_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+                self._writing = set(pending)
+            if not pending:
+                return
+            written: Dict[str, int] = {}
+            failed: Dict[str, dict] = {}
+            for name, snap in pending.items():
+                fname = file_name(snap.get("project") or name)
+                tmp = None
+                try:
+                    self.root.mkdir(parents=True, exist_ok=True)
+                    fd, tmp = tempfile.mkstemp(suffix=".json.tmp", dir=self.root)
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(snap, f, indent=2)
+                    os.replace(tmp, self.root / fname)
+                    written[fname] = (self.root / fname).stat().st_mtime_ns
+                except Exception as e:
+                    log.warning("project_state: could not write %s (%s); will retry", self.root / fname, e)
+                    failed[name] = snap
+                    if tmp is not None:
+                        try:
+                            os.unlink(tmp)
+                        except OSError:
+                            pass
+            with self._lock:
+                self._writing = set()
+                self._mtimes.update(written)
+                if failed:
+                    # re-queue unless save() queued a newer version meanwhile; retry after the debounce
+                    now = time.monotonic()
+                    if not self._dirty:
+                        self._first_dirty = now
+                    self._last_change = now
+                    for name, snap in failed.items():
+                        self._dirty.setdefault(name, snap)
+                    self._ensure_flusher()
+                    self._wake.notify()
+                try:
+                    self._dir_mtime = self.root.stat().st_mtime_ns
+                except OSError:
+                    pass
+
+    def flush(self) -> None:
+        """Write pending changes now (e.g. at exit or before an export)."""
+        self._write_dirty()
+
+
+_STORES: Dict[str, ProjectStore] = {}
+_STORES_LOCK = threading.Lock()
+
+def get_project_store(root) -> ProjectStore:
+    """Process-wide store per projects folder."""
+    key = str(Path(root).resolve())
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = _STORES[key] = ProjectStore(root)
+        return store
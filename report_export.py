@@ -9,6 +9,15 @@ from reportlab.lib.utils import ImageReader
 from io import BytesIO
 from datetime import datetime
 
+BOTTOM_MARGIN = 2*cm
+
+def _room(c, y: float, needed: float, h: float) -> float:
+    """y to draw a block of `needed` height at: top of a new page if it would cross the bottom margin."""
+    if y - needed < BOTTOM_MARGIN:
+        c.showPage()
+        return h-2.0*cm
+    return y
+
 def _split_lines(text: str, max_len: int = 92):
     """Split a long string into roughly max_len chunks without breaking words."""
     lines, buf = [], ""
@@ -30,11 +39,16 @@ def build_pdf(project: str,
               history_rows: list,
               plan: dict,
               brand_title: str = "LLMSEO Visibility Report",
-              logo_bytes: bytes | None = None) -> bytes:
+              logo_bytes: bytes | None = None,
+              trend_rows: list | None = None,
+              trend_resolution: str = "") -> bytes:
     """
     Returns PDF bytes. Kept simple/robust for Streamlit Cloud.
     serp_rows: list of dicts (keyword, position, title, link, our_site)
     history_rows: list of dicts with keys at least ('timestamp','lvi')
+    trend_rows: optional long-range LVI trend, list of dicts ('period','lvi')
+                at `trend_resolution` (raw/day/week/month), see lvi_trends.trend_rows;
+                skipped at raw resolution, where it would repeat the recent runs
     """
     # ----- canvas setup
     buf = BytesIO()
@@ -85,9 +99,6 @@ def build_pdf(project: str,
     y -= th + 0.7*cm
 
     # ----- LVI history (last 10)
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(2*cm, y, "Recent LVI runs")
-    y -= 0.45*cm
     if history_rows:
         hdr = ["timestamp","lvi"]
         rows = [[r.get("timestamp",""), str(r.get("lvi",""))] for r in history_rows[-10:]]
@@ -98,18 +109,42 @@ def build_pdf(project: str,
             ("FONTNAME",(0,0),(-1,0),"Helvetica-Bold"),
             ("ALIGN",(1,1),(1,-1),"CENTER"),
         ]))
-        hw, hh = hist.wrapOn(c, w-4*cm, y)
+        hw, hh = hist.wrapOn(c, w-4*cm, h)
+        y = _room(c, y, 0.45*cm + hh, h)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(2*cm, y, "Recent LVI runs")
+        y -= 0.45*cm
         hist.drawOn(c, 2*cm, y - hh)
         y -= hh + 0.7*cm
     else:
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(2*cm, y, "Recent LVI runs")
+        y -= 0.45*cm
         c.setFont("Helvetica-Oblique", 10)
         c.drawString(2*cm, y, "No history yet.")
         y -= 0.7*cm
 
+    # ----- LVI trend (auto resolution, max 12 points)
+    if trend_rows and trend_resolution != "raw":
+        label = {"day": "daily", "week": "weekly", "month": "monthly"}.get(trend_resolution, "per run")
+        hdr = ["period", "lvi"]
+        rows = [[str(r.get("period","")), str(r.get("lvi",""))] for r in trend_rows[-12:]]
+        trend = Table([hdr]+rows, colWidths=[7.0*cm, 2.0*cm])
+        trend.setStyle(TableStyle([
+            ("BACKGROUND",(0,0),(-1,0), colors.HexColor("#e5e7eb")),
+            ("GRID",(0,0),(-1,-1), 0.3, colors.HexColor("#9ca3af")),
+            ("FONTNAME",(0,0),(-1,0),"Helvetica-Bold"),
+            ("ALIGN",(1,1),(1,-1),"CENTER"),
+        ]))
+        tw2, th2 = trend.wrapOn(c, w-4*cm, h)
+        y = _room(c, y, 0.45*cm + th2, h)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(2*cm, y, f"LVI trend ({label})")
+        y -= 0.45*cm
+        trend.drawOn(c, 2*cm, y - th2)
+        y -= th2 + 0.7*cm
+
     # ----- SERP snapshot (first 8)
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(2*cm, y, "SERP snapshot")
-    y -= 0.45*cm
     if serp_rows:
         hdr = ["kw", "pos", "title"]
         rows = []
@@ -128,10 +163,18 @@ def build_pdf(project: str,
             ("FONTNAME",(0,0),(-1,0),"Helvetica-Bold"),
             ("ALIGN",(1,1),(1,-1),"CENTER"),
         ]))
-        sw, sh = serp_t.wrapOn(c, w-4*cm, y)
+        sw, sh = serp_t.wrapOn(c, w-4*cm, h)
+        y = _room(c, y, 0.45*cm + sh, h)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(2*cm, y, "SERP snapshot")
+        y -= 0.45*cm
         serp_t.drawOn(c, 2*cm, y - sh)
         y -= sh + 0.7*cm
     else:
+        y = _room(c, y, 0.45*cm + 0.7*cm, h)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(2*cm, y, "SERP snapshot")
+        y -= 0.45*cm
         c.setFont("Helvetica-Oblique", 10)
         c.drawString(2*cm, y, "No SERP results captured in this session.")
         y -= 0.7*cm
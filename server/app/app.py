@@ -3,7 +3,17 @@ from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Literal
 import uuid
 
+try:
+    from metrics import instrument, QUEUE_DEPTH
+except ModuleNotFoundError:
+    # started from the service directory: the shared metrics.py lives at the repo root
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    from metrics import instrument, QUEUE_DEPTH
+
 app = FastAPI(title="LLMSEO + CATADD API", version="0.1.1")
+instrument(app, "server")
 
 # ----- In-memory stubs (replace with DB) -----
 TASKS: Dict[str, Dict[str, Any]] = {}
@@ -18,6 +28,7 @@ def create_task(account_id: str, site_id: str, type_: str, payload: dict) -> str
         "payload": payload,
         "state": "proposed"
     }
+    QUEUE_DEPTH.inc(queue="tasks_proposed")
     return tid
 
 # ----- Models -----
@@ -127,6 +138,8 @@ async def decide_task(task_id: str, body: DecisionPayload):
     task = TASKS.get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    if task["state"] == "proposed":
+        QUEUE_DEPTH.dec(queue="tasks_proposed")
     task["state"] = "approved" if body.decision == "approve" else "rejected"
     if body.reason:
         task["reason"] = body.reason
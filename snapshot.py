@@ -0,0 +1,193 @@
+# snapshot.py
+"""
+One-click Snapshot pipeline as a small stage graph:
+
+    serp ----+
+    audit ---+--> kpi --> titles --> report (history row, PDF, ZIP)
+    psi -----+                         ^
+    faqs ------------------------------+
+
+Independent stages run concurrently, so snapshot latency tracks the slowest
+branch rather than the sum. Each stage is timed (returned as "timings" and
+recorded in metrics.STAGE_SECONDS as snapshot_<stage>).
+
+Pure function of its inputs (no Streamlit), so app.py can run it on the
+background job runner (jobs.submit) and render the returned dict later.
+"""
+
+import contextvars, datetime, os, time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from metrics import stage
+
+from serp_agent import run_serp_queries
+from seo_audit_agent import audit_url
+import llm_usage
+from llm_engines import engine_name
+from llm_plan_helper import draft_titles, draft_faqs, faq_topic, faq_questions, timed_draft
+from llmseo_agent import placeholder_titles, placeholder_faqs
+from kpi_scoring import compute_kpis, serp_score_from_df, combine_lvi
+from pagespeed_agent import fetch_lighthouse_perf
+from report_export import build_pdf
+from history_store import append_row, tail_history, history_csv
+from lvi_trends import trend_rows
+from zip_export import spooled_zip
+
+
+def plan_markdown(plan: dict, heading: str) -> str:
+    return (f"# Plan for {heading}\n\n**Title:** {plan.get('suggested_title','')}\n\n"
+            f"**Meta:** {plan.get('suggested_meta','')}\n\n## FAQs\n{plan.get('faqs_md','')}\n\n"
+            f"## FAQ JSON-LD\n```json\n{plan.get('faq_jsonld','')}\n```")
+
+
+SNAPSHOT_WORKERS = int(os.getenv("SNAPSHOT_WORKERS", "4"))
+
+Stage = Tuple[Callable[[Dict[str, Any]], Any], Tuple[str, ...]]
+
+
+def _timed(name: str, fn: Callable, inputs: Dict[str, Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    with stage(f"snapshot_{name}"):
+        value = fn(inputs)
+    return value, time.perf_counter() - start
+
+
+def run_stages(stages: Dict[str, Stage], progress: Optional[Callable[[float, str], None]] = None,
+               max_workers: int = SNAPSHOT_WORKERS) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Run {name: (fn, deps)} as soon as each stage's deps are done; fn gets {dep: result}.
+    Returns (results, timings in seconds). The first stage error is raised.
+    """
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    pending = dict(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="snapshot") as pool:
+        while pending or running:
+            for name, (fn, deps) in list(pending.items()):
+                if all(d in results for d in deps):
+                    del pending[name]
+                    running[pool.submit(contextvars.copy_context().run, _timed, name, fn,
+                                        {d: results[d] for d in deps})] = name
+            if not running:
+                raise ValueError(f"Unsatisfiable snapshot stages: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                results[name], timings[name] = fut.result()
+                if progress:
+                    progress(len(results) / len(stages), f"{name} done ({timings[name]:.1f}s)")
+    return results, timings
+
+
+def run_snapshot(project: str, domain: str, target_url: str, kw_list: List[str],
+                 location: str = "uk", use_crawlbase: bool = False,
+                 serp_df: Optional[pd.DataFrame] = None, audit_result: Optional[dict] = None,
+                 plan: Optional[dict] = None, logo_bytes: Optional[bytes] = None,
+                 progress: Optional[Callable[[float, str], None]] = None,
+                 engine: str = "OpenAI (default)") -> Dict:
+    """
+    Run the full snapshot and return
+    {"serp_df", "audit_result", "kpi", "plan", "row", "pdf_bytes", "zip_bytes", "timings"}.
+    Existing SERP/audit/plan results from the session are reused when given.
+    Titles and FAQs use llm_plan_helper's per-call drafters for `engine` (same
+    fallbacks as build_llm_plan); FAQs start right away, titles once the KPIs are in.
+    """
+    llm = engine_name(engine)
+    started = time.perf_counter()
+    df = serp_df if serp_df is not None else pd.DataFrame()
+
+    def serp_stage(_):
+        if df.empty and domain and kw_list:
+            return pd.DataFrame(run_serp_queries(domain, kw_list, gl=location))
+        return df
+
+    def audit_stage(_):
+        res = audit_result or {}
+        if not res and target_url:
+            res = audit_url(target_url, use_crawlbase=use_crawlbase)
+        return res
+
+    def psi_stage(_):
+        psi_speed, _ = fetch_lighthouse_perf(target_url, strategy="mobile") if target_url else (-1, {})
+        return psi_speed
+
+    def kpi_stage(inp):
+        sdf, res, psi_speed = inp["serp"], inp["audit"], inp["psi"]
+        serp_score = serp_score_from_df(sdf, domain) if not sdf.empty else 50
+        kpi = compute_kpis(res or {}, serp_score)
+        if psi_speed >= 0:
+            kpi["speed_score"] = psi_speed
+            kpi["lvi"] = combine_lvi(kpi["serp_score"], kpi["technical_score"], kpi["content_score"], kpi["eeat_score"], kpi["speed_score"])
+        return kpi
+
+    def titles_stage(inp):
+        if plan:
+            return {}, {}
+        res = inp["audit"] or {}
+        page_title = res.get("title","")
+        return timed_draft(draft_titles, lambda: placeholder_titles(page_title), llm,
+                           target_url or f"https://{domain}", page_title, res.get("h1_count",0),
+                           inp["kpi"].get("lvi",0), kw_list[:5])
+
+    def faqs_stage(_):
+        if plan:
+            return {}, {}
+        questions = faq_questions(kw_list)
+        return timed_draft(draft_faqs, lambda: placeholder_faqs(questions), llm, faq_topic(domain), questions)
+
+    def report_stage(inp):
+        sdf, kpi = inp["serp"], inp["kpi"]
+        (titles, t_meta), (faqs, f_meta) = inp["titles"], inp["faqs"]
+        the_plan = plan or {
+            "suggested_title": titles.get("title",""),
+            "suggested_meta": titles.get("meta",""),
+            "faqs_md": faqs.get("faqs_md",""),
+            "faq_jsonld": faqs.get("faq_jsonld",""),
+            "metadata": {"engine": llm,
+                         "latency_ms": {"titles": t_meta["latency_ms"], "faqs": f_meta["latency_ms"]},
+                         "served_by": {"titles": t_meta["served_by"], "faqs": f_meta["served_by"]},
+                         "fallback": {"titles": t_meta["fallback"], "faqs": f_meta["fallback"]}},
+        }
+        ts = datetime.datetime.utcnow().isoformat(timespec="seconds")
+        row = {"timestamp": ts, "project": project, "domain": domain or "", "url": target_url, **kpi}
+        append_row(row)
+
+        serp_rows = sdf.to_dict("records")
+        try:
+            hist_rows = tail_history(project, 10, domain or "").to_dict("records")
+        except Exception:
+            hist_rows = []
+        t_rows, t_res = trend_rows(project, domain or "")
+        pdf_bytes = build_pdf(project, domain, target_url, kpi, serp_rows, hist_rows, the_plan,
+                              brand_title=f"LLMSEO Visibility Report  {project or domain}",
+                              logo_bytes=logo_bytes,
+                              trend_rows=t_rows, trend_resolution=t_res)
+
+        # Every snapshot adds a history row, so there is nothing to reuse: spool, don't cache
+        with spooled_zip([
+            ("report.pdf", pdf_bytes),
+            ("serp_results.csv", None if sdf.empty else sdf.to_csv(index=False)),
+            ("lvi_history.csv", history_csv(project)),
+            ("llm_plan.md", plan_markdown(the_plan, domain or target_url)),
+        ]) as spool:
+            zip_bytes = spool.read()
+        return {"plan": the_plan, "row": row, "pdf_bytes": pdf_bytes, "zip_bytes": zip_bytes}
+
+    with llm_usage.project(project):
+        out, timings = run_stages({
+            "serp":   (serp_stage,   ()),
+            "audit":  (audit_stage,  ()),
+            "psi":    (psi_stage,    ()),
+            "faqs":   (faqs_stage,   ()),
+            "kpi":    (kpi_stage,    ("serp", "audit", "psi")),
+            "titles": (titles_stage, ("audit", "kpi")),
+            "report": (report_stage, ("serp", "kpi", "titles", "faqs")),
+        }, progress=progress)
+    timings["total"] = time.perf_counter() - started
+
+    return {"serp_df": out["serp"], "audit_result": out["audit"], "kpi": out["kpi"],
+            "timings": timings, **out["report"]}
@@ -0,0 +1,8 @@
+import os, sys
+from pathlib import Path
+
+# the app's modules are flat at the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# calls that outlive a test (abandoned hedges, released stalls) must not write data/llm_usage.sqlite3
+os.environ["LLM_USAGE"] = "off"
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import batch_planner
+import llm_cache
+import llm_engines
+
+
+class _BatchEngine(llm_engines.Engine):
+    """Answers every batched titles prompt; the first answer has over-long titles."""
+    def __init__(self):
+        super().__init__()
+        self.name, self.calls = "batch", 0
+        self.factory = object
+
+    def model(self):
+        return "fake-model"
+
+    def _call(self, client, prompt, max_tokens, temperature, model, usage):
+        self.calls += 1
+        ids = [json.loads(line)["id"] for line in prompt.split("Pages:\n", 1)[1].splitlines() if line.strip()]
+        title = "T" * 80 if self.calls == 1 else "Short title"
+        return json.dumps({"items": [{"id": i, "title": title, "meta": "Meta"} for i in ids]})
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_CACHE", "on")
+    monkeypatch.setenv("LLM_USAGE", "off")
+    monkeypatch.setattr(llm_cache, "DEFAULT_DB", tmp_path / "llm_cache.sqlite3")
+    monkeypatch.setattr(llm_engines, "engine_name", lambda label: "batch")
+    fake = _BatchEngine()
+    monkeypatch.setitem(llm_engines.ENGINES, "batch", fake)
+    return fake
+
+
+PACK = {"keywords": ["oxygen"], "pages": [{"path": "/a", "title": "A"}, {"path": "/b", "title": "B"}]}
+
+
+def test_invalid_batch_is_retried_uncached_and_not_cached(engine):
+    out = batch_planner.plan_pages(PACK, kinds=("titles",))
+    assert [p["status"] for p in out["pages"].values()] == ["ok", "ok"]
+    assert engine.calls == 2 and out["metadata"]["calls"] == 2 and out["metadata"]["cache_hits"] == 0
+
+    # only the valid retry answer was cached
+    again = batch_planner.plan_pages(PACK, kinds=("titles",))
+    assert engine.calls == 2
+    assert again["metadata"]["calls"] == 0 and again["metadata"]["cache_hits"] == 1
+    assert again["pages"]["/a"]["title"] == "Short title"
@@ -0,0 +1,27 @@
+import threading, time
+
+import competitor_enrich
+
+
+class _CountingSession:
+    def __init__(self):
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return type("Response", (), {"text": ""})()
+
+
+def test_searches_respect_per_domain_limit(monkeypatch):
+    session = _CountingSession()
+    monkeypatch.setattr(competitor_enrich, "_session", lambda: session)
+    monkeypatch.setattr(competitor_enrich, "_domain_locks", {})
+    out = competitor_enrich.enrich_keywords([f"kw{i}" for i in range(12)], workers=12)
+    assert len(out) == 12
+    assert session.peak <= competitor_enrich.PER_DOMAIN_LIMIT
@@ -0,0 +1,22 @@
+import os, types
+
+import export_index
+
+
+def test_runs_sort_by_export_time_not_file_mtime(tmp_path, monkeypatch):
+    clock = iter([900.0, 960.0, 1020.0])
+    monkeypatch.setattr(export_index, "time", types.SimpleNamespace(time=lambda: next(clock)))
+    idx = export_index.ExportIndex(tmp_path)
+    first = tmp_path / "P_UK_kw_20250101_0900.zip"
+    first.write_bytes(b"same")
+    idx.record(first, project="P", kind="zip")
+    (tmp_path / "P_UK_kw_20250101_0901.zip").write_bytes(b"other")
+    idx.record(tmp_path / "P_UK_kw_20250101_0901.zip", project="P", kind="zip")
+    os.link(first, tmp_path / "P_UK_kw_20250101_0902.zip")   # re-export of cached content
+    idx.record(tmp_path / "P_UK_kw_20250101_0902.zip", project="P", kind="zip")
+
+    rows = idx.entries(project="P")
+    assert [r["name"][-8:-4] for r in rows] == ["0902", "0901", "0900"]
+    assert rows[0]["mtime"] == 1020.0
+    idx.rebuild()
+    assert [r["mtime"] for r in idx.entries(project="P")] == [1020.0, 960.0, 900.0]
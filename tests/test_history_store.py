@@ -0,0 +1,50 @@
+import pytest
+
+import history_store
+import lvi_trends
+from history_store import CSVHistoryStore, SQLiteHistoryStore
+
+ROOT_CSV = """timestamp,domain,url,serp_score,technical_score,content_score,eeat_score,speed_score,lvi,project
+2025-10-14T22:40:06,www.a.com,https://a.com/,40,85,35,10,60,45,
+2025-10-15T22:25:16,www.a.com,https://a.com/,40,85,35,10,60,47,
+"""
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    (tmp_path / "lvi_history.csv").write_text(ROOT_CSV)
+    store = CSVHistoryStore(tmp_path)
+    for day in range(1, 4):
+        store.append({"timestamp": f"2026-01-0{day}T09:00:00", "project": "Acme", "domain": "acme.com", "lvi": 50 + day})
+    return tmp_path
+
+
+@pytest.mark.parametrize("make", [CSVHistoryStore, lambda d: SQLiteHistoryStore(d / "h.sqlite3", d)])
+def test_cross_project_read_includes_legacy_root_csv(data_dir, make):
+    store = make(data_dir)
+    df = store.read()
+    assert sorted(df["project"].map(history_store._norm).unique()) == ["Acme", "default"]
+    assert len(df) == 5
+    assert store.projects() == ["Acme", "default"]
+
+
+def test_trend_series_reads_the_csv_once(data_dir, monkeypatch):
+    store = CSVHistoryStore(data_dir)
+    monkeypatch.setattr(history_store, "get_store", lambda backend=None: store)
+    reads = []
+    for name in ("read", "_scan_backwards"):
+        method = getattr(store, name)
+        monkeypatch.setattr(store, name, lambda *a, _m=method, _n=name, **k: reads.append(_n) or _m(*a, **k))
+    frame, resolution = lvi_trends.trend_series("Acme")
+    assert resolution == "raw" and frame["lvi"].tolist() == [51, 52, 53]
+    assert reads == ["read"]
+    lvi_trends.trend_series("Acme")   # unchanged file: no re-read
+    assert reads == ["read"]
+
+
+def test_per_project_read_includes_root_csv_rows_first_time(data_dir):
+    with open(data_dir / "lvi_history.csv", "a") as f:
+        f.write("2025-12-01T09:00:00,acme.com,https://acme.com/,40,85,35,10,60,49,Acme\n")
+    store = SQLiteHistoryStore(data_dir / "h.sqlite3", data_dir)
+    assert store.tail("Acme", 10)["lvi"].tolist() == [49, 51, 52, 53]
+    assert len(store.read()) == 6
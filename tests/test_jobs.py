@@ -0,0 +1,47 @@
+import os, time
+
+import jobs
+
+
+def _age(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def test_prune_removes_expired_jobs_and_orphans(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", tmp_path)
+    old, fresh = "a" * 32, "b" * 32
+    for job_id in (old, fresh):
+        (tmp_path / f"{job_id}.json").write_text("{}")
+        (tmp_path / f"{job_id}.pkl").write_bytes(b"x" * 1024)
+    orphan = tmp_path / f"{'c' * 32}.pkl.tmp"
+    orphan.write_bytes(b"partial")
+    for p in (tmp_path / f"{old}.json", tmp_path / f"{old}.pkl", orphan):
+        _age(p, 3600)
+
+    assert jobs.prune(max_age=60) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{fresh}.json", f"{fresh}.pkl"]
+
+
+def test_prune_keeps_running_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", tmp_path)
+    job_id = "d" * 32
+    monkeypatch.setitem(jobs._jobs, job_id, {"id": job_id, "status": jobs.RUNNING})
+    (tmp_path / f"{job_id}.json").write_text("{}")
+    _age(tmp_path / f"{job_id}.json", 3600)
+
+    assert jobs.prune(max_age=60) == 0
+    assert (tmp_path / f"{job_id}.json").exists()
+
+
+def test_submit_prunes_at_most_once_per_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", tmp_path)
+    monkeypatch.setattr(jobs, "_last_prune", 0.0)
+    calls = []
+    monkeypatch.setattr(jobs, "prune", lambda *a, **k: calls.append(1) or 0)
+
+    ids = [jobs.submit("test", lambda: 1) for _ in range(3)]
+    for job_id in ids:
+        while jobs.status(job_id)["status"] not in jobs.FINISHED:
+            time.sleep(0.01)
+    assert len(calls) == 1
@@ -0,0 +1,68 @@
+import asyncio, time
+
+import pytest
+
+import llm_engines
+
+
+class _FakeClient:
+    """Injected sync client without an api_key: acomplete must fall back to a worker thread."""
+
+
+class _SleepyEngine(llm_engines.Engine):
+    def __init__(self, name, seconds):
+        super().__init__()
+        self.name, self.seconds = name, seconds
+        self.factory = _FakeClient
+
+    def model(self):
+        return "fake-model"
+
+    def _call(self, client, prompt, max_tokens, temperature, model, usage):
+        time.sleep(self.seconds)
+        return f'{{"engine": "{self.name}"}}'
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE", "off")
+    monkeypatch.setenv("LLM_USAGE", "off")
+    monkeypatch.setitem(llm_engines.ENGINES, "slow", _SleepyEngine("slow", 3.0))
+    monkeypatch.setitem(llm_engines.ENGINES, "fast", _SleepyEngine("fast", 0.05))
+
+
+def test_hedge_with_factory_client_does_not_wait_for_loser(engines):
+    start = time.perf_counter()
+    text, winner = asyncio.run(llm_engines.ahedged_complete("slow", "fast", "prompt", delay=0.2))
+    elapsed = time.perf_counter() - start
+    assert winner == "fast" and "fast" in text
+    # the abandoned 3 s primary call must not hold up asyncio.run()
+    assert elapsed < 1.0, f"hedged call took {elapsed:.2f}s"
+
+
+class _AsyncEngine(llm_engines.Engine):
+    """Engine with an async client; counts how many clients get built."""
+    def __init__(self):
+        super().__init__()
+        self.name, self.built = "async", 0
+
+    def api_key(self):
+        return "key"
+
+    def model(self):
+        return "fake-model"
+
+    def _new_async_client(self, key):
+        self.built += 1
+        return object()
+
+    async def _acall(self, client, prompt, max_tokens, temperature, model, usage):
+        return "ok"
+
+
+def test_sync_entry_points_share_one_loop_and_async_client(engines, monkeypatch):
+    engine = _AsyncEngine()
+    monkeypatch.setitem(llm_engines.ENGINES, "async", engine)
+    for _ in range(3):
+        assert llm_engines.run(llm_engines.acomplete("async", "prompt")) == "ok"
+    assert engine.built == 1
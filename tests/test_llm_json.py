@@ -0,0 +1,39 @@
+import llm_engines
+import llm_json
+
+SCHEMA = {"title": str, "meta": str}
+
+
+def test_strict_validator_rejects_repaired_answers():
+    valid, tolerant = llm_json.validator(SCHEMA), llm_json.validator(SCHEMA, strict=False)
+    fenced = 'Sure!\n```json\n{"title": "A", "meta": "B"}\n```'
+    truncated = '{"title": "A", "meta": "B is cut off'
+    assert valid(fenced) and tolerant(fenced)
+    assert tolerant(truncated) and not valid(truncated)
+    assert not valid('{"title": "A", "meta": "B",}')
+
+
+def test_only_the_reprompted_answer_is_remembered(monkeypatch):
+    answers = iter(['{"title": "A", "meta": ""}', '{"title": "A", "meta": "B"}'])
+    calls, remembered = [], []
+    def complete(engine, prompt, validate=None, **kw):
+        text = next(answers)
+        calls.append(validate(text) if validate else None)
+        return text
+    monkeypatch.setattr(llm_engines, "complete", complete)
+    monkeypatch.setattr(llm_engines, "remember", lambda engine, prompt, text, *a: remembered.append((prompt, text)))
+    assert llm_json.complete_json("openai", "P", SCHEMA, template="t") == {"title": "A", "meta": "B"}
+    assert calls == [False, None]   # the unusable first answer would not be cached
+    assert remembered == [("P", '{"title": "A", "meta": "B"}')]
+
+
+def test_locally_repaired_answer_is_not_cached(monkeypatch):
+    checked, remembered = [], []
+    def complete(engine, prompt, validate=None, **kw):
+        text = '{"title": "A", "meta": "B'
+        checked.append(validate(text))
+        return text
+    monkeypatch.setattr(llm_engines, "complete", complete)
+    monkeypatch.setattr(llm_engines, "remember", lambda *a: remembered.append(a))
+    assert llm_json.complete_json("openai", "P", SCHEMA, template="t") == {"title": "A", "meta": "B"}
+    assert checked == [False] and remembered == []
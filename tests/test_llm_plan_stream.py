@@ -0,0 +1,69 @@
+import threading, time
+
+import pytest
+
+import llm_engines
+import llm_plan_helper
+
+
+class _StallingEngine(llm_engines.Engine):
+    """Streams one complete FAQ pair, then stalls until released or closed (like an HTTP response)."""
+    def __init__(self):
+        super().__init__()
+        self.name = "stall"
+        self.factory = object
+        self.release = threading.Event()
+        self.closed = threading.Event()
+        self.finished = threading.Event()
+
+    def model(self):
+        return "fake-model"
+
+    def close(self):
+        self.closed.set()
+        self.release.set()
+
+    def _stream(self, client, prompt, max_tokens, temperature, model, usage, cancel=None):
+        if cancel is not None:
+            cancel.attach(self)
+        try:
+            yield '{"faqs": [{"q": "First question?", "a": "First answer."}, '
+            self.release.wait(10)
+            if self.closed.is_set():
+                raise ConnectionError("response closed")
+            yield '{"q": "Second?", "a": "Late."}]}'
+        finally:
+            self.finished.set()
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE", "off")
+    monkeypatch.setenv("LLM_USAGE", "off")
+    fake = _StallingEngine()
+    monkeypatch.setitem(llm_engines.ENGINES, "stall", fake)
+    monkeypatch.setattr(llm_engines, "engine_name", lambda label: "stall")
+    yield fake
+    fake.release.set()
+
+
+def test_stream_plan_respects_deadline(engine):
+    start = time.perf_counter()
+    events = list(llm_plan_helper.stream_llm_plan("Stall", "x.co", "", ["oxygen"], {}, {}, timeout=0.5, hedge=False))
+    elapsed = time.perf_counter() - start
+    kind, plan = events[-1]
+    assert kind == "plan"
+    assert elapsed < 2.0, f"stream_llm_plan took {elapsed:.2f}s with a 0.5s deadline"
+    assert plan["metadata"]["fallback"]["faqs"] == "timeout"
+    assert "First question?" in plan["faqs_md"] and "Second?" not in plan["faqs_md"]
+    assert engine.closed.is_set()            # the provider stream was closed at the deadline...
+    assert engine.finished.wait(1)           # ...so the reader thread is released right away
+
+
+def test_stream_accounts_tokens_when_consumer_stops_early(engine, monkeypatch):
+    accounted = []
+    monkeypatch.setattr(llm_engines, "_account", lambda *args: accounted.append(args[3]))
+    pieces = llm_engines.stream("stall", "prompt")
+    first = next(pieces)
+    pieces.close()
+    assert accounted == [first]
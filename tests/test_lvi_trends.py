@@ -0,0 +1,47 @@
+import pytest
+
+import history_store
+import lvi_trends
+from history_store import CSVHistoryStore
+
+SERP_ONLY = {"serp": 1, "technical": 0, "content": 0, "eeat": 0, "speed": 0}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = CSVHistoryStore(tmp_path)
+    for day in range(1, 7):
+        store.append({"timestamp": f"2026-01-0{day}T09:00:00", "project": "Acme", "domain": "acme.com",
+                      "serp_score": 10 * day, "technical_score": 90, "content_score": 90,
+                      "eeat_score": 90, "speed_score": 90, "lvi": 80})
+    monkeypatch.setattr(history_store, "get_store", lambda backend=None: store)
+    return store
+
+
+def test_raw_trend_rescored_under_weight_profile(store):
+    stored, _ = lvi_trends.trend_series("Acme")
+    rescored, resolution = lvi_trends.trend_series("Acme", weights=SERP_ONLY)
+    assert resolution == "raw"
+    assert stored["lvi"].tolist() == [80] * 6
+    assert rescored["lvi"].tolist() == [10, 20, 30, 40, 50, 60]
+
+
+def test_rollup_trend_rescored_under_weight_profile(store, monkeypatch):
+    monkeypatch.setattr(lvi_trends, "LTTB_RAW_LIMIT", 2)
+    rescored, resolution = lvi_trends.trend_series("Acme", weights=SERP_ONLY)
+    assert resolution == "day"
+    assert rescored["lvi"].tolist() == [10, 20, 30, 40, 50, 60]
+
+
+def test_rows_missing_a_component_keep_stored_lvi(store):
+    store.append({"timestamp": "2026-01-07T09:00:00", "project": "Acme", "domain": "acme.com",
+                  "serp_score": 70, "technical_score": 90, "content_score": 90, "eeat_score": 90, "lvi": 85})
+    rescored, _ = lvi_trends.trend_series("Acme", weights=SERP_ONLY)
+    assert rescored["lvi"].tolist() == [10, 20, 30, 40, 50, 60, 85]
+
+
+def test_cached_view_is_not_reused_for_a_different_length(store):
+    from kpi_scoring import recompute_history_lvi
+    df = store.read("Acme")
+    assert recompute_history_lvi(df, SERP_ONLY, history_key="k")["lvi"].tolist() == [10, 20, 30, 40, 50, 60]
+    assert recompute_history_lvi(df.head(2), SERP_ONLY, history_key="k")["lvi"].tolist() == [10, 20]
@@ -0,0 +1,18 @@
+import urllib.request
+
+import metrics
+
+
+def test_http_server_serves_the_process_registry(monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    server = metrics.start_http_server(0)
+    try:
+        assert metrics.start_http_server(0) is server
+        metrics.record_cache("test_cache", True)
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            body = resp.read().decode()
+        assert 'llmseo_cache_hit_ratio{cache="test_cache"} 1' in body
+    finally:
+        server.shutdown()
+        server.server_close()
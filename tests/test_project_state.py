@@ -0,0 +1,39 @@
+import json, threading, time
+
+import project_state
+
+
+def test_failed_write_is_requeued(tmp_path, monkeypatch):
+    store = project_state.ProjectStore(tmp_path, debounce=60, max_delay=60)
+    replace = project_state.os.replace
+    monkeypatch.setattr(project_state.os, "replace", lambda *a: (_ for _ in ()).throw(OSError("disk full")))
+    assert store.save({"project": "Acme", "domain": "acme.com"})
+    store.flush()
+    assert not (tmp_path / "Acme.json").exists()
+    assert not store.save({"project": "Acme", "domain": "acme.com"})   # same content: still queued
+    monkeypatch.setattr(project_state.os, "replace", replace)
+    store.flush()
+    assert json.loads((tmp_path / "Acme.json").read_text())["domain"] == "acme.com"
+
+
+def test_save_does_not_wait_for_the_disk(tmp_path, monkeypatch):
+    store = project_state.ProjectStore(tmp_path, debounce=60, max_delay=60)
+    entered, release = threading.Event(), threading.Event()
+    replace = project_state.os.replace
+    def slow_replace(*a):
+        entered.set()
+        release.wait(5)
+        return replace(*a)
+    monkeypatch.setattr(project_state.os, "replace", slow_replace)
+    store.save({"project": "Acme", "domain": "acme.com"})
+    writer = threading.Thread(target=store.flush)
+    writer.start()
+    assert entered.wait(5)
+    start = time.perf_counter()
+    assert store.save({"project": "Beta", "domain": "beta.com"})
+    assert store.get("Acme")["domain"] == "acme.com"
+    assert time.perf_counter() - start < 1
+    release.set()
+    writer.join(5)
+    store.flush()
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == ["Acme.json", "Beta.json"]
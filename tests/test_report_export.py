@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("reportlab")
+from reportlab.lib.units import cm
+from reportlab.platypus import Table
+
+import report_export
+
+KPI = {"serp_score": 40, "technical_score": 70, "content_score": 60, "eeat_score": 50, "speed_score": 80, "lvi": 58}
+SERP = [{"keyword": f"portable oxygen concentrator {i}", "position": i, "title": "A long result title " * 4}
+        for i in range(1, 9)]
+HISTORY = [{"timestamp": f"2026-10-{d:02d} 09:00", "lvi": 50 + d} for d in range(1, 11)]
+TREND = [{"period": f"2026-W{i:02d}", "lvi": 40 + i} for i in range(1, 13)]
+PLAN = {"suggested_title": "T", "suggested_meta": "M", "faqs_md": "**Q:** q\n**A:** a", "faq_jsonld": "{}"}
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    drawn = []
+    draw_on = Table.drawOn
+    def record(self, canvas, x, y, *args, **kwargs):
+        drawn.append((canvas.getPageNumber(), [row[0] for row in self._cellvalues], y))
+        return draw_on(self, canvas, x, y, *args, **kwargs)
+    monkeypatch.setattr(Table, "drawOn", record)
+    return drawn
+
+
+def test_full_report_tables_stay_above_bottom_margin(tables):
+    report_export.build_pdf("P", "x.co", "https://x.co", KPI, SERP, HISTORY, PLAN,
+                            trend_rows=TREND, trend_resolution="week")
+    assert [cells[0] for _, cells, _ in tables] == ["SERP", "timestamp", "period", "kw"]
+    assert all(y >= 2*cm for _, _, y in tables)
+    assert tables[-1][0] == 2   # the SERP table moved to its own page
+
+
+def test_raw_trend_is_not_repeated(tables):
+    report_export.build_pdf("P", "x.co", "", KPI, SERP, HISTORY, PLAN, trend_rows=HISTORY, trend_resolution="raw")
+    assert "period" not in [cells[0] for _, cells, _ in tables]
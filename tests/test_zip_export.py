@@ -0,0 +1,39 @@
+import os, zipfile
+
+import zip_export
+
+
+def test_lazy_entries_are_keyed_by_fingerprint(tmp_path):
+    calls = []
+    def stamped(ts):
+        return lambda: calls.append(ts) or f'{{"created_at": "{ts}"}}'
+
+    first = zip_export.bundle([("snapshot.json", stamped("10:00"))], fingerprint={"kw": ["a"]}, cache_dir=tmp_path)
+    again = zip_export.bundle([("snapshot.json", stamped("10:01"))], fingerprint={"kw": ["a"]}, cache_dir=tmp_path)
+    other = zip_export.bundle([("snapshot.json", stamped("10:02"))], fingerprint={"kw": ["b"]}, cache_dir=tmp_path)
+    assert first == again != other
+    assert calls == ["10:00", "10:02"]
+    with zipfile.ZipFile(again) as zf:
+        assert "10:00" in zf.read("snapshot.json").decode()
+
+
+def test_cache_hit_does_not_touch_exported_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_export, "CACHE_DIR", tmp_path / "cache")
+    entries = [("a.txt", "hello")]
+    exported = zip_export.export_to(entries, tmp_path / "exports" / "a.zip")
+    os.utime(exported, (1_000_000, 1_000_000))
+    zip_export.bundle(entries)
+    assert exported.stat().st_mtime == 1_000_000
+
+
+def test_fresh_entries_stay_out_of_the_cached_bundle(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_export, "CACHE_DIR", tmp_path / "cache")
+    entries = [("a.txt", "hello")]
+    first = zip_export.export_to(entries, tmp_path / "exports" / "0900.zip", fresh=[("snapshot.json", "0900")])
+    second = zip_export.export_to(entries, tmp_path / "exports" / "0902.zip", fresh=[("snapshot.json", "0902")])
+    for path, ts in ((first, "0900"), (second, "0902")):
+        with zipfile.ZipFile(path) as zf:
+            assert zf.read("snapshot.json").decode() == ts and zf.read("a.txt") == b"hello"
+    (cached,) = (tmp_path / "cache").glob("*.zip")
+    with zipfile.ZipFile(cached) as zf:
+        assert zf.namelist() == ["a.txt"]
@@ -3,13 +3,13 @@ import csv, datetime, json
 from serp_agent import run_serp_queries
 from pagespeed_agent import fetch_lighthouse_perf
 from kpi_scoring import compute_kpis, serp_score_from_df, combine_lvi
+from history_store import append_row
 import pandas as pd
 
 PROJECT = "ASI-C"
 DOMAIN = "www.asi-c.co.uk"
 URL = "https://www.asi-c.co.uk"
 KEYWORDS_FILE = "asi_c_seo_pack.json"
-OUTPUT = "data/lvi_history.csv"
 
 with open(KEYWORDS_FILE) as f:
     kw_pack = json.load(f)
@@ -35,14 +35,9 @@ kpi["lvi"] = combine_lvi(
     kpi["speed_score"],
 )
 
-# 4️⃣ Append to CSV
+# 4️⃣ Append to history store (O(1), safe alongside app sessions)
 ts = datetime.datetime.utcnow().isoformat(timespec="seconds")
 row = {"timestamp": ts, "project": PROJECT, "domain": DOMAIN, "url": URL, **kpi}
-try:
-    df = pd.read_csv(OUTPUT)
-    df = pd.concat([df, pd.DataFrame([row])])
-except FileNotFoundError:
-    df = pd.DataFrame([row])
-df.to_csv(OUTPUT, index=False)
-print(f"✅ Weekly LVI update saved → {OUTPUT}")
+append_row(row)
+print(f"✅ Weekly LVI update saved → {PROJECT} history")
 
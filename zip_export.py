@@ -0,0 +1,184 @@
+# zip_export.py
+"""
+Streaming ZIP bundles for project exports.
+
+Entries are (arcname, source) pairs. A source can be:
+  - a Path: streamed from disk with ZipFile.write (never loaded whole, no pandas round-trip)
+  - str / bytes: written as-is
+  - a zero-arg callable returning str/bytes (or None to skip): only called when the bundle is built
+  - None: skipped (handy for optional files)
+
+Archives are built in a SpooledTemporaryFile (memory below SPOOL_MAX_BYTES,
+disk above) or straight into the bundle cache. bundle() caches by content
+hash, so exporting an unchanged project returns the existing archive.
+
+    path = bundle([("lvi_history.csv", csv_text), ("seo_pack.json", pack_path)],
+                  fingerprint={"kpi": kpi})
+
+EXPORT_ZIP_COMPRESSION=deflate|zstd|stored (zstd needs Python's zipfile.ZIP_ZSTANDARD;
+falls back to deflate otherwise).
+"""
+
+import hashlib, json, os, shutil, tempfile, threading, zipfile
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple, Union
+
+Source = Union[Path, str, bytes, Callable[[], Union[str, bytes]], None]
+Entry = Tuple[str, Source]
+
+CACHE_DIR = Path(__file__).resolve().parent / "data" / "export_cache"
+CACHE_MAX_FILES = int(os.getenv("EXPORT_CACHE_MAX_FILES", "32"))
+SPOOL_MAX_BYTES = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+ZIP_ZSTANDARD = getattr(zipfile, "ZIP_ZSTANDARD", None)
+
+# Already-compressed formats are stored, not recompressed.
+_STORED_SUFFIXES = {".zip", ".gz", ".png", ".jpg", ".jpeg", ".webp", ".zst"}
+
+_cache_lock = threading.Lock()
+
+
+def compression() -> int:
+    mode = os.getenv("EXPORT_ZIP_COMPRESSION", "deflate").lower()
+    if mode == "stored":
+        return zipfile.ZIP_STORED
+    if mode == "zstd" and ZIP_ZSTANDARD is not None:
+        return ZIP_ZSTANDARD
+    return zipfile.ZIP_DEFLATED
+
+
+def _entries(entries: Iterable[Entry]) -> list:
+    return [(name, src) for name, src in entries if src is not None and not (isinstance(src, Path) and not src.exists())]
+
+
+def write_zip(entries: Iterable[Entry], fileobj, method: Optional[int] = None) -> None:
+    """Write entries into an open binary file object."""
+    method = compression() if method is None else method
+    with zipfile.ZipFile(fileobj, "w", method) as zf:
+        for name, src in _entries(entries):
+            m = zipfile.ZIP_STORED if Path(name).suffix.lower() in _STORED_SUFFIXES else method
+            if isinstance(src, Path):
+                zf.write(src, arcname=name, compress_type=m)
+                continue
+            if callable(src):
+                src = src()
+                if src is None:
+                    continue
+            zf.writestr(name, src if isinstance(src, (bytes, str)) else str(src), compress_type=m)
+
+
+def _append(entries: Iterable[Entry], fileobj) -> None:
+    with zipfile.ZipFile(fileobj, "a", compression()) as zf:
+        for name, src in _entries(entries):
+            if isinstance(src, Path):
+                zf.write(src, arcname=name)
+                continue
+            if callable(src):
+                src = src()
+                if src is None:
+                    continue
+            zf.writestr(name, src if isinstance(src, (bytes, str)) else str(src))
+
+
+def spooled_zip(entries: Iterable[Entry], max_size: int = SPOOL_MAX_BYTES) -> tempfile.SpooledTemporaryFile:
+    """Archive in a spooled temp file (RAM under max_size, disk above), rewound for reading."""
+    spool = tempfile.SpooledTemporaryFile(max_size=max_size, mode="w+b")
+    write_zip(entries, spool)
+    spool.seek(0)
+    return spool
+
+
+def content_hash(entries: Iterable[Entry], fingerprint=None) -> str:
+    """
+    sha256 over entry names and contents. Files are hashed by content; callables
+    are not evaluated - describe what they depend on in `fingerprint`.
+    """
+    h = hashlib.sha256()
+    h.update(str(compression()).encode())
+    h.update(json.dumps(fingerprint, sort_keys=True, default=str).encode())
+    for name, src in _entries(entries):
+        h.update(b"\0" + name.encode("utf-8") + b"\0")
+        if isinstance(src, Path):
+            with open(src, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        elif callable(src):
+            h.update(b"<lazy>")
+        else:
+            h.update(src if isinstance(src, bytes) else str(src).encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+def _marker(path: Path) -> Path:
+    # Recency lives on a separate file: bundles are hard-linked into exports/, so touching
+    # the bundle itself would also change the mtime of every exported copy.
+    return path.with_suffix(".used")
+
+
+def _last_used(path: Path) -> float:
+    try:
+        return _marker(path).stat().st_mtime
+    except OSError:
+        return path.stat().st_mtime
+
+
+def _prune(cache_dir: Path, keep: int) -> None:
+    files = sorted(cache_dir.glob("*.zip"), key=_last_used, reverse=True)
+    for p in files[keep:]:
+        for f in (p, _marker(p)):
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+
+def bundle(entries: Iterable[Entry], fingerprint=None, cache_dir: Optional[Path] = None) -> Path:
+    """Content-addressed archive path; built only if no identical bundle is cached."""
+    entries = _entries(entries)
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    dest = cache_dir / f"{content_hash(entries, fingerprint)}.zip"
+    if dest.exists():
+        try:
+            _marker(dest).touch()  # keep hot bundles out of pruning
+        except OSError:
+            pass
+        return dest
+    fd, tmp = tempfile.mkstemp(suffix=".zip.tmp", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_zip(entries, f)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    with _cache_lock:
+        _prune(cache_dir, CACHE_MAX_FILES)
+    return dest
+
+
+def export_to(entries: Iterable[Entry], dest: Union[str, Path], fingerprint=None,
+              fresh: Iterable[Entry] = ()) -> Path:
+    """
+    Place a (cached) bundle at dest, hard-linking when possible. `fresh` entries
+    (e.g. a per-export timestamp) stay out of the cache: dest becomes a copy of
+    the bundle with them appended.
+    """
+    src = bundle(entries, fingerprint)
+    fresh = _entries(fresh)
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists():
+        dest.unlink()
+    if fresh:
+        shutil.copyfile(src, dest)
+        with open(dest, "r+b") as f:
+            _append(fresh, f)
+        return dest
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+    return dest